@@ -1,123 +1,469 @@
 import logging
 import torch
 import re
-import random
-import spacy
-from datetime import datetime
-from typing import Tuple, List, Dict
-from threading import Lock
-from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
-
-from models import CallerState, ScenarioType, EmotionalState
-from scenario_contexts import load_scenario_contexts, get_random_scenario_context
+import time
+from typing import Callable, Tuple, List, Optional, Iterator
+from threading import Event, Lock, Thread
+from concurrent.futures import Future, ThreadPoolExecutor
+from transformers import DynamicCache, TextIteratorStreamer, StoppingCriteriaList
+
+import config
+from inference_backends import get_backend, load_tokenizer
+from batch_scheduler import BatchScheduler, GenerationRequest, ModelNotReadyError, QueueFullError
+from context_window import ContextWindow, fold_summary
+from keyword_matcher import MESSAGE_INTENTS, answer_check_matcher, answer_word_matcher, message_matcher, question_details, response_matcher
+from kv_cache import SessionKVCache, PrefixKVCache, stack_padded_layers, split_padded_layers
+from tiny_model import ensure_tiny_model
+from stopping import CallerTurnStoppingCriteria, TokenUsageStats
+from speculative import ForwardCounter, SpeculativeStats
+from response_cleaner import clean_response, clean_partial_response
+from quality_scorer import QualityScorer
+from tracing import Trace, stage
+from models import CALL_TAKER, CALLER, CallerState, Exchange, EmotionalState
+from scenario_contexts import load_scenario_contexts
 
 logger = logging.getLogger(__name__)
 
+def copy_outcome(source: Future, target: Future):
+    if source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
 class HuggingFaceCallerGenerator:
-    def __init__(self):
-        self.model_path = "/home/ubuntu/.llama/checkpoints/Llama3.1-8B-Instruct-hf"
+    def __init__(self, model_path: Optional[str] = None, background: bool = False, on_status: Optional[Callable[[str], None]] = None):
+        """With background=True the model, spaCy and warm-up load on a thread and the generator reports
+        'loading', 'warming', then 'ready' (or 'failed'); otherwise they load before returning"""
+        self.model_path = config.TINY_MODEL_DIR if config.LOCAL_TEST_MODEL else model_path or config.MODEL_PATH
         self.tokenizer = None
         self.model = None
-        self.pipeline = None
+        self.draft_model = None
+        self.backend = get_backend(config.INFERENCE_BACKEND)
         self.scenario_contexts = load_scenario_contexts()
-        self.nlp = self._load_spacy_model()
+        self.quality_scorer = None
         self.lock = Lock()
-        self.load_model()
-        logger.info("Hugging Face Llama-3.1-8B Caller Generator initialized")
+        self.status = 'loading'
+        self.on_status = on_status
+        self.load_error = None
+        self.started_at = time.monotonic()
+        self.stage_started_at = self.started_at
+        self.stage_seconds = {}
+        self.loaded = Event()
+        self.ready_lock = Lock()
+        self.ready_waiters = []
+        self.session_cache = SessionKVCache(config.KV_CACHE_MAX_BYTES, config.KV_CACHE_MAX_SESSIONS)
+        self.prefix_cache = PrefixKVCache(config.PREFIX_CACHE_MAX_BYTES, config.PREFIX_CACHE_MAX_ENTRIES)
+        self.prefill_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefix-prefill")
+        self.postprocess_executor = ThreadPoolExecutor(max_workers=config.POSTPROCESS_WORKERS, thread_name_prefix="postprocess")
+        self.token_usage = TokenUsageStats()
+        self.speculative = SpeculativeStats()
+        self.context_window = ContextWindow(
+            lambda text: len(self.tokenizer(text, add_special_tokens=False)['input_ids']),
+            max_tokens=config.HISTORY_MAX_TOKENS,
+            keep_turns=config.HISTORY_KEEP_TURNS,
+            fold_chunk=config.HISTORY_FOLD_CHUNK,
+            cache_size=config.HISTORY_TOKEN_CACHE_SIZE
+        )
+        self.scheduler = BatchScheduler(
+            self._generate_batch,
+            max_batch_size=config.BATCH_MAX_SIZE,
+            max_queue_wait_ms=config.BATCH_MAX_WAIT_MS,
+            max_pending=config.MAX_PENDING_GENERATIONS
+        )
+        if background:
+            Thread(target=self._start, name="model-loader", daemon=True).start()
+        else:
+            self._start(raise_errors=True)
     
-    def _load_spacy_model(self):
+    def _start(self, raise_errors: bool = False):
         try:
-            nlp = spacy.load("en_core_web_sm")
-            logger.info("spaCy model 'en_core_web_sm' loaded successfully")
-            return nlp
-        except OSError:
+            if config.LOCAL_TEST_MODEL:
+                ensure_tiny_model(self.model_path)
+            self.quality_scorer = QualityScorer()
+            self.load_model()
+            self._set_status('warming')
+            self._warm_up()
+        except Exception as e:
+            self.load_error = str(e)
+            self._set_status('failed')
+            self._release_waiters()
+            if raise_errors:
+                raise
+            logger.error(f"Caller generator failed to start: {e}")
+            return
+        
+        self._set_status('ready')
+        self._release_waiters()
+        logger.info(f"Hugging Face Llama-3.1-8B Caller Generator ready after {time.monotonic() - self.started_at:.1f}s")
+    
+    def _set_status(self, status: str):
+        now = time.monotonic()
+        self.stage_seconds[self.status] = round(now - self.stage_started_at, 2)
+        self.stage_started_at = now
+        self.status = status
+        logger.info(f"Caller generator {status}")
+        if self.on_status:
+            self.on_status(status)
+    
+    def _warm_up(self):
+        """One short dummy generation so kernel compilation and allocator growth are not paid by the first trainee"""
+        if not config.WARMUP_MAX_NEW_TOKENS:
+            return
+        prompt = self.tokenizer.apply_chat_template(
+            [{"role": "system", "content": "You are calling 911."}, {"role": "user", "content": "911, what is your emergency?"}],
+            tokenize=False,
+            add_generation_prompt=True
+        )
+        self._generate_batch([GenerationRequest(prompt, max_new_tokens=config.WARMUP_MAX_NEW_TOKENS)])
+        self.token_usage = TokenUsageStats()
+        self.speculative = SpeculativeStats()
+    
+    def _release_waiters(self):
+        with self.ready_lock:
+            self.loaded.set()
+            waiters, self.ready_waiters = self.ready_waiters, []
+        for start in waiters:
+            start()
+    
+    def check_ready(self):
+        """Raises ModelNotReadyError unless the model is ready or turns may queue until it is"""
+        if self.status != 'ready' and (self.status == 'failed' or not config.QUEUE_UNTIL_READY):
+            raise ModelNotReadyError(self.status, config.NOT_READY_RETRY_AFTER)
+    
+    def _when_ready(self, submit: Callable[[], Future]) -> Future:
+        self.check_ready()
+        result = Future()
+        
+        def start():
             try:
-                logger.warning("spaCy model 'en_core_web_sm' not found. Trying to download...")
-                import subprocess
-                import sys
-                subprocess.check_call([sys.executable, "-m", "spacy", "download", "en_core_web_sm"])
-                nlp = spacy.load("en_core_web_sm")
-                logger.info("spaCy model 'en_core_web_sm' downloaded and loaded successfully")
-                return nlp
+                submitted = submit()
             except Exception as e:
-                logger.warning(f"Failed to load spaCy model: {e}. Using fallback text processing.")
-                return None
+                result.set_exception(e)
+                return
+            submitted.add_done_callback(lambda done: copy_outcome(done, result))
+        
+        with self.ready_lock:
+            if not self.loaded.is_set():
+                if config.MAX_PENDING_GENERATIONS and len(self.ready_waiters) >= config.MAX_PENDING_GENERATIONS:
+                    raise QueueFullError(config.NOT_READY_RETRY_AFTER)
+                self.ready_waiters.append(start)
+                return result
+        start()
+        return result
     
     def load_model(self):
         try:
-            logger.info(f"Loading Llama-3.1-8B model from: {self.model_path}")
-            
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_path)
-            
-            if self.tokenizer.chat_template is None:
-                self.tokenizer.chat_template = "{% set loop_messages = messages %}{% for message in loop_messages %}{% set content = '<|start_header_id|>' + message['role'] + '<|end_header_id|>\n\n'+ message['content'] | trim + '<|eot_id|>' %}{% if loop.index0 == 0 %}{% set content = '<|begin_of_text|>' + content %}{% endif %}{{ content }}{% endfor %}{% if add_generation_prompt %}{{ '<|start_header_id|>assistant<|end_header_id|>\n\n' }}{% endif %}"
-            
-            if self.tokenizer.pad_token is None:
-                self.tokenizer.pad_token = self.tokenizer.eos_token
-            
-            self.model = AutoModelForCausalLM.from_pretrained(
-                self.model_path,
-                device_map="auto",
-                torch_dtype=torch.bfloat16
-            )
+            logger.info(f"Loading Llama-3.1-8B model from: {self.model_path} ({self.backend.name} backend)")
             
-            self.pipeline = pipeline(
-                "text-generation",
-                model=self.model,
-                tokenizer=self.tokenizer,
-                device_map="auto"
-            )
+            self.tokenizer = load_tokenizer(self.model_path)
+            self.model = self.backend.load(self.model_path)
             
             logger.info("Llama-3.1-8B model loaded successfully!")
             
+            if config.DRAFT_MODEL_PATH:
+                self.load_draft_model(config.DRAFT_MODEL_PATH)
+            
         except Exception as e:
             logger.error(f"Failed to load model: {e}")
             logger.error("Please verify model path and available resources")
             raise RuntimeError("Model loading failed")
 
-    def generate_response(self, caller_state: CallerState, call_taker_message: str) -> Tuple[str, CallerState]:
+    def load_draft_model(self, draft_path: str):
+        draft = self.backend.load(draft_path)
+        if draft.config.vocab_size != self.model.config.vocab_size:
+            logger.warning(f"Draft model {draft_path} has a different vocabulary ({draft.config.vocab_size} vs {self.model.config.vocab_size}), speculative decoding disabled")
+            return
+        
+        draft.generation_config.num_assistant_tokens = config.DRAFT_TOKENS
+        draft.generation_config.num_assistant_tokens_schedule = "heuristic"
+        self.draft_model = draft
+        self.target_forwards = ForwardCounter(self.model)
+        self.draft_forwards = ForwardCounter(draft)
+        logger.info(f"Draft model loaded from {draft_path}, speculative decoding enabled")
+    
+    def generate_response(self, caller_state: CallerState, call_taker_message: str, session_id: Optional[str] = None, trace: Optional[Trace] = None) -> Tuple[str, CallerState]:
+        try:
+            return self.submit_response(caller_state, call_taker_message, session_id, trace).result()
+        except (QueueFullError, ModelNotReadyError):
+            raise
+        except Exception as e:
+            logger.error(f"Error generating response: {e}")
+            return "I need help!", caller_state
+    
+    def _prepare_turn(self, caller_state: CallerState, call_taker_message: str, session_id: Optional[str], trace: Optional[Trace]) -> Tuple[str, List[str]]:
+        """The rendered prompt for a turn and its shareable system prompt prefixes"""
         context = caller_state.caller_profile.get('selected_context')
         if not context:
-            logger.error(f"No stored context for session.")
+            logger.error(f"No stored context for session {session_id}")
         
-        try:
+        with stage(trace, 'build_messages'):
             messages = self._build_messages(caller_state, call_taker_message, context)
+            prefixes = self._prompt_prefixes(messages, caller_state, context)
+        return messages, prefixes
+    
+    def submit_response(self, caller_state: CallerState, call_taker_message: str, session_id: Optional[str] = None, trace: Optional[Trace] = None) -> Future:
+        """Queue a turn without blocking; the returned future resolves to (response, new_state).
+        Raises QueueFullError when the generation queue is at capacity and ModelNotReadyError before the model has loaded."""
+        if self.status != 'ready':
+            return self._when_ready(lambda: self.submit_response(caller_state, call_taker_message, session_id, trace))
+        
+        messages, prefixes = self._prepare_turn(caller_state, call_taker_message, session_id, trace)
+        max_new_tokens = self._token_budget(caller_state.emotional_state)
+        generation = self.scheduler.submit(messages, session_id, prefixes, max_new_tokens=max_new_tokens, scenario_type=caller_state.scenario_type.value, trace=trace)
+        
+        result = Future()
+        
+        def finish(done: Future, generated_at: float):
+            if trace is not None:
+                trace.add('postprocess_wait', time.perf_counter() - generated_at)
+            try:
+                with stage(trace, 'clean_response'):
+                    response = clean_response(done.result(), call_taker_message, caller_state.emotional_state, caller_state)
+                with stage(trace, 'update_state'):
+                    new_state = self._update_state(caller_state, call_taker_message, response, trace)
+                result.set_result((response, new_state))
+            except Exception as e:
+                logger.error(f"Error generating response: {e}")
+                result.set_result(("I need help!", caller_state))
+        
+        # Cleanup and scoring run off the scheduler thread so the next batch is not held up
+        generation.add_done_callback(lambda done: self.postprocess_executor.submit(finish, done, time.perf_counter()))
+        return result
+    
+    def stream_response(self, caller_state: CallerState, call_taker_message: str, session_id: Optional[str] = None, trace: Optional[Trace] = None) -> Iterator[Tuple[str, object]]:
+        """Yield ('token', text) as tokens are decoded, ('sentence', text) as each sentence is cleaned,
+        and finally ('done', (response, new_state)) with the fully cleaned response"""
+        if self.status != 'ready':
+            self.check_ready()
+            self.loaded.wait()
+            self.check_ready()
+        
+        try:
+            messages, prefixes = self._prepare_turn(caller_state, call_taker_message, session_id, trace)
+            streamer = TextIteratorStreamer(
+                self.tokenizer,
+                skip_prompt=True,
+                skip_special_tokens=True,
+                timeout=config.STREAM_TOKEN_TIMEOUT
+            )
+            max_new_tokens = self._token_budget(caller_state.emotional_state)
+            future = self.scheduler.submit(messages, session_id, prefixes, streamer=streamer, max_new_tokens=max_new_tokens, scenario_type=caller_state.scenario_type.value, trace=trace)
             
-            with self.lock:
-                outputs = self.pipeline(
-                    messages,
-                    max_new_tokens=256,   
-                    do_sample=True,
-                    temperature=0.2,     
-                    top_p=0.9,          
-                    eos_token_id=self.tokenizer.eos_token_id,
-                    pad_token_id=self.tokenizer.pad_token_id,
-                    repetition_penalty=1.05,
-                )
+            pending = ""
+            first_line_done = False
+            for text in streamer:
+                # Only the first line of the output survives clean_response, so drain the rest silently
+                if first_line_done or not text:
+                    continue
+                yield 'token', text
                 
-                response = outputs[0]['generated_text'][len(messages):].strip()
-            
-            response = self._clean_response(response, call_taker_message, caller_state.emotional_state, caller_state)
-            new_state = self._update_state(caller_state, call_taker_message, response)
+                pending += text
+                if '\n' in pending.lstrip():
+                    pending = pending.lstrip().split('\n', 1)[0]
+                    first_line_done = True
+                
+                while True:
+                    boundary = re.search(r'[.!?]+\s', pending)
+                    if not boundary:
+                        break
+                    sentence, pending = pending[:boundary.end()], pending[boundary.end():]
+                    sentence = clean_partial_response(sentence, caller_state.emotional_state)
+                    if sentence:
+                        yield 'sentence', sentence
             
-            return response, new_state
+            pending = clean_partial_response(pending, caller_state.emotional_state)
+            if pending:
+                yield 'sentence', pending
             
+            generation = future.result()
+            with stage(trace, 'clean_response'):
+                response = clean_response(generation, call_taker_message, caller_state.emotional_state, caller_state)
+            with stage(trace, 'update_state'):
+                new_state = self._update_state(caller_state, call_taker_message, response, trace)
+            yield 'done', (response, new_state)
+        
+        except (QueueFullError, ModelNotReadyError):
+            raise
         except Exception as e:
-            logger.error(f"Error generating response: {e}")
-            return "I need help!", caller_state
+            logger.error(f"Error streaming response: {e}")
+            yield 'done', ("I need help!", caller_state)
+    
+    @property
+    def model_loaded(self) -> bool:
+        return self.model is not None
+    
+    def at_capacity(self) -> bool:
+        return self.scheduler.at_capacity()
+    
+    def is_idle(self) -> bool:
+        return self.status == 'ready' and self.scheduler.pending == 0
+    
+    def retry_after(self) -> float:
+        return self.scheduler.retry_after()
+    
+    def startup(self) -> dict:
+        stages = dict(self.stage_seconds)
+        if self.status not in ('ready', 'failed'):
+            stages[self.status] = round(time.monotonic() - self.stage_started_at, 2)
+        return {'status': self.status, 'stage_seconds': stages, 'error': self.load_error}
+    
+    def stats(self) -> dict:
+        return {
+            'startup': self.startup(),
+            'inference_backend': self.backend.name,
+            'batching': self.scheduler.stats(),
+            'kv_cache': self.session_cache.stats(),
+            'prefix_cache': self.prefix_cache.stats(),
+            'token_usage': self.token_usage.stats(),
+            'context_window': self.context_window.stats(),
+            'speculative': self.speculative.stats() if self.draft_model is not None else None
+        }
+    
+    def _token_budget(self, emotional_state: EmotionalState) -> int:
+        return min(config.MAX_NEW_TOKENS, config.TOKEN_BUDGETS.get(emotional_state.value, config.MAX_NEW_TOKENS))
+    
+    def release_session(self, session_id: str):
+        self.session_cache.evict(session_id)
+    
+    def _generate_batch(self, requests: List[GenerationRequest]) -> List[str]:
+        started_at = time.perf_counter()
+        encoded = [
+            self.tokenizer(request.prompt, add_special_tokens=False)['input_ids']
+            for request in requests
+        ]
+        reused = [
+            max(
+                self.session_cache.take(request.session_id, token_ids),
+                self.prefix_cache.lookup(request.prefixes, token_ids),
+                key=lambda hit: hit[0]
+            )
+            for request, token_ids in zip(requests, encoded)
+        ]
+        cached_length, past_layers = stack_padded_layers(reused)
+        
+        # Rows are laid out as [pad | cached prefix | pad | new tokens] so every row's
+        # uncached suffix ends at the same column and its cached prefix lines up with the stacked cache
+        suffix_length = max(len(token_ids) - n for token_ids, (n, _) in zip(encoded, reused))
+        pad_id = self.tokenizer.pad_token_id
+        input_rows, mask_rows = [], []
+        for token_ids, (n, _) in zip(encoded, reused):
+            prefix, suffix = token_ids[:n], token_ids[n:]
+            prefix_padding = cached_length - n
+            suffix_padding = suffix_length - len(suffix)
+            input_rows.append([pad_id] * prefix_padding + prefix + [pad_id] * suffix_padding + suffix)
+            mask_rows.append([0] * prefix_padding + [1] * n + [0] * suffix_padding + [1] * len(suffix))
+        
+        input_ids = torch.tensor(input_rows, device=self.model.device)
+        attention_mask = torch.tensor(mask_rows, device=self.model.device)
+        past_key_values = DynamicCache.from_legacy_cache(tuple(past_layers)) if past_layers else None
+        prompt_length = input_ids.shape[1]
+        stopping = CallerTurnStoppingCriteria(
+            self.tokenizer,
+            prompt_length,
+            [request.max_new_tokens for request in requests],
+            max_sentences=config.STOP_MAX_SENTENCES
+        )
+        
+        # Assisted generation only supports a single sequence, so batches of several turns skip the draft model
+        assisted = self.draft_model is not None and len(requests) == 1
+        
+        waiting_at = time.perf_counter()
+        with self.lock, torch.inference_mode():
+            locked_at = time.perf_counter()
+            if assisted:
+                target_calls, draft_calls = self.target_forwards.calls, self.draft_forwards.calls
+                decode_started_at = time.perf_counter()
+            outputs = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                past_key_values=past_key_values,
+                max_new_tokens=max(request.max_new_tokens for request in requests),
+                stopping_criteria=StoppingCriteriaList([stopping]),
+                do_sample=True,
+                temperature=0.2,
+                top_p=0.9,
+                eos_token_id=self.tokenizer.eos_token_id,
+                pad_token_id=pad_id,
+                repetition_penalty=1.05,
+                return_dict_in_generate=True,
+                streamer=requests[0].streamer if len(requests) == 1 else None,
+                assistant_model=self.draft_model if assisted else None,
+            )
+            if assisted:
+                decode_ms = (time.perf_counter() - decode_started_at) * 1000
+                verify_steps = self.target_forwards.calls - target_calls
+                draft_tokens = self.draft_forwards.calls - draft_calls
+        generated_at = time.perf_counter()
+        
+        if assisted:
+            generated = outputs.sequences.shape[1] - prompt_length
+            acceptance = self.speculative.record(requests[0].scenario_type, generated, draft_tokens, verify_steps, decode_ms)
+            logger.info(f"Speculative decoding ({requests[0].scenario_type}): {generated} tokens in {verify_steps} verify steps, {acceptance:.0%} of {draft_tokens} draft tokens accepted")
+        elif self.draft_model is not None:
+            self.speculative.record_batched(len(requests))
+        
+        if self.session_cache.enabled or self.prefix_cache.enabled:
+            row_layers = split_padded_layers(outputs.past_key_values.to_legacy_cache(), attention_mask)
+            for request, token_ids, layers in zip(requests, encoded, row_layers):
+                self.session_cache.put(request.session_id, token_ids, layers)
+                for prefix in self.prefix_cache.missing(request.prefixes):
+                    prefix_ids = self.tokenizer(prefix, add_special_tokens=False)['input_ids']
+                    self.prefix_cache.put(prefix, prefix_ids, token_ids, layers)
+        cached_at = time.perf_counter()
+        
+        responses = [
+            self.tokenizer.decode(ids[prompt_length:], skip_special_tokens=True).strip()
+            for ids in outputs.sequences
+        ]
+        
+        generated_length = outputs.sequences.shape[1] - prompt_length
+        for row, response in enumerate(responses):
+            generated = stopping.stopped_at[row] or generated_length
+            first_line = next((line for line in response.split('\n') if line.strip()), '')
+            kept = min(generated, len(self.tokenizer(first_line, add_special_tokens=False)['input_ids']))
+            self.token_usage.record(generated, kept, stopping.reasons[row])
+            logger.info(f"Generated {generated} tokens, kept {kept} (stop: {stopping.reasons[row] or 'max_new_tokens'})")
+        
+        first_step_at = stopping.first_step_at or generated_at
+        timings = {
+            'tokenize': waiting_at - started_at,
+            'lock_wait': locked_at - waiting_at,
+            'prefill': first_step_at - locked_at,
+            'decode': generated_at - first_step_at,
+            'kv_cache_store': cached_at - generated_at,
+            'detokenize': time.perf_counter() - cached_at
+        }
+        for row, request in enumerate(requests):
+            if request.trace is None:
+                continue
+            for name, seconds in timings.items():
+                request.trace.add(name, seconds)
+            request.trace.prompt_tokens += len(encoded[row])
+            request.trace.cached_tokens += reused[row][0]
+            request.trace.output_tokens += stopping.stopped_at[row] or generated_length
+            request.trace.batch_size = len(requests)
+        
+        return responses
     
     def _build_messages(self, caller_state: CallerState, call_taker_message: str, context: dict) -> str:
         system_prompt = self._create_system_prompt(caller_state, context)
         
+        folded, recent = self.context_window.split(caller_state.conversation_history)
+        if folded:
+            # Only details the folded questions asked about, so the summary stays fixed until the next fold
+            asked = {detail for exchange in folded if exchange.role == CALL_TAKER for detail in question_details(exchange.content, caller_state.scenario_type)}
+            details = [detail for detail in caller_state.key_details_revealed if detail in asked]
+            system_prompt = f"{system_prompt}\n\n{fold_summary(len(folded), details, context)}"
+        
         messages = [
             {"role": "system", "content": system_prompt}
         ]
         
-        for exchange in caller_state.conversation_history:
-            if exchange['role'] == 'call_taker':
-                messages.append({"role": "user", "content": exchange['content']})
-            elif exchange['role'] == 'caller':
-                messages.append({"role": "assistant", "content": exchange['content']})
+        for exchange in recent:
+            if exchange.role == CALL_TAKER:
+                messages.append({"role": "user", "content": exchange.content})
+            elif exchange.role == CALLER:
+                messages.append({"role": "assistant", "content": exchange.content})
         
         current_question_instruction = f"""The 911 operator asked: "{call_taker_message}"
 
@@ -144,41 +490,34 @@ Respond naturally as a real person would. Don't sound like you're reading from a
         return emotional_contexts.get(emotional_state, "You're concerned but trying to communicate clearly.")
     
     def _create_system_prompt(self, caller_state: CallerState, context: dict) -> str:
+        return "\n\n".join(self._system_prompt_blocks(caller_state, context))
+    
+    def _system_prompt_blocks(self, caller_state: CallerState, context: dict) -> List[str]:
+        # Ordered from most to least shared so the leading blocks can be served from the prefix cache:
+        # instructions are identical for every session, scenario facts for every session on that context
         is_first_response = len(caller_state.conversation_history) == 0
         
         if is_first_response:
-            return f"""You are {context.get('caller_name', '')} calling 911 about an accident.
+            instructions = """You are calling 911 about an accident.
 
     CRITICAL: STAY WITHIN YOUR SCENARIO
     - Only reference the location, people, and details from YOUR specific scenario
     - Do not mix information from other scenarios or locations
-    - Stick to the facts as described in {context['current_status']} and {context['caller_background']}
+    - Stick to the facts as described in your current status and your role below
     - When asked "911, what is your emergency?" do NOT give away all the details of the situation, do not reveal car color, make, model, exact location, or license plates unless explicitly asked
 
-    What happened: {context.get('situation', '')}
-    Location: {context.get('location', '')}
-    Your role: {context.get('caller_background', '')}
-    Current status: {context.get('current_status', '')}
-    Your phone: {context.get('phone', '')}
-
     For your first response, keep it brief and natural like a real person would: "I've been in an accident" or "I need help, there's been a car accident."
 
-    Speak like a normal person - not perfectly polished. This is the ONLY situation you know about. Do not mention any other accidents, locations, or circumstances. Stay consistent with exactly what is described above throughout the entire conversation."""
-        
-        return f"""You are {context.get('caller_name', '')} calling 911 about an accident.
+    Speak like a normal person - not perfectly polished. This is the ONLY situation you know about. Do not mention any other accidents, locations, or circumstances. Stay consistent with exactly what is described below throughout the entire conversation."""
+        else:
+            instructions = """You are calling 911 about an accident.
 
     CRITICAL: STAY WITHIN YOUR SCENARIO
     - Only reference the location, people, and details from YOUR specific scenario
     - Do not mix information from other scenarios or locations
-    - Stick to the facts as described in {context['current_status']} and {context['caller_background']}
+    - Stick to the facts as described in your current status and your role below
     - When asked "Okay, tell me exactly what happened." do NOT give away all the details of the situation, do not reveal car color, make, model, exact location, or license plates unless explicitly asked
 
-    What happened: {context.get('situation', '')}
-    Location: {context.get('location', '')}
-    Your role: {context.get('caller_background', '')}
-    Current status: {context.get('current_status', '')}
-    Your phone: {context.get('phone', '')}
-
     Respond naturally like a real person in an emergency:
     - When asked "what happened": Give a brief summary without detailed specifics
     - Provide more details only when the operator asks specific questions
@@ -186,483 +525,135 @@ Respond naturally as a real person would. Don't sound like you're reading from a
     - It's okay to hesitate or be uncertain sometimes
     - Don't recite information like reading from a script
 
-    Answer the operator's question directly and naturally. This is the ONLY situation you know about. Do not mention any other accidents, locations, or circumstances. Stay consistent with exactly what is described above throughout the entire conversation."""
-
-    def _get_scenario_specific_prompt(self, context: dict) -> str:
-        return """You can only describe what is explicitly stated in your scenario facts above. Do not add details."""
-    
-    def _clean_response(self, response: str, question: str = "", emotional_state: EmotionalState = None, caller_state: CallerState = None) -> str:
-        artifacts = ["<|eot_id|>", "<|end_of_text|>", "<|start_header_id|>", "<|end_header_id|>", "*", "**", "`", "\"\"\""]
-        for artifact in artifacts:
-            response = response.replace(artifact, "")
-        
-        prefixes = ["assistant", "911 caller:", "Response:", "Caller:", "A:", "User:", "AI:", "The caller says:", "I would say:"]
-        for prefix in prefixes:
-            if response.lower().startswith(prefix.lower()):
-                response = response[len(prefix):].strip()
-        
-        response = response.replace("assistant", "").strip()
-        lines = [line.strip() for line in response.split('\n') if line.strip()]
-        if lines:
-            response = lines[0]
-        
-        response = re.sub(r'^"+|"+$', '', response)
-
-        response = self._remove_stage_directions(response)
-
-        response = self._fix_sentence_fragments(response)
-
-        response = self._fix_grammar_and_punctuation(response, emotional_state)
-
-        if len(response.split()) < 3 or not response.strip():
-            response = self._generate_fallback_response(question, caller_state)
-
-        response = re.sub(r'\(.*?\)', '', response)
-        response = re.sub(r'\[.*?\]', '', response)
-
-        response = self._remove_emotional_indicators(response)
-
-        response = self._naturalize_language(response, emotional_state)
-
-        response = self._fix_poor_grammar(response)
-
-        response = self._add_conversational_elements(response, emotional_state)
-
-        response = self._fix_hanging_phrases(response)
-
-        response = self._normalize_punctuation(response, emotional_state)
-
-        response = self._ensure_coherent_response(response, question)
-        
-        return response.strip()
-
-    def _remove_stage_directions(self, response: str) -> str:
-        stage_directions = [
-            r'\bpauses?\b', r'\bpause\b', r'\bgulps?\b', r'\bgulp\b',
-            r'\bsighs?\b', r'\bsigh\b', r'\btakes? a breath\b', r'\bbreathing heavily\b',
-            r'\bclears? throat\b', r'\bstutters?\b', r'\bhesitates?\b',
-            r'\bvoice shaking\b', r'\bvoice trembling\b', r'\bin a shaky voice\b',
-            r'\bpauses to collect myself\b', r'\bpauses to think\b',
-            r'\blooks around\b', r'\bgestures\b'
-        ]
-        
-        for direction in stage_directions:
-            response = re.sub(direction, '', response, flags=re.IGNORECASE)
- 
-        response = re.sub(r'\([^)]*(?:pause|gulp|sigh|breath|throat|stutter|hesitate|voice|look|gesture)[^)]*\)', '', response, flags=re.IGNORECASE)
-
-        theatrical_phrases = [
-            r'\bpauses to collect myself\b',
-            r'\btakes a deep breath\b',
-            r'\bvoice breaking\b',
-            r'\bwith emotion\b'
-        ]
+    Answer the operator's question directly and naturally. This is the ONLY situation you know about. Do not mention any other accidents, locations, or circumstances. Stay consistent with exactly what is described below throughout the entire conversation."""
         
-        for phrase in theatrical_phrases:
-            response = re.sub(phrase, '', response, flags=re.IGNORECASE)
-
-        response = re.sub(r'\s+', ' ', response)
-        response = re.sub(r'\.+', '.', response)
-        
-        return response.strip()
-
-    def _generate_fallback_response(self, question: str, caller_state: CallerState) -> str:
-        """Generate a fallback response when the original is too short or nonsensical"""
-        if not question:
-            return "I need help."
-        
-        question_lower = question.lower()
-        
-        if 'number' in question_lower or 'phone' in question_lower:
-            context = caller_state.caller_profile.get('selected_context', {}) if caller_state else {}
-            phone = context.get('phone', '587-555-0123')
-            return f"It's {phone}."
-        
-        elif 'location' in question_lower or 'where' in question_lower:
-            return "I'm not sure of the exact address."
-        
-        elif 'hurt' in question_lower or 'injured' in question_lower:
-            return "I'm not sure."
-        
-        elif 'happened' in question_lower or 'what' in question_lower:
-            return "There's been an accident."
-        
-        return "I'm not sure about that."
-
-    def _ensure_coherent_response(self, response: str, question: str) -> str:
-        """Final check to ensure the response makes sense and answers the question"""
-        if not response or len(response.split()) < 2:
-            return self._generate_fallback_response(question, None)
-
-        nonsense_patterns = [
-            r'\bthingamajig\b', r'\bwhatever\b', r'\banyway\b(?!\s+\w+)',
-            r'\bwherever I\'m anyway\b', r'\bthat\'s where I\'m\. wherever I\'m\b',
-            r'\bthis thingamajig has GPS on it\b'
-        ]
-        
-        for pattern in nonsense_patterns:
-            response = re.sub(pattern, '', response, flags=re.IGNORECASE)
-
-        response = re.sub(r'\s+', ' ', response).strip()
-
-        if len(response.split()) < 3:
-            return self._generate_fallback_response(question, None)
-        
-        return response
-
-    def _fix_sentence_fragments(self, response: str) -> str:
-        response = re.sub(r'^\s*([A-Z])\.\s*([A-Z])', r'\1\2', response)
-        response = re.sub(r'^\s*([A-Z][a-z]*)\.\s*([A-Z][a-z]*)', r'\1 \2', response)
-        response = re.sub(r'^\s*([A-Z][a-z]*)\.\s+([A-Z][a-z]*)', r'\1 \2', response)
-        response = re.sub(r'^([A-Z][a-z]*)\.\s*([A-Z][a-z]*)', r'\1 \2', response)
-        response = re.sub(r'^\s*([A-Z][a-z]{1,3})\.\s*([A-Z])', r'\1 \2', response)
-        
-        response = re.sub(r'\b([A-Z][a-z]{1,3})\.\s*([A-Z][a-z])', r'\1 \2', response)
-
-        response = re.sub(r'\bIt\.\s*It\'s\b', "It's", response)
-        response = re.sub(r'\bMy\.\s*Uh\.\s*', "My ", response)
-        response = re.sub(r'\bWe\.\s*We\'re\b', "We're", response)
-        
-        return response.strip()
-
-    def _fix_grammar_and_punctuation(self, response: str, emotional_state: EmotionalState = None) -> str:
-        sentences = re.split(r'([.!?]+)', response)
-        corrected_sentences = []
-        
-        for i, part in enumerate(sentences):
-            if i % 2 == 0:
-                part = part.strip()
-                if part:
-                    part = part[0].upper() + part[1:] if len(part) > 1 else part.upper()
-                corrected_sentences.append(part)
-            else:  
-                corrected_sentences.append(part)
-        
-        response = ''.join(corrected_sentences)
-        
-        response = re.sub(r'([.!?])([A-Za-z])', r'\1 \2', response)
-
-        response = re.sub(r'\bi\b', 'I', response)
-        
-        return response
-    
-    def _normalize_punctuation(self, response: str, emotional_state: EmotionalState = None) -> str:
-        response = re.sub(r'!+', '!', response)
-        response = re.sub(r'!\s*!', '!', response)
-        
-        response = re.sub(r'\.\.\.+', '.', response)
-        response = re.sub(r'\.\s*\.', '.', response)
-        response = re.sub(r'\.\s+$', '.', response)
-        
-        response = re.sub(r'[!?]\.', '.', response)
-        response = re.sub(r'\.!', '.', response)
-        
-        exclamation_pattern = r'!(?=\s+[A-Z]|\s*$)'
-        
-        if emotional_state in [EmotionalState.CALM, EmotionalState.WORRIED, EmotionalState.RELIEVED]:
-            response = re.sub(exclamation_pattern, '.', response)
-        elif emotional_state in [EmotionalState.PANICKED, EmotionalState.HYSTERICAL]:
-            exclamation_count = len(re.findall(r'!', response))
-            if exclamation_count > 2:
-                matches = list(re.finditer(r'!', response))
-                for i, match in enumerate(matches[2:], 2):
-                    response = response[:match.start()] + '.' + response[match.end():]
-        
-        if not response.endswith(('.', '!', '?')):
-            sentences = re.split(r'[.!?]', response)
-            if sentences and sentences[-1].strip():
-                response = response + '.'
-            else:
-                response = response.rstrip() + '.'
-        
-        response = re.sub(r',\s*\.\.\.', ',', response)
-        response = re.sub(r'\s+\.\.\.', '.', response)
-        
-        response = re.sub(r'([.!?])\1+', r'\1', response)
-        
-        return response
-    
-    def _fix_hanging_phrases(self, response: str) -> str:
-        hanging_patterns = [
-            (r'\bit seems!$', '.'),
-            (r'\bit seems\.$', '.'),
-            (r'\bit looks!$', '.'),
-            (r'\bit looks\.$', '.'),
-            (r'\byou know!$', '.'),
-            (r'\byou know\.$', '.'),
-            (r'\bi guess!$', '.'),
-            (r'\bi guess\.$', '.'),
-            (r'\bi think!$', '.'),
-            (r'\bi think\.$', '.'),
-            (r'\bI mean!$', '.'),
-            (r'\bI mean\.$', '.'),
-            (r'\blike!$', '.'),
-            (r'\blike\.$', '.'),
-            (r'\bso!$', '.'),
-            (r'\bso\.$', '.'),
-            (r'\band!$', '.'),
-            (r'\band\.$', '.'),
-            (r'\bbut!$', '.'),
-            (r'\bbut\.$', '.'),
-            (r'\bor!$', '.'),
-            (r'\bor\.$', '.'),
-        ]
-        
-        for pattern, replacement in hanging_patterns:
-            response = re.sub(pattern, replacement, response, flags=re.IGNORECASE)
-        
-        hanging_words = ['seems', 'looks', 'thinks', 'guess', 'mean', 'like', 'so', 'and', 'but', 'or']
-        words = response.split()
-        if len(words) > 1 and words[-1].rstrip('!.').lower() in hanging_words:
-            if words[-1].endswith(('!', '.')):
-                words[-1] = words[-1][:-1] + '.'
-            response = ' '.join(words)
+        scenario = f"""    What happened: {context.get('situation', '')}
+    Location: {context.get('location', '')}
+    Your role: {context.get('caller_background', '')}
+    Current status: {context.get('current_status', '')}"""
         
-        response = re.sub(r'\s+([.!?])', r'\1', response)
+        identity = f"""    Your name: {context.get('caller_name', '')}
+    Your phone: {context.get('phone', '')}"""
         
-        return response
+        return [instructions, scenario, identity]
     
-    def _remove_emotional_indicators(self, response: str) -> str:
-        words = response.split()
-        filtered_words = []
-
-        excessive_descriptors = [
-            "distraught", "agitated", "traumatized", "apprehensive"
-        ]
-        
-        for word in words:
-            if word.lower() in excessive_descriptors:
-                continue
-            filtered_words.append(word)
-        
-        return ' '.join(filtered_words)
+    def _prompt_prefixes(self, prompt: str, caller_state: CallerState, context: dict) -> List[str]:
+        """Rendered prompt text up to the end of each shareable system prompt block"""
+        blocks = self._system_prompt_blocks(caller_state, context)
+        prefixes = []
+        shared = ""
+        for block in blocks[:-1]:
+            shared = f"{shared}\n\n{block}" if shared else block
+            position = prompt.find(shared)
+            if position < 0:
+                break
+            prefixes.append(prompt[:position + len(shared)])
+        return prefixes
     
-    def _naturalize_language(self, response: str, emotional_state: EmotionalState = None) -> str:
-        basic_replacements = {
-            r'\bvehicle\b': 'car',
-            r'\bautomobile\b': 'car',
-            r'\bindividuals\b': 'people',
-            r'\bapproximately\b': 'about'
-        }
-        
-        for formal, natural in basic_replacements.items():
-            response = re.sub(formal, natural, response, flags=re.IGNORECASE)
-        
-        response = re.sub(r'\bI am\b', "I'm", response)
-        response = re.sub(r'\bdo not\b', "don't", response)
-        response = re.sub(r'\bcan not\b', "can't", response)
-        
-        return response
+    def prime_session(self, caller_state: CallerState, session_id: Optional[str] = None):
+        """Prefill the shared system prompt prefixes for a new session in the background"""
+        if self.prefix_cache.enabled and self.status == 'ready':
+            self.prefill_executor.submit(self._prefill_prefixes, caller_state)
     
-    def _fix_poor_grammar(self, response: str) -> str:
-        grammar_fixes = {
-            r'\bplz\b': 'please',
-            r'\bu\b': 'you',
-            r'\bur\b': 'your',
-            r'\bcuz\b': 'because',
-            r'\bya\b': 'you',
-            r'\bem\b(?!\w)': 'them',
-            r'\bn\b(?=\s)': 'and'
-        }
-        
-        for incorrect, correct in grammar_fixes.items():
-            response = re.sub(incorrect, correct, response, flags=re.IGNORECASE)
-        
-        response = re.sub(r'\bthey coulda\b', 'they could have', response, flags=re.IGNORECASE)
-        response = re.sub(r'\bwoulda\b', 'would have', response, flags=re.IGNORECASE)
-        response = re.sub(r'\bshoulda\b', 'should have', response, flags=re.IGNORECASE)
+    def _prefill_prefixes(self, caller_state: CallerState):
+        context = caller_state.caller_profile.get('selected_context')
+        if not context:
+            return
         
-        return response
-    
-    def _add_conversational_elements(self, response: str, emotional_state: EmotionalState = None) -> str:
-        if len(response.split()) < 4:
-            return response
-
-        simple_starters = ["Well, "]
-        simple_fillers = [" um"]
-
-        starter_prob = 0.03
-        filler_prob = 0.05
+        try:
+            prompt = self.tokenizer.apply_chat_template(
+                [{"role": "system", "content": self._create_system_prompt(caller_state, context)}],
+                tokenize=False
+            )
+            prefixes = self.prefix_cache.missing(self._prompt_prefixes(prompt, caller_state, context))
+            if not prefixes:
+                return
             
-        if random.random() < starter_prob:
-            if not response.lower().startswith(('well', 'so', 'um')):
-                response = random.choice(simple_starters) + response.lower()
-
-        if random.random() < filler_prob:
-            words = response.split()
-            if len(words) > 5:
-                insert_pos = random.randint(1, len(words)-2)
-                words.insert(insert_pos, random.choice(simple_fillers))
-                response = " ".join(words)
-        
-        return response
+            token_ids = self.tokenizer(prefixes[-1], add_special_tokens=False)['input_ids']
+            with self.lock, torch.inference_mode():
+                outputs = self.model(
+                    input_ids=torch.tensor([token_ids], device=self.model.device),
+                    use_cache=True
+                )
+            layers = outputs.past_key_values.to_legacy_cache()
+            
+            for prefix in prefixes:
+                prefix_ids = self.tokenizer(prefix, add_special_tokens=False)['input_ids']
+                self.prefix_cache.put(prefix, prefix_ids, token_ids, layers)
+        except Exception as e:
+            logger.warning(f"Failed to prefill system prompt prefix: {e}")
+    
+    def _get_scenario_specific_prompt(self, context: dict) -> str:
+        return """You can only describe what is explicitly stated in your scenario facts above. Do not add details."""
     
     def _validate_response_addresses_question(self, question: str, response: str) -> bool:
         question_lower = question.lower()
-        response_lower = response.lower()
-        
-        question_types = {
-            'safe': ['safe', 'okay', 'alright', 'unhurt', 'injured', 'hurt'],
-            'location': ['where', 'location', 'address', 'area', 'place'],
-            'people': ['people', 'person', 'victim', 'individual', 'man', 'woman', 'child', 'driver', 'passenger'],
-            'vehicle': ['vehicle', 'car', 'truck', 'suv', 'van', 'motorcycle', 'bicycle'],
-            'hazard': ['hazard', 'danger', 'leak', 'fire', 'smoke', 'wire', 'fluid', 'spill', 'chemical'],
-            'medical': ['medical', 'ambulance', 'hurt', 'injured', 'wounded', 'bleeding', 'conscious', 'breathing'],
-            'count': ['many', 'much', 'number', 'count', 'how many', 'how much', 'total'],
-            'description': ['describe', 'look like', 'color', 'model', 'type', 'kind', 'make', 'appearance']
-        }
+        asked = answer_check_matcher.hits(question_lower)
+        answered = answer_word_matcher.hits(response)
         
-        for q_type, keywords in question_types.items():
-            if any(kw in question_lower for kw in keywords):
-                if not any(kw in response_lower for kw in keywords):
-                    return False
+        # Every kind of question asked needs one of its keywords in the answer
+        if asked - answered:
+            return False
         
         if question_lower.startswith(('is ', 'are ', 'do ', 'does ', 'did ', 'was ', 'were ', 'has ', 'have ', 'can ', 'could ')):
-            if not any(word in response_lower for word in ['yes', 'no', 'not sure', 'i think', 'probably', 'maybe', 'i believe', 'it seems']):
+            if 'yes_no' not in answered:
                 return False
         
-        if 'how many' in question_lower and not any(word.isdigit() for word in response_lower.split()):
+        if 'how many' in question_lower and not any(word.isdigit() for word in response.split()):
             return False
             
-        if 'what color' in question_lower and not any(color_word in response_lower for color_word in ['white', 'black', 'red', 'blue', 'green', 'yellow', 'silver', 'gray', 'brown']):
+        if 'what color' in question_lower and 'color' not in answered:
             return False
         
         return True
     
-    def _update_state(self, caller_state: CallerState, call_taker_message: str, response: str) -> CallerState:
-        new_state = CallerState(
-            emotional_state=caller_state.emotional_state,
-            intensity=caller_state.intensity,
-            scenario_type=caller_state.scenario_type,
-            key_details_revealed=caller_state.key_details_revealed.copy(),
-            conversation_history=caller_state.conversation_history.copy(),
-            caller_profile=caller_state.caller_profile.copy(),
-            scenario_progress=caller_state.scenario_progress
+    def _update_state(self, caller_state: CallerState, call_taker_message: str, response: str, trace: Optional[Trace] = None) -> CallerState:
+        now = time.time()
+        conversation_history = caller_state.conversation_history.append(
+            Exchange.create(CALL_TAKER, call_taker_message, now),
+            Exchange.create(CALLER, response, now)
         )
         
-        new_state.conversation_history.append({
-            'role': 'call_taker', 
-            'content': call_taker_message,
-            'timestamp': datetime.now().isoformat()
-        })
-        new_state.conversation_history.append({
-            'role': 'caller', 
-            'content': response,
-            'timestamp': datetime.now().isoformat()
-        })
-        
-        question_types = {
-            'location': ['where', 'location', 'address', 'street', 'avenue', 'road', 'highway', 'intersection'],
-            'situation': ['happened', 'wrong', 'emergency', 'problem', 'issue', 'occurred'],
-            'people': ['anyone', 'people', 'others', 'children', 'person', 'victim', 'individual', 'driver', 'passenger'],
-            'medical': ['hurt', 'injured', 'medical', 'conscious', 'bleeding', 'breathing', 'wounded', 'ambulance'],
-            'contact': ['phone', 'number', 'contact', 'callback', 'call you back', 'reach you'],
-            'details': ['describe', 'look like', 'color', 'model', 'type', 'kind', 'make', 'appearance'],
-            'vehicle': ['vehicle', 'car', 'truck', 'suv', 'van', 'motorcycle', 'license', 'plate'],
-            'hazards': ['hazard', 'danger', 'leak', 'fire', 'smoke', 'wire', 'fluid', 'chemical', 'spill']
-        }
-        
-        for detail, keywords in question_types.items():
-            if any(kw in call_taker_message.lower() for kw in keywords):
-                if detail not in new_state.key_details_revealed:
-                    new_state.key_details_revealed.append(detail)
-                    new_state.scenario_progress = min(1.0, new_state.scenario_progress + 0.15)
-        
-        question_quality = self._assess_response_quality(call_taker_message, response)
-        
-        if "calm down" in call_taker_message.lower() or "stay calm" in call_taker_message.lower():
-            new_state.intensity = max(1, new_state.intensity - 1)
-        elif "help is coming" in call_taker_message.lower() or "on the way" in call_taker_message.lower():
-            new_state.intensity = max(3, new_state.intensity - 2)
-        elif "urgent" in response.lower() or "quickly" in response.lower() or "hurry" in response.lower():
-            new_state.intensity = min(10, new_state.intensity + 1)
+        key_details_revealed = caller_state.key_details_revealed
+        scenario_progress = caller_state.scenario_progress
+        matched = message_matcher(caller_state.scenario_type).match(call_taker_message)
+        for detail in matched:
+            if detail not in MESSAGE_INTENTS and detail not in key_details_revealed:
+                key_details_revealed += (detail,)
+                scenario_progress = min(1.0, scenario_progress + 0.15)
+        
+        with stage(trace, 'quality_scoring'):
+            question_quality = self.quality_scorer.score(call_taker_message, response)
+        
+        intensity = caller_state.intensity
+        if 'calm' in matched:
+            intensity = max(1, intensity - 1)
+        elif 'help_coming' in matched:
+            intensity = max(3, intensity - 2)
+        elif 'urgency' in response_matcher.hits(response):
+            intensity = min(10, intensity + 1)
         
         if question_quality < 0.5:
-            new_state.intensity = min(10, new_state.intensity + 0.5)
+            intensity = min(10, intensity + 0.5)
         elif question_quality > 0.8:
-            new_state.intensity = max(1, new_state.intensity - 0.3)
-        
-        if new_state.intensity <= 3:
-            new_state.emotional_state = EmotionalState.RELIEVED
-        elif new_state.intensity <= 5:
-            new_state.emotional_state = EmotionalState.WORRIED
-        elif new_state.intensity <= 8:
-            new_state.emotional_state = EmotionalState.PANICKED
+            intensity = max(1, intensity - 0.3)
+        
+        if intensity <= 3:
+            emotional_state = EmotionalState.RELIEVED
+        elif intensity <= 5:
+            emotional_state = EmotionalState.WORRIED
+        elif intensity <= 8:
+            emotional_state = EmotionalState.PANICKED
         else:
-            new_state.emotional_state = EmotionalState.HYSTERICAL
-        
-        return new_state
-
-    def _assess_response_quality(self, question: str, response: str) -> float:
-        if not question.strip():
-            return 0.8
-        
-        if self.nlp is None:
-            return self._fallback_assess_response_quality(question, response)
-        
-        try:
-            doc_question = self.nlp(question.lower())
-            doc_response = self.nlp(response.lower())
-            
-            question_nouns = {token.lemma_ for token in doc_question if token.pos_ in ['NOUN', 'PROPN']}
-            response_nouns = {token.lemma_ for token in doc_response if token.pos_ in ['NOUN', 'PROPN']}
-            
-            question_verbs = {token.lemma_ for token in doc_question if token.pos_ == 'VERB'}
-            response_verbs = {token.lemma_ for token in doc_response if token.pos_ == 'VERB'}
-            
-            noun_overlap = len(question_nouns.intersection(response_nouns)) / len(question_nouns) if question_nouns else 0
-            verb_overlap = len(question_verbs.intersection(response_verbs)) / len(question_verbs) if question_verbs else 0
-            
-            overlap = (noun_overlap + verb_overlap) / 2
-            
-            if any(word in question.lower() for word in ['how many', 'number', 'count']):
-                has_number = any(token.like_num for token in doc_response)
-                return 0.8 if has_number else 0.3
-            
-            elif any(word in question.lower() for word in ['where', 'location', 'address']):
-                location_ents = any(ent.label_ in ['GPE', 'LOC', 'FAC'] for ent in doc_response.ents)
-                location_words = any(word in response.lower() for word in ['here', 'there', 'street', 'avenue', 'road', 'highway', 'deerfoot', 'intersection'])
-                return 0.9 if (location_ents or location_words) else 0.4
-            
-            elif any(word in question.lower() for word in ['what color', 'color']):
-                color_words = ['white', 'black', 'red', 'blue', 'green', 'yellow', 'orange', 'purple', 'brown', 'gray', 'silver']
-                has_color = any(word in response.lower() for word in color_words)
-                return 0.9 if has_color else 0.3
-            
-            elif question.lower().startswith(('is ', 'are ', 'do ', 'does ', 'did ', 'was ', 'were ', 'has ', 'have ')):
-                has_yes_no = any(word in response.lower() for word in ['yes', 'no', 'not sure', 'i think', 'probably', 'maybe'])
-                return 0.8 if has_yes_no else 0.4
-            
-            return min(1.0, overlap * 1.5)
-        except Exception as e:
-            logger.warning(f"spaCy processing failed: {e}. Using fallback assessment.")
-            return self._fallback_assess_response_quality(question, response)
-    
-    def _fallback_assess_response_quality(self, question: str, response: str) -> float:
-        question_lower = question.lower()
-        response_lower = response.lower()
-        
-        question_words = set(question_lower.split())
-        response_words = set(response_lower.split())
-        
-        overlap = len(question_words.intersection(response_words)) / len(question_words) if question_words else 0
+            emotional_state = EmotionalState.HYSTERICAL
         
-        if any(word in question_lower for word in ['how many', 'number', 'count']):
-            has_number = any(word.isdigit() for word in response_lower.split())
-            return 0.8 if has_number else 0.3
-        
-        elif any(word in question_lower for word in ['where', 'location', 'address']):
-            location_words = ['here', 'there', 'street', 'avenue', 'road', 'highway', 'deerfoot', 'intersection']
-            has_location = any(word in response_lower for word in location_words)
-            return 0.9 if has_location else 0.4
-        
-        elif any(word in question_lower for word in ['what color', 'color']):
-            color_words = ['white', 'black', 'red', 'blue', 'green', 'yellow', 'orange', 'purple', 'brown', 'gray', 'silver']
-            has_color = any(word in response_lower for word in color_words)
-            return 0.9 if has_color else 0.3
-        
-        elif question_lower.startswith(('is ', 'are ', 'do ', 'does ', 'did ', 'was ', 'were ', 'has ', 'have ')):
-            has_yes_no = any(word in response_lower for word in ['yes', 'no', 'not sure', 'i think', 'probably', 'maybe'])
-            return 0.8 if has_yes_no else 0.4
-        
-        return min(1.0, overlap * 1.5)
+        # The profile is never modified after the session starts, so every state shares it
+        return CallerState(
+            emotional_state=emotional_state,
+            intensity=intensity,
+            scenario_type=caller_state.scenario_type,
+            key_details_revealed=key_details_revealed,
+            conversation_history=conversation_history,
+            caller_profile=caller_state.caller_profile,
+            scenario_progress=scenario_progress
+        )
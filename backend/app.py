@@ -1,13 +1,26 @@
 import os
+import atexit
+import gzip
+import json
+import math
 import logging
+import multiprocessing
 from datetime import datetime
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 import redis
 
+import config
 from ai_generator import HuggingFaceCallerGenerator
-from session_manager import SessionManager
+from batch_scheduler import ModelNotReadyError, QueueFullError
+from opening_pool import OpeningLinePool
+from scenario_contexts import catalog
+from session_history import SessionHistoryStore
+from session_manager import SCENARIO_CODES, SessionManager
+from session_reaper import SessionReaper
+from session_store import create_session_store
+from tracing import Trace, metrics, stage
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -20,17 +33,103 @@ try:
     redis_client = redis.Redis(
         host=os.getenv('REDIS_HOST', 'localhost'),
         port=int(os.getenv('REDIS_PORT', 6379)),
-        db=0,
-        decode_responses=True
+        db=0
     )
     redis_client.ping()
     logger.info("Connected to Redis")
 except:
-    logger.warning("Redis not available - using in-memory session storage")
+    logger.warning("Redis not available")
     redis_client = None
 
-generator = HuggingFaceCallerGenerator()
-session_manager = SessionManager()
+def create_generator():
+    if config.MODEL_WORKERS > 1:
+        from worker_pool import ModelWorkerPool
+        return ModelWorkerPool(config.MODEL_WORKERS, max_pending=config.MAX_PENDING_GENERATIONS)
+    if config.STUB_GENERATOR:
+        from stub_generator import StubCallerGenerator
+        return StubCallerGenerator(config.STUB_TOKEN_DELAY_MS, config.STUB_PREFILL_MS, background=True)
+    return HuggingFaceCallerGenerator(background=True)
+
+# The model loads in the background so the server binds immediately; /health reports its progress.
+# Model worker processes re-import this module as __mp_main__; only the server process builds a generator
+generator = create_generator() if multiprocessing.current_process().name == 'MainProcess' else None
+session_history = SessionHistoryStore(
+    config.SESSION_HISTORY_DB,
+    batch_size=config.SESSION_HISTORY_BATCH_SIZE,
+    flush_interval=config.SESSION_HISTORY_FLUSH_INTERVAL
+) if config.SESSION_HISTORY_DB else None
+session_manager = SessionManager(create_session_store(redis_client), history=session_history)
+session_reaper = SessionReaper(
+    session_manager,
+    archive_dir=config.TRANSCRIPT_ARCHIVE_DIR,
+    idle_timeout=config.SESSION_IDLE_TIMEOUT,
+    ended_retention=config.SESSION_ENDED_RETENTION,
+    interval=config.REAPER_INTERVAL,
+    on_expire=generator.release_session if generator else None
+)
+opening_pool = OpeningLinePool(
+    generator,
+    session_manager,
+    catalog,
+    size=config.OPENING_POOL_SIZE,
+    greetings=config.OPENING_GREETINGS
+) if generator and config.OPENING_POOL_SIZE else None
+if generator:
+    session_reaper.start()
+if generator and session_history:
+    session_history.start()
+    atexit.register(session_history.close)
+if opening_pool:
+    opening_pool.start()
+
+def pooled_opening(session, message):
+    """(response, new_state) from the opening line pool, or None to generate as usual"""
+    return opening_pool.serve(session.caller_state, message) if opening_pool else None
+
+def finish_message(session_id, message, caller_response, updated_state, trace=None):
+    with stage(trace, 'session_save'):
+        session_manager.update_session(session_id, updated_state)
+    
+    logger.info(f"Message exchange in {session_id}: {message[:30]}... -> {caller_response[:30]}...")
+    
+    return {
+        'caller_response': caller_response,
+        'emotional_state': updated_state.emotional_state.value,
+        'intensity': updated_state.intensity,
+        'scenario_progress': updated_state.scenario_progress,
+        'key_details_revealed': updated_state.key_details_revealed,
+        'conversation_history': [exchange.to_dict() for exchange in updated_state.conversation_history[-4:]]
+    }
+
+def sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+def queue_full_response(retry_after):
+    response = jsonify({'error': 'Server busy, retry later', 'retry_after': math.ceil(retry_after)})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(math.ceil(retry_after))
+    return response
+
+def not_ready_response(error):
+    retry_after = math.ceil(error.retry_after)
+    response = jsonify({'error': 'Model is still starting up, retry later', 'model_status': error.status, 'retry_after': retry_after})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+@app.before_request
+def start_trace():
+    if request.path.startswith('/api/'):
+        g.trace = Trace(request.endpoint or 'unknown')
+
+@app.after_request
+def finish_trace(response):
+    """Server-Timing header and /metrics for API requests; streamed responses are recorded when the stream ends"""
+    trace = g.get('trace')
+    if trace is not None and not response.is_streamed:
+        response.headers['Server-Timing'] = trace.server_timing()
+        metrics.observe(trace, response.status_code)
+    return response
 
 @app.route('/api/sessions', methods=['POST'])
 def create_session():
@@ -40,6 +139,7 @@ def create_session():
         scenario_type = data.get('scenario_type', '10-01')
         
         session = session_manager.create_session(trainee_id, scenario_type)
+        generator.prime_session(session.caller_state, session.session_id)
         
         logger.info(f"Created session {session.session_id} for {scenario_type}")
         
@@ -53,6 +153,80 @@ def create_session():
         logger.error(f"Error creating session: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+def pregenerate_openings(sessions):
+    """Generate each caller's answer to the opening question in one batched pass and store it as the first exchange"""
+    futures, openings = {}, {}
+    for session in sessions:
+        pooled = pooled_opening(session, config.OPENING_QUESTION)
+        if pooled:
+            session_manager.update_session(session.session_id, pooled[1])
+            openings[session.session_id] = {'opening_line': pooled[0]}
+            continue
+        try:
+            futures[session.session_id] = generator.submit_response(session.caller_state, config.OPENING_QUESTION, session.session_id)
+        except (QueueFullError, ModelNotReadyError) as e:
+            openings[session.session_id] = {'opening_error': str(e)}
+    
+    for session_id, future in futures.items():
+        try:
+            caller_response, updated_state = future.result()
+            session_manager.update_session(session_id, updated_state)
+            openings[session_id] = {'opening_line': caller_response}
+        except Exception as e:
+            logger.error(f"Error pregenerating opening for {session_id}: {e}")
+            openings[session_id] = {'opening_error': 'Generation failed'}
+    return openings
+
+@app.route('/api/sessions/bulk', methods=['POST'])
+def create_sessions_bulk():
+    try:
+        data = request.get_json() or {}
+        entries = data.get('sessions')
+        if not isinstance(entries, list) or not entries:
+            return jsonify({'error': 'sessions must be a non-empty list'}), 400
+        if len(entries) > config.MAX_BULK_SESSIONS:
+            return jsonify({'error': f'At most {config.MAX_BULK_SESSIONS} sessions per request'}), 400
+        
+        results = [None] * len(entries)
+        accepted = []
+        for index, entry in enumerate(entries):
+            if not isinstance(entry, dict):
+                results[index] = {'index': index, 'status': 'failed', 'error': 'Expected an object with trainee_id and scenario_type'}
+                continue
+            scenario_type = entry.get('scenario_type', '10-01')
+            if scenario_type not in SCENARIO_CODES:
+                results[index] = {'index': index, 'status': 'failed', 'error': f"Unknown scenario type '{scenario_type}'"}
+                continue
+            accepted.append((index, entry.get('trainee_id', 'default'), scenario_type))
+        
+        sessions = session_manager.create_sessions([(trainee_id, scenario_type) for _, trainee_id, scenario_type in accepted]) if accepted else []
+        pregenerate = bool(data.get('pregenerate_opening'))
+        openings = pregenerate_openings(sessions) if pregenerate else {}
+        
+        for (index, _, _), session in zip(accepted, sessions):
+            if not pregenerate:
+                generator.prime_session(session.caller_state, session.session_id)
+            results[index] = {
+                'index': index,
+                'session_id': session.session_id,
+                'trainee_id': session.trainee_id,
+                'scenario_type': session.scenario_type.value,
+                'status': 'created',
+                **openings.get(session.session_id, {})
+            }
+        
+        logger.info(f"Bulk created {len(sessions)} of {len(entries)} sessions")
+        
+        return jsonify({
+            'created': len(sessions),
+            'failed': len(entries) - len(sessions),
+            'sessions': results
+        })
+    
+    except Exception as e:
+        logger.error(f"Error creating sessions: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @app.route('/api/sessions/<session_id>', methods=['GET'])
 def get_session(session_id):
     try:
@@ -67,17 +241,65 @@ def get_session(session_id):
             'intensity': session.caller_state.intensity,
             'scenario_progress': session.caller_state.scenario_progress,
             'is_active': session.is_active,
-            'key_details_revealed': session.caller_state.key_details_revealed
+            'key_details_revealed': session.caller_state.key_details_revealed,
+            'memory_bytes': session_manager.store.memory_usage(session_id)
         })
     
     except Exception as e:
         logger.error(f"Error getting session: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+def gzip_response(response):
+    """Compress a large response body for clients that accept gzip"""
+    response.vary.add('Accept-Encoding')
+    if 'gzip' in request.accept_encodings and (response.content_length or 0) >= config.CONVERSATION_GZIP_MIN_BYTES:
+        response.set_data(gzip.compress(response.get_data(), compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+@app.route('/api/sessions/<session_id>/conversation', methods=['GET'])
+def get_conversation(session_id):
+    """Exchanges from index `since` on, a page at a time. The history is append-only, so a page is identified by
+    its bounds, the history length and whether the call has ended, and the ETag is built from those without
+    rendering the page"""
+    try:
+        since = max(0, request.args.get('since', 0, type=int))
+        limit = max(1, min(request.args.get('limit', config.CONVERSATION_PAGE_SIZE, type=int), config.CONVERSATION_PAGE_SIZE))
+        
+        with stage(g.trace, 'session_load'):
+            page = session_manager.get_conversation(session_id, since, limit)
+        if page is None:
+            return jsonify({'error': 'Session not found'}), 404
+        
+        total, exchanges, is_active = page
+        next_since = min(since, total) + len(exchanges)
+        etag = f"{session_id}-{since}-{next_since}-{total}-{int(is_active)}"
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        else:
+            response = jsonify({
+                'session_id': session_id,
+                'since': since,
+                'next_since': next_since,
+                'total': total,
+                'has_more': next_since < total,
+                'is_active': is_active,
+                'exchanges': [exchange.to_dict() for exchange in exchanges]
+            })
+        response = gzip_response(response)
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    
+    except Exception as e:
+        logger.error(f"Error getting conversation: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @app.route('/api/sessions/<session_id>/end', methods=['POST'])
 def end_session(session_id):
     try:
         session_manager.terminate_session(session_id)
+        generator.release_session(session_id)
         logger.info(f"Terminated session {session_id}")
         return jsonify({'status': 'terminated'})
     except Exception as e:
@@ -90,40 +312,152 @@ def send_message(session_id):
         data = request.get_json()
         message = data.get('message', '')
         
-        session = session_manager.get_session(session_id)
+        with stage(g.trace, 'session_load'):
+            session = session_manager.get_session(session_id)
         if not session:
             return jsonify({'error': 'Session not found'}), 404
         
-        caller_response, updated_state = generator.generate_response(
-            session.caller_state, message
+        caller_response, updated_state = pooled_opening(session, message) or generator.generate_response(
+            session.caller_state, message, session_id, g.trace
         )
         
-        session_manager.update_session(session_id, updated_state)
-        
-        logger.info(f"Message exchange in {session_id}: {message[:30]}... -> {caller_response[:30]}...")
+        return jsonify(finish_message(session_id, message, caller_response, updated_state, g.trace))
+    
+    except QueueFullError as e:
+        logger.warning(f"Rejected message for {session_id}: {e}")
+        return queue_full_response(e.retry_after)
+    except ModelNotReadyError as e:
+        logger.warning(f"Rejected message for {session_id}: {e}")
+        return not_ready_response(e)
+    except Exception as e:
+        logger.error(f"Error processing message: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/sessions/<session_id>/message/stream', methods=['POST'])
+def stream_message(session_id):
+    data = request.get_json()
+    message = data.get('message', '')
+    trace = g.trace
+    
+    with stage(trace, 'session_load'):
+        session = session_manager.get_session(session_id)
+    if not session:
+        return jsonify({'error': 'Session not found'}), 404
+    
+    pooled = pooled_opening(session, message)
+    if pooled:
+        caller_response, updated_state = pooled
+        payload = [sse('sentence', {'text': caller_response}), sse('done', finish_message(session_id, message, caller_response, updated_state, trace))]
+        return Response(payload, mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    
+    try:
+        generator.check_ready()
+    except ModelNotReadyError as e:
+        return not_ready_response(e)
+    
+    if generator.at_capacity():
+        return queue_full_response(generator.retry_after())
+    
+    def events():
+        try:
+            for event, value in generator.stream_response(session.caller_state, message, session_id, trace):
+                if event != 'done':
+                    yield sse(event, {'text': value})
+                    continue
+                
+                caller_response, updated_state = value
+                yield sse('done', finish_message(session_id, message, caller_response, updated_state, trace))
+        except QueueFullError as e:
+            yield sse('error', {'error': 'Server busy, retry later', 'retry_after': math.ceil(e.retry_after)})
+        except ModelNotReadyError as e:
+            yield sse('error', {'error': 'Model is still starting up, retry later', 'model_status': e.status, 'retry_after': math.ceil(e.retry_after)})
+        except Exception as e:
+            logger.error(f"Error streaming message: {e}")
+            yield sse('error', {'error': 'Internal server error'})
+        finally:
+            metrics.observe(trace, 200)
+    
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def history_disabled_response():
+    return jsonify({'error': 'Session history is disabled'}), 404
+
+@app.route('/api/trainees/<trainee_id>/sessions', methods=['GET'])
+def trainee_sessions(trainee_id):
+    """A trainee's completed sessions, newest first; pass next_before back as before for the next page"""
+    if not session_history:
+        return history_disabled_response()
+    try:
+        limit = max(1, min(request.args.get('limit', 50, type=int), 200))
+        # The cursor is '<created_at>:<session_id>' of the last session on the previous page
+        before = request.args.get('before')
+        try:
+            if before:
+                created_at, session_id = before.split(':', 1)
+                before = (float(created_at), session_id)
+        except ValueError:
+            return jsonify({'error': 'before must be a next_before value from a previous page'}), 400
         
-        return jsonify({
-            'caller_response': caller_response,
-            'emotional_state': updated_state.emotional_state.value,
-            'intensity': updated_state.intensity,
-            'scenario_progress': updated_state.scenario_progress,
-            'key_details_revealed': updated_state.key_details_revealed,
-            'conversation_history': updated_state.conversation_history[-4:]
-        })
+        sessions, next_before = session_history.trainee_sessions(
+            trainee_id,
+            scenario_type=request.args.get('scenario_type'),
+            before=before or None,
+            limit=limit
+        )
+        next_before = f"{next_before[0]!r}:{next_before[1]}" if next_before else None
+        return jsonify({'trainee_id': trainee_id, 'sessions': sessions, 'next_before': next_before})
+    
+    except Exception as e:
+        logger.error(f"Error getting trainee sessions: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/analytics/scenarios', methods=['GET'])
+def scenario_analytics():
+    """Per-scenario aggregates over completed sessions, optionally for one trainee and since an ISO date"""
+    if not session_history:
+        return history_disabled_response()
+    try:
+        since = request.args.get('since')
+        try:
+            since = datetime.fromisoformat(since).timestamp() if since else None
+        except ValueError:
+            return jsonify({'error': 'since must be an ISO date or datetime'}), 400
         
+        return jsonify({'scenarios': session_history.scenario_stats(request.args.get('trainee_id'), since)})
+    
     except Exception as e:
-        logger.error(f"Error processing message: {e}")
+        logger.error(f"Error getting scenario analytics: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/metrics')
+def prometheus_metrics():
+    stats = generator.stats()
+    schedulers = [stats['batching']] if 'batching' in stats else [worker.get('batching', {}) for worker in stats.get('workers', [])]
+    gauges = {
+        'sim_model_ready': int(generator.status == 'ready'),
+        'sim_active_sessions': session_manager.active_session_count(),
+        'sim_generation_pending': sum(scheduler.get('pending', 0) for scheduler in schedulers),
+        'sim_generation_queue_depth': sum(scheduler.get('queue_depth', 0) for scheduler in schedulers)
+    }
+    return Response(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
 @app.route('/health')
 def health_check():
-    from session_manager import sessions
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
-        'model_loaded': generator.model is not None,
+        'model_loaded': generator.model_loaded,
+        'model_status': generator.status,
         'model_path': generator.model_path,
-        'active_sessions': len([s for s in sessions.values() if s.is_active])
+        'active_sessions': session_manager.active_session_count(),
+        'sessions': session_reaper.stats(),
+        'session_history': session_history.stats() if session_history else None,
+        'opening_pool': opening_pool.stats() if opening_pool else None,
+        **generator.stats()
     })
 
 if __name__ == '__main__':
@@ -132,8 +466,9 @@ if __name__ == '__main__':
     logger.info("Press Ctrl+C to stop")
     
     app.run(
-        host='0.0.0.0',
-        port=5001,
-        debug=False
+        host=os.getenv('HOST', '0.0.0.0'),
+        port=int(os.getenv('PORT', 5001)),
+        debug=False,
+        threaded=True
     )
     
\ No newline at end of file
@@ -0,0 +1,202 @@
+"""ASGI entry point: uvicorn asgi:asgi_app --host 0.0.0.0 --port 5001
+
+The message endpoints are served natively here so a pending generation is an awaiting coroutine
+rather than a blocked worker thread; a streamed turn is drained from the generator by its own thread.
+Every other route is handed to the Flask app, each request on a thread of its own.
+"""
+import asyncio
+import json
+import logging
+import math
+import re
+import threading
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+from app import app, generator, session_manager, finish_message, pooled_opening, sse
+from batch_scheduler import ModelNotReadyError, QueueFullError
+from tracing import Trace, metrics, stage
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_ROUTE = re.compile(r'^/api/sessions/([^/]+)/message$')
+STREAM_ROUTE = re.compile(r'^/api/sessions/([^/]+)/message/stream$')
+
+SSE_HEADERS = [
+    (b'content-type', b'text/event-stream'),
+    (b'cache-control', b'no-cache'),
+    (b'x-accel-buffering', b'no'),
+    (b'access-control-allow-origin', b'*')
+]
+
+class ThreadedWsgiInstance(WsgiToAsgiInstance):
+    # asgiref runs WSGI apps thread-sensitively, i.e. all on one shared thread, so one slow
+    # request would hold up every other; here each runs on a thread from the loop's pool
+    run_wsgi_app = sync_to_async(WsgiToAsgiInstance.__dict__['run_wsgi_app'].func, thread_sensitive=False)
+
+class ThreadedWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await ThreadedWsgiInstance(self.wsgi_application)(scope, receive, send)
+
+flask_app = ThreadedWsgiToAsgi(app)
+
+async def read_json(receive) -> dict:
+    body = b''
+    while True:
+        event = await receive()
+        body += event.get('body', b'')
+        if not event.get('more_body'):
+            break
+    return json.loads(body or b'{}')
+
+async def send_json(send, status: int, payload: dict, headers=(), trace=None):
+    body = json.dumps(payload).encode()
+    if trace is not None:
+        headers = [*headers, (b'server-timing', trace.server_timing().encode())]
+        metrics.observe(trace, status)
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            (b'access-control-allow-origin', b'*'),
+            *headers
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+async def send_busy(send, session_id: str, e: QueueFullError, trace: Trace):
+    logger.warning(f"Rejected message for {session_id}: {e}")
+    retry_after = math.ceil(e.retry_after)
+    await send_json(send, 429, {'error': 'Server busy, retry later', 'retry_after': retry_after},
+                    headers=[(b'retry-after', str(retry_after).encode())], trace=trace)
+
+async def send_not_ready(send, session_id: str, e: ModelNotReadyError, trace: Trace):
+    logger.warning(f"Rejected message for {session_id}: {e}")
+    retry_after = math.ceil(e.retry_after)
+    await send_json(send, 503, {'error': 'Model is still starting up, retry later', 'model_status': e.status, 'retry_after': retry_after},
+                    headers=[(b'retry-after', str(retry_after).encode())], trace=trace)
+
+async def send_message(session_id: str, receive, send):
+    trace = Trace('send_message')
+    try:
+        data = await read_json(receive)
+        message = data.get('message', '')
+
+        with stage(trace, 'session_load'):
+            session = session_manager.get_session(session_id)
+        if not session:
+            await send_json(send, 404, {'error': 'Session not found'}, trace=trace)
+            return
+
+        pooled = pooled_opening(session, message)
+        if pooled:
+            await send_json(send, 200, finish_message(session_id, message, *pooled, trace), trace=trace)
+            return
+
+        try:
+            future = generator.submit_response(session.caller_state, message, session_id, trace)
+        except QueueFullError as e:
+            await send_busy(send, session_id, e, trace)
+            return
+        except ModelNotReadyError as e:
+            await send_not_ready(send, session_id, e, trace)
+            return
+
+        caller_response, updated_state = await asyncio.wrap_future(future)
+        await send_json(send, 200, finish_message(session_id, message, caller_response, updated_state, trace), trace=trace)
+
+    except Exception as e:
+        logger.error(f"Error processing message: {e}")
+        await send_json(send, 500, {'error': 'Internal server error'}, trace=trace)
+
+async def stream_events(caller_state, message: str, session_id: str, trace: Trace):
+    """The generator's stream events; stream_response blocks between tokens, so a thread drains it into an asyncio queue"""
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def pump():
+        try:
+            for event in generator.stream_response(caller_state, message, session_id, trace):
+                loop.call_soon_threadsafe(events.put_nowait, event)
+        except Exception as e:
+            loop.call_soon_threadsafe(events.put_nowait, e)
+        loop.call_soon_threadsafe(events.put_nowait, None)
+
+    threading.Thread(target=pump, name="stream-pump", daemon=True).start()
+    while True:
+        event = await events.get()
+        if event is None:
+            return
+        if isinstance(event, Exception):
+            raise event
+        yield event
+
+async def stream_message(session_id: str, receive, send):
+    trace = Trace('stream_message')
+    try:
+        data = await read_json(receive)
+        message = data.get('message', '')
+
+        with stage(trace, 'session_load'):
+            session = session_manager.get_session(session_id)
+        if not session:
+            await send_json(send, 404, {'error': 'Session not found'}, trace=trace)
+            return
+
+        pooled = pooled_opening(session, message)
+        if pooled:
+            caller_response, updated_state = pooled
+            body = sse('sentence', {'text': caller_response}) + sse('done', finish_message(session_id, message, caller_response, updated_state, trace))
+            await send({'type': 'http.response.start', 'status': 200, 'headers': SSE_HEADERS})
+            await send({'type': 'http.response.body', 'body': body.encode()})
+            metrics.observe(trace, 200)
+            return
+
+        try:
+            generator.check_ready()
+        except ModelNotReadyError as e:
+            await send_not_ready(send, session_id, e, trace)
+            return
+        if generator.at_capacity():
+            await send_busy(send, session_id, QueueFullError(generator.retry_after()), trace)
+            return
+
+    except Exception as e:
+        logger.error(f"Error streaming message: {e}")
+        await send_json(send, 500, {'error': 'Internal server error'}, trace=trace)
+        return
+
+    await send({'type': 'http.response.start', 'status': 200, 'headers': SSE_HEADERS})
+    try:
+        async for event, value in stream_events(session.caller_state, message, session_id, trace):
+            if event != 'done':
+                chunk = sse(event, {'text': value})
+            else:
+                caller_response, updated_state = value
+                chunk = sse('done', finish_message(session_id, message, caller_response, updated_state, trace))
+            await send({'type': 'http.response.body', 'body': chunk.encode(), 'more_body': True})
+    except QueueFullError as e:
+        await send({'type': 'http.response.body', 'body': sse('error', {'error': 'Server busy, retry later', 'retry_after': math.ceil(e.retry_after)}).encode(), 'more_body': True})
+    except ModelNotReadyError as e:
+        await send({'type': 'http.response.body', 'body': sse('error', {'error': 'Model is still starting up, retry later', 'model_status': e.status, 'retry_after': math.ceil(e.retry_after)}).encode(), 'more_body': True})
+    except Exception as e:
+        logger.error(f"Error streaming message: {e}")
+        await send({'type': 'http.response.body', 'body': sse('error', {'error': 'Internal server error'}).encode(), 'more_body': True})
+    finally:
+        await send({'type': 'http.response.body', 'body': b''})
+        metrics.observe(trace, 200)
+
+async def asgi_app(scope, receive, send):
+    if scope['type'] == 'http' and scope['method'] == 'POST':
+        match = MESSAGE_ROUTE.match(scope['path'])
+        if match:
+            await send_message(match.group(1), receive, send)
+            return
+        match = STREAM_ROUTE.match(scope['path'])
+        if match:
+            await stream_message(match.group(1), receive, send)
+            return
+    await flask_app(scope, receive, send)
@@ -0,0 +1,226 @@
+"""Replays scripted call-taker turns through the caller generator and writes each script's responses,
+state trajectory and timing as JSONL, for regression-testing caller behaviour after prompt changes.
+
+    python batch_eval.py data/eval_scripts.jsonl --output eval.jsonl [--stub] [--resume] [--processes 4]
+
+Input lines are {"id": ..., "scenario_type": "10-01", "turns": ["911, what is your emergency?", ...]} with an
+optional "context" to pin the scenario context (otherwise one is drawn from the catalog, seeded by the script id).
+Scripts run a chunk of --batch-size at a time, one turn of every script in the chunk per batched generate call.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from transformers import set_seed
+
+import config
+from session_manager import SCENARIO_CODES, SessionManager
+from tracing import Trace
+
+logger = logging.getLogger(__name__)
+
+def load_scripts(path: str) -> List[dict]:
+    scripts = []
+    with open(path, 'r') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            script = json.loads(line)
+            if script.get('scenario_type') not in SCENARIO_CODES:
+                raise ValueError(f"{path}:{line_number}: unknown scenario_type {script.get('scenario_type')!r}")
+            if not script.get('turns'):
+                raise ValueError(f"{path}:{line_number}: script has no turns")
+            script.setdefault('id', f"{script['scenario_type']}-{line_number}")
+            script['index'] = len(scripts)
+            scripts.append(script)
+    return scripts
+
+def completed_ids(path: str) -> set:
+    """Ids already written to an output file. A line cut off by an interrupted run is dropped from the file
+    so appended records start on a line of their own."""
+    if not os.path.exists(path):
+        return set()
+    records = []
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    with open(path + '.tmp', 'w') as f:
+        f.writelines(json.dumps(record) + '\n' for record in records)
+    os.replace(path + '.tmp', path)
+    return {record['id'] for record in records}
+
+def create_generator(args):
+    # Every turn of a chunk is queued at once, so the scheduler must take the whole chunk. Response cleanup
+    # draws from the seeded global RNG, so it runs on one thread in batch order
+    config.BATCH_MAX_SIZE = args.batch_size
+    config.MAX_PENDING_GENERATIONS = 0
+    config.POSTPROCESS_WORKERS = 1
+    if args.stub:
+        from stub_generator import StubCallerGenerator
+        return StubCallerGenerator(args.stub_token_delay_ms, args.stub_prefill_ms)
+    from ai_generator import HuggingFaceCallerGenerator
+    return HuggingFaceCallerGenerator(args.model_path)
+
+def chunk_seed(seed: int, chunk: List[dict]) -> int:
+    """Depends only on the scripts in the chunk, so a resumed run samples a chunk the same way. A different
+    --batch-size or shard count regroups the scripts, which changes sampled output"""
+    return zlib.crc32(json.dumps([script['id'] for script in chunk]).encode(), seed)
+
+def run_chunk(generator, session_manager: SessionManager, chunk: List[dict], seed: int) -> List[dict]:
+    records, states = [], []
+    for script in chunk:
+        random.seed(f"{seed}:{script['id']}")
+        session = session_manager.new_session('batch-eval', script['scenario_type'], script.get('context'))
+        states.append(session.caller_state)
+        records.append({
+            'id': script['id'],
+            'index': script['index'],
+            'scenario_type': script['scenario_type'],
+            'seed': seed,
+            'context': session.caller_state.caller_profile['selected_context'],
+            'turns': []
+        })
+
+    set_seed(chunk_seed(seed, chunk))
+    started_at = time.perf_counter()
+    for step in range(max(len(script['turns']) for script in chunk)):
+        active = [i for i, script in enumerate(chunk) if step < len(script['turns'])]
+        traces = {i: Trace('batch_eval') for i in active}
+        submitted_at = time.perf_counter()
+        with generator.scheduler.hold():
+            futures = {i: generator.submit_response(states[i], chunk[i]['turns'][step], trace=traces[i]) for i in active}
+
+        for i in active:
+            response, state = futures[i].result()
+            trace = traces[i]
+            records[i]['turns'].append({
+                'message': chunk[i]['turns'][step],
+                'response': response,
+                'emotional_state': state.emotional_state.value,
+                'intensity': state.intensity,
+                'scenario_progress': state.scenario_progress,
+                'key_details_revealed': list(state.key_details_revealed),
+                # The generator hands back the unchanged state when generation or cleanup failed
+                'fallback': state is states[i],
+                'latency_ms': round((time.perf_counter() - submitted_at) * 1000, 1),
+                'batch_size': trace.batch_size,
+                'prompt_tokens': trace.prompt_tokens,
+                'output_tokens': trace.output_tokens,
+                'stages_ms': {name: round(seconds * 1000, 2) for name, seconds in trace.stages.items()}
+            })
+            states[i] = state
+
+    elapsed = time.perf_counter() - started_at
+    for record in records:
+        turns = record['turns']
+        record['final'] = {key: turns[-1][key] for key in ('emotional_state', 'intensity', 'scenario_progress', 'key_details_revealed')}
+        record['timing'] = {
+            'chunk_ms': round(elapsed * 1000, 1),
+            'chunk_size': len(chunk),
+            'mean_turn_ms': round(sum(turn['latency_ms'] for turn in turns) / len(turns), 1)
+        }
+    return records
+
+def run(args, scripts: List[dict]) -> Tuple[int, int]:
+    """Run this process's shard into args.output; returns (scripts run, scripts skipped)"""
+    shard, shards = args.shard
+    scripts = [script for script in scripts if script['index'] % shards == shard]
+    done = completed_ids(args.output) if args.resume else set()
+    chunks = [scripts[i:i + args.batch_size] for i in range(0, len(scripts), args.batch_size)]
+    pending = [chunk for chunk in chunks if any(script['id'] not in done for script in chunk)]
+    if not pending:
+        return 0, len(scripts)
+
+    generator = create_generator(args)
+    session_manager = SessionManager()
+    ran = 0
+    with open(args.output, 'a' if args.resume else 'w') as f:
+        for number, chunk in enumerate(pending, 1):
+            # Chunks are fixed before skipping finished scripts, so a partly written chunk is rerun
+            # whole and its remaining scripts see the same batches as in the interrupted run
+            for record in run_chunk(generator, session_manager, chunk, args.seed):
+                if record['id'] not in done:
+                    f.write(json.dumps(record) + '\n')
+                    ran += 1
+            f.flush()
+            logger.info(f"Shard {shard}/{shards}: chunk {number}/{len(pending)} done")
+    return ran, len(scripts) - ran
+
+def run_processes(args, scripts: List[dict]):
+    """One shard per child process, merged into args.output in input order. Shard files are kept next to the
+    output so --resume can pick each shard up where it stopped."""
+    outputs = [f"{args.output}.{shard}-of-{args.processes}" for shard in range(args.processes)]
+    children = []
+    for shard, output in enumerate(outputs):
+        command = [
+            sys.executable, os.path.abspath(__file__), args.scripts,
+            '--output', output, '--shard', f"{shard}/{args.processes}",
+            '--batch-size', str(args.batch_size), '--seed', str(args.seed)
+        ]
+        if args.model_path:
+            command += ['--model-path', args.model_path]
+        if args.stub:
+            command += ['--stub', '--stub-token-delay-ms', str(args.stub_token_delay_ms), '--stub-prefill-ms', str(args.stub_prefill_ms)]
+        if args.resume:
+            command.append('--resume')
+        children.append(subprocess.Popen(command))
+
+    failed = [shard for shard, child in enumerate(children) if child.wait() != 0]
+    if failed:
+        raise RuntimeError(f"Shards {failed} failed; rerun with --resume to continue")
+
+    records: Dict[str, dict] = {}
+    for output in outputs:
+        with open(output, 'r') as f:
+            for line in f:
+                record = json.loads(line)
+                records[record['id']] = record
+    with open(args.output + '.tmp', 'w') as f:
+        for record in sorted(records.values(), key=lambda record: record['index']):
+            f.write(json.dumps(record) + '\n')
+    os.replace(args.output + '.tmp', args.output)
+    logger.info(f"Merged {len(records)} scripts from {args.processes} shards into {args.output}")
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    shard, shards = (int(part) for part in value.split('/'))
+    if not 0 <= shard < shards:
+        raise argparse.ArgumentTypeError("shard must be K/N with 0 <= K < N")
+    return shard, shards
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('scripts', help="JSONL file of scripted call-taker turns")
+    parser.add_argument('--output', required=True, help="JSONL results file")
+    parser.add_argument('--batch-size', type=int, default=config.BATCH_MAX_SIZE, help="scripts run together; results depend on it when sampling")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--resume', action='store_true', help="skip scripts already in the output and append the rest")
+    parser.add_argument('--shard', type=parse_shard, default=(0, 1), metavar='K/N', help="run only scripts whose index modulo N is K")
+    parser.add_argument('--processes', type=int, default=1, help="run N shards in child processes and merge their output")
+    parser.add_argument('--model-path', help="defaults to MODEL_PATH (or the tiny model with LOCAL_TEST_MODEL=1)")
+    parser.add_argument('--stub', action='store_true', help="deterministic stub generator instead of a model")
+    parser.add_argument('--stub-token-delay-ms', type=float, default=0)
+    parser.add_argument('--stub-prefill-ms', type=float, default=0)
+    args = parser.parse_args(argv)
+    args.batch_size = max(1, args.batch_size)
+
+    logging.basicConfig(level=logging.INFO)
+    scripts = load_scripts(args.scripts)
+    started_at = time.perf_counter()
+    if args.processes > 1:
+        run_processes(args, scripts)
+    else:
+        ran, skipped = run(args, scripts)
+        logger.info(f"Ran {ran} scripts ({skipped} skipped) in {time.perf_counter() - started_at:.1f}s into {args.output}")
+
+if __name__ == '__main__':
+    main()
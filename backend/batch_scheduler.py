@@ -0,0 +1,179 @@
+import logging
+import math
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Callable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+class GenerationRequest:
+    def __init__(self, prompt: str, session_id: Optional[str] = None, prefixes: Sequence[str] = (), streamer=None, max_new_tokens: int = 256, scenario_type: Optional[str] = None, trace=None):
+        self.prompt = prompt
+        self.session_id = session_id
+        self.prefixes = prefixes
+        self.streamer = streamer
+        self.max_new_tokens = max_new_tokens
+        self.scenario_type = scenario_type
+        self.trace = trace
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+        self.started_at = None
+
+class QueueFullError(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"Generation queue is full, retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+class ModelNotReadyError(Exception):
+    def __init__(self, status: str, retry_after: float):
+        super().__init__(f"Model is {status}, retry after {retry_after:.0f}s")
+        self.status = status
+        self.retry_after = retry_after
+
+class BatchScheduler:
+    """Collects pending generation requests from many sessions and runs them as one batched generate call"""
+
+    def __init__(self, generate_batch: Callable[[List[GenerationRequest]], List[str]], max_batch_size: int = 8, max_queue_wait_ms: float = 15.0, max_pending: int = 0):
+        self.generate_batch = generate_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_queue_wait = max(0.0, max_queue_wait_ms) / 1000.0
+        self.max_pending = max_pending
+        self.queue = queue.Queue()
+        self.deferred = None
+        self.pending = 0
+        self.rejected = 0
+        self.stats_lock = threading.Lock()
+        self.released = threading.Event()
+        self.released.set()
+        self.batches_run = 0
+        self.requests_served = 0
+        self.total_queue_wait = 0.0
+        self.total_generation_time = 0.0
+        self.worker = threading.Thread(target=self._run, name="batch-scheduler", daemon=True)
+        self.worker.start()
+        logger.info(f"Batch scheduler started (max_batch_size={self.max_batch_size}, max_queue_wait_ms={max_queue_wait_ms})")
+
+    def submit(self, prompt: str, session_id: Optional[str] = None, prefixes: Sequence[str] = (), streamer=None, max_new_tokens: int = 256, scenario_type: Optional[str] = None, trace=None) -> Future:
+        """Queue a prompt; requests with a token streamer are generated on their own since streamers only support one sequence"""
+        with self.stats_lock:
+            if self.at_capacity():
+                self.rejected += 1
+                raise QueueFullError(self._retry_after())
+            self.pending += 1
+
+        request = GenerationRequest(prompt, session_id, prefixes, streamer, max_new_tokens, scenario_type, trace)
+        self.queue.put(request)
+        return request.future
+
+    @contextmanager
+    def hold(self):
+        """Queue requests submitted inside the block without dispatching them, so on exit they run in
+        submission order in batches of max_batch_size regardless of how long submitting took"""
+        self.released.clear()
+        try:
+            yield
+        finally:
+            self.released.set()
+
+    def at_capacity(self) -> bool:
+        return bool(self.max_pending) and self.pending >= self.max_pending
+
+    def _retry_after(self) -> float:
+        # Time for the batches already queued ahead of a new request to drain
+        batches_ahead = math.ceil(self.pending / self.max_batch_size)
+        avg_batch_time = self.total_generation_time / self.batches_run if self.batches_run else 1.0
+        return max(1.0, batches_ahead * avg_batch_time)
+
+    def retry_after(self) -> float:
+        with self.stats_lock:
+            return self._retry_after()
+
+    def _next_request(self, timeout: Optional[float] = None) -> GenerationRequest:
+        if self.deferred is not None:
+            request, self.deferred = self.deferred, None
+            return request
+        if timeout is None:
+            return self.queue.get()
+        if timeout > 0:
+            return self.queue.get(timeout=timeout)
+        return self.queue.get_nowait()
+
+    def _collect_batch(self) -> List[GenerationRequest]:
+        batch = [self._next_request()]
+        if batch[0].streamer is not None:
+            return batch
+        self.released.wait()
+        deadline = batch[0].enqueued_at + self.max_queue_wait
+
+        while len(batch) < self.max_batch_size:
+            try:
+                request = self._next_request(max(0.0, deadline - time.perf_counter()))
+            except queue.Empty:
+                break
+            if request.streamer is not None:
+                self.deferred = request
+                break
+            batch.append(request)
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            started_at = time.perf_counter()
+            for request in batch:
+                request.started_at = started_at
+                if request.trace is not None:
+                    request.trace.add('queue_wait', started_at - request.enqueued_at)
+
+            try:
+                results = self.generate_batch(batch)
+            except Exception as e:
+                logger.error(f"Batched generation failed for {len(batch)} requests: {e}")
+                self._release(batch)
+                for request in batch:
+                    if request.streamer is not None:
+                        request.streamer.end()
+                    request.future.set_exception(e)
+                continue
+
+            finished_at = time.perf_counter()
+            self._release(batch)
+            for request, result in zip(batch, results):
+                request.future.set_result(result)
+
+            self._record_batch(batch, finished_at - started_at)
+
+    def _release(self, batch: List[GenerationRequest]):
+        with self.stats_lock:
+            self.pending -= len(batch)
+
+    def _record_batch(self, batch: List[GenerationRequest], generation_time: float):
+        with self.stats_lock:
+            self.batches_run += 1
+            self.requests_served += len(batch)
+            self.total_queue_wait += sum(request.started_at - request.enqueued_at for request in batch)
+            self.total_generation_time += generation_time
+
+        logger.debug(f"Batch of {len(batch)}/{self.max_batch_size} generated in {generation_time * 1000:.0f}ms")
+
+    def stats(self) -> dict:
+        with self.stats_lock:
+            avg_batch_size = self.requests_served / self.batches_run if self.batches_run else 0.0
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_queue_wait_ms': self.max_queue_wait * 1000,
+                'queue_depth': self.queue.qsize(),
+                'pending': self.pending,
+                'max_pending': self.max_pending,
+                'rejected': self.rejected,
+                'batches_run': self.batches_run,
+                'requests_served': self.requests_served,
+                'avg_batch_size': round(avg_batch_size, 2),
+                'avg_occupancy': round(avg_batch_size / self.max_batch_size, 3),
+                'avg_queue_wait_ms': round(self.total_queue_wait / self.requests_served * 1000, 1) if self.requests_served else 0.0,
+                'avg_batch_generation_ms': round(self.total_generation_time / self.batches_run * 1000, 1) if self.batches_run else 0.0
+            }
@@ -0,0 +1,118 @@
+"""Tokens/sec and memory of each inference backend on the same caller prompts. Each backend runs in
+its own process so peak RSS is not shared between them.
+
+    python benchmarks/inference_backends.py [--backends cpu,cpu-int8] [--prompts 8] [--max-new-tokens 64]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+
+QUESTIONS = ["911, what is your emergency?", "Where are you right now?", "Is anyone hurt?", "Can you describe the vehicle?"]
+
+def prompts(count: int) -> list:
+    from scenario_contexts import load_scenario_contexts
+    contexts = [context for variants in load_scenario_contexts().values() for context in variants]
+    return [
+        [
+            {"role": "system", "content": f"You are calling 911. What happened: {context['situation']} Location: {context['location']}"},
+            {"role": "user", "content": QUESTIONS[index % len(QUESTIONS)]}
+        ]
+        for index, context in zip(range(count), contexts * count)
+    ]
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is kilobytes on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def run_backend(name: str, model_path: str, count: int, max_new_tokens: int) -> dict:
+    import torch
+    from inference_backends import get_backend, load_tokenizer
+
+    torch.manual_seed(0)
+    start = time.perf_counter()
+    tokenizer = load_tokenizer(model_path)
+    backend = get_backend(name)
+    model = backend.load(model_path)
+    load_seconds = time.perf_counter() - start
+    rss_after_load = peak_rss_mb()
+
+    rendered = [tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True) for messages in prompts(count)]
+    generated = 0
+    first_token_ms = []
+    generation_seconds = 0.0
+    with torch.inference_mode():
+        for prompt in rendered:
+            input_ids = tokenizer(prompt, add_special_tokens=False, return_tensors='pt')['input_ids'].to(model.device)
+
+            start = time.perf_counter()
+            model.generate(input_ids=input_ids, max_new_tokens=1, do_sample=False, pad_token_id=tokenizer.pad_token_id)
+            first_token_ms.append((time.perf_counter() - start) * 1000)
+
+            # min_new_tokens pins the output length so every backend decodes the same number of tokens
+            start = time.perf_counter()
+            outputs = model.generate(
+                input_ids=input_ids,
+                max_new_tokens=max_new_tokens,
+                min_new_tokens=max_new_tokens,
+                do_sample=False,
+                pad_token_id=tokenizer.pad_token_id
+            )
+            generation_seconds += time.perf_counter() - start
+            generated += outputs.shape[1] - input_ids.shape[1]
+
+    return {
+        'backend': backend.name,
+        'load_seconds': round(load_seconds, 2),
+        'prompts': len(rendered),
+        'generated_tokens': generated,
+        'tokens_per_sec': round(generated / generation_seconds, 1),
+        'avg_first_token_ms': round(sum(first_token_ms) / len(first_token_ms), 1),
+        'rss_after_load_mb': rss_after_load,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backends', default='cpu,cpu-int8', help="comma separated; add gpu on CUDA machines")
+    parser.add_argument('--model-path', default=config.TINY_MODEL_DIR if config.LOCAL_TEST_MODEL else config.MODEL_PATH)
+    parser.add_argument('--prompts', type=int, default=8)
+    parser.add_argument('--max-new-tokens', type=int, default=64)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if config.LOCAL_TEST_MODEL:
+        from tiny_model import ensure_tiny_model
+        ensure_tiny_model(args.model_path)
+
+    if args.child:
+        print(json.dumps(run_backend(args.child, args.model_path, args.prompts, args.max_new_tokens)))
+        return
+
+    results = []
+    for name in args.backends.split(','):
+        child = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child', name, '--model-path', args.model_path,
+             '--prompts', str(args.prompts), '--max-new-tokens', str(args.max_new_tokens)],
+            capture_output=True, text=True
+        )
+        if child.returncode != 0:
+            results.append({'backend': name, 'error': child.stderr.strip().splitlines()[-1] if child.stderr.strip() else 'failed'})
+            continue
+        results.append(json.loads(child.stdout.strip().splitlines()[-1]))
+
+    print(json.dumps({
+        'model_path': args.model_path,
+        'max_new_tokens': args.max_new_tokens,
+        'results': results
+    }, indent=2))
+
+if __name__ == '__main__':
+    main()
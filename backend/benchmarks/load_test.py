@@ -0,0 +1,221 @@
+"""Throughput and latency of the API under concurrent trainees. Starts app.py with the stub generator (no
+GPU, deterministic replies, fixed per-token delay) and drives scripted multi-turn calls across every
+scenario type, then prints JSON with p50/p95/p99 latency per operation and server-side queue wait vs.
+generation time.
+
+    python benchmarks/load_test.py [--trainees 16] [--calls-per-trainee 2] [--turns 4] [--token-delay-ms 20] [--stream]
+    python benchmarks/load_test.py --url http://localhost:5001   # an already running server
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from models import ScenarioType
+
+SCRIPT = [
+    "911, what is your emergency?",
+    "What is the address of your emergency?",
+    "Is anyone hurt?",
+    "Can you describe what you see?",
+    "Are you in a safe place right now?",
+    "Stay on the line, help is on the way."
+]
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {'create': [], 'message': [], 'end': []}
+        self.errors = {'create': 0, 'message': 0, 'end': 0}
+        self.statuses = {}
+
+    def record(self, op: str, seconds: float, status: int):
+        with self.lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if 200 <= status < 300:
+                self.latencies[op].append(seconds * 1000)
+            else:
+                self.errors[op] += 1
+
+def request(url: str, method: str = 'GET', payload=None, timeout: float = 300):
+    data = json.dumps(payload).encode() if payload is not None else None
+    req = urllib.request.Request(url, data=data, method=method, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+def timed(recorder: Recorder, op: str, url: str, method: str = 'POST', payload=None):
+    start = time.perf_counter()
+    try:
+        status, body = request(url, method, payload)
+    except (urllib.error.URLError, OSError):
+        status, body = 0, b''
+    recorder.record(op, time.perf_counter() - start, status)
+    return status, body
+
+def trainee(base_url: str, index: int, args, recorder: Recorder):
+    scenarios = list(ScenarioType)
+    for call in range(args.calls_per_trainee):
+        scenario = scenarios[(index * args.calls_per_trainee + call) % len(scenarios)]
+        status, body = timed(recorder, 'create', f"{base_url}/api/sessions", payload={'trainee_id': f"load-{index}", 'scenario_type': scenario.value})
+        if status != 200:
+            continue
+        session_id = json.loads(body)['session_id']
+
+        path = 'message/stream' if args.stream else 'message'
+        for turn in range(args.turns):
+            # The full SSE body is read, so streamed latency is time to the final 'done' event
+            timed(recorder, 'message', f"{base_url}/api/sessions/{session_id}/{path}", payload={'message': SCRIPT[turn % len(SCRIPT)]})
+        timed(recorder, 'end', f"{base_url}/api/sessions/{session_id}/end")
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+def summarize(values: list, errors: int) -> dict:
+    if not values:
+        return {'count': 0, 'errors': errors}
+    return {
+        'count': len(values),
+        'errors': errors,
+        'mean_ms': round(statistics.fmean(values), 1),
+        'p50_ms': round(percentile(values, 50), 1),
+        'p95_ms': round(percentile(values, 95), 1),
+        'p99_ms': round(percentile(values, 99), 1),
+        'max_ms': round(max(values), 1)
+    }
+
+def batching_totals(health: dict) -> dict:
+    """Cumulative queue wait and generation time across the server's schedulers, one per model worker"""
+    schedulers = [health['batching']] if 'batching' in health else [worker['batching'] for worker in health.get('workers', []) if 'batching' in worker]
+    return {
+        'requests': sum(s['requests_served'] for s in schedulers),
+        'batches': sum(s['batches_run'] for s in schedulers),
+        'queue_wait_ms': sum(s['avg_queue_wait_ms'] * s['requests_served'] for s in schedulers),
+        'generation_ms': sum(s['avg_batch_generation_ms'] * s['batches_run'] for s in schedulers)
+    }
+
+def server_breakdown(before: dict, after: dict) -> dict:
+    requests = after['requests'] - before['requests']
+    batches = after['batches'] - before['batches']
+    return {
+        'generations': requests,
+        'batches': batches,
+        'avg_batch_size': round(requests / batches, 2) if batches else 0.0,
+        'avg_queue_wait_ms': round((after['queue_wait_ms'] - before['queue_wait_ms']) / requests, 1) if requests else 0.0,
+        'avg_generation_ms': round((after['generation_ms'] - before['generation_ms']) / batches, 1) if batches else 0.0
+    }
+
+def start_server(args) -> subprocess.Popen:
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {
+        **os.environ,
+        'PORT': str(args.port),
+        'STUB_GENERATOR': '1',
+        'STUB_TOKEN_DELAY_MS': str(args.token_delay_ms),
+        'STUB_PREFILL_MS': str(args.prefill_ms),
+        'MODEL_WORKERS': str(args.workers),
+        'SESSION_STORE': os.environ.get('SESSION_STORE', 'memory'),
+        # Background pool refills would compete with the measured traffic
+        'OPENING_POOL_SIZE': os.environ.get('OPENING_POOL_SIZE', '0'),
+        # Keep benchmark sessions out of the real session history and transcript archive
+        'SESSION_HISTORY_DB': os.environ.get('SESSION_HISTORY_DB', ''),
+        'TRANSCRIPT_ARCHIVE_DIR': os.environ.get('TRANSCRIPT_ARCHIVE_DIR', '')
+    }
+    log = open(args.server_log, 'w') if args.server_log else subprocess.DEVNULL
+    return subprocess.Popen([sys.executable, 'app.py'], cwd=backend_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+def wait_until_ready(base_url: str, server, timeout: float) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        try:
+            status, body = request(f"{base_url}/health", timeout=5)
+            health = json.loads(body)
+            if status == 200 and health.get('model_status') == 'ready':
+                return health
+        except (urllib.error.URLError, OSError, ValueError):
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server at {base_url} not ready after {timeout:.0f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trainees', type=int, default=16, help="concurrent simulated trainees")
+    parser.add_argument('--calls-per-trainee', type=int, default=2)
+    parser.add_argument('--turns', type=int, default=4, help="messages per call")
+    parser.add_argument('--stream', action='store_true', help="use the SSE message endpoint")
+    parser.add_argument('--token-delay-ms', type=float, default=20)
+    parser.add_argument('--prefill-ms', type=float, default=50)
+    parser.add_argument('--workers', type=int, default=1, help="MODEL_WORKERS for the spawned server")
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--url', help="benchmark a running server instead of starting one")
+    parser.add_argument('--server-log', help="write the spawned server's output here")
+    parser.add_argument('--startup-timeout', type=float, default=120)
+    parser.add_argument('--output', help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    server = None if args.url else start_server(args)
+    base_url = (args.url or f"http://127.0.0.1:{args.port}").rstrip('/')
+    try:
+        before = wait_until_ready(base_url, server, args.startup_timeout)
+        recorder = Recorder()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.trainees) as pool:
+            for future in [pool.submit(trainee, base_url, index, args, recorder) for index in range(args.trainees)]:
+                future.result()
+        elapsed = time.perf_counter() - start
+        if 'workers' in before:
+            # Model workers push their stats to the pool periodically
+            time.sleep(config.WORKER_STATS_INTERVAL + 0.5)
+        after = json.loads(request(f"{base_url}/health")[1])
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    completed = sum(len(values) for values in recorder.latencies.values())
+    results = {
+        'config': {
+            'trainees': args.trainees,
+            'calls_per_trainee': args.calls_per_trainee,
+            'turns': args.turns,
+            'stream': args.stream,
+            'workers': args.workers,
+            'token_delay_ms': args.token_delay_ms,
+            'prefill_ms': args.prefill_ms,
+            'url': args.url
+        },
+        'elapsed_seconds': round(elapsed, 2),
+        'throughput': {
+            'requests_per_sec': round(completed / elapsed, 2),
+            'messages_per_sec': round(len(recorder.latencies['message']) / elapsed, 2),
+            'calls_per_sec': round(len(recorder.latencies['end']) / elapsed, 2)
+        },
+        'latency': {op: summarize(values, recorder.errors[op]) for op, values in recorder.latencies.items()},
+        'status_codes': {str(status): count for status, count in sorted(recorder.statuses.items())},
+        'server': server_breakdown(batching_totals(before), batching_totals(after)),
+        'token_usage': after.get('token_usage')
+    }
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+if __name__ == '__main__':
+    main()
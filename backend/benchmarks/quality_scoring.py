@@ -0,0 +1,80 @@
+"""Docs/sec of the response quality scorer: the original two full-pipeline calls per turn against the
+trimmed pipeline, per turn and batched through nlp.pipe across worker processes.
+
+    python benchmarks/quality_scoring.py [--turns 2000] [--processes 4] [--model en_core_web_sm]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import spacy
+
+import config
+from quality_scorer import QualityScorer, UNUSED_COMPONENTS, score_docs
+
+QUESTIONS = [
+    "911, what is your emergency?", "Where are you right now?", "Is anyone hurt?", "How many people are injured?",
+    "What color was the car?", "Can you describe the man?", "Is he still in the house?", "What's your phone number?",
+    "Did you see which way they went?", "Are you somewhere safe?"
+]
+RESPONSES = [
+    "There's been a crash at 17th Avenue and Macleod Trail.", "I'm at 1420 Centre Street, the blue house.",
+    "Yes, the other driver is bleeding from his head.", "I think three people, maybe four.",
+    "It was a red pickup truck, an older Ford.", "He's tall, wearing a black hoodie and jeans.",
+    "No, he ran out the back door toward the alley.", "It's 403-555-0182.",
+    "They went north on Deerfoot.", "I'm locked in the bathroom upstairs."
+]
+
+def corpus(turns: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [(rng.choice(QUESTIONS), rng.choice(RESPONSES)) for _ in range(turns)]
+
+def timed(label: str, fn, docs: int) -> dict:
+    start = time.perf_counter()
+    scores = fn()
+    elapsed = time.perf_counter() - start
+    return {'label': label, 'docs_per_sec': round(docs / elapsed, 1), 'seconds': round(elapsed, 3), 'scores': scores}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--turns', type=int, default=2000)
+    parser.add_argument('--processes', type=int, default=max(2, config.QUALITY_SCORER_PROCESSES))
+    parser.add_argument('--batch-size', type=int, default=config.QUALITY_SCORER_BATCH_SIZE)
+    parser.add_argument('--model', default=config.SPACY_MODEL)
+    args = parser.parse_args()
+
+    turns = corpus(args.turns)
+    docs = 2 * len(turns)
+    full = spacy.load(args.model)
+    scorer = QualityScorer(spacy.load(args.model, exclude=UNUSED_COMPONENTS))
+
+    results = [
+        timed('full pipeline, nlp() per text', lambda: [
+            score_docs(question, response, full(question.lower()), full(response.lower())) for question, response in turns
+        ], docs),
+        timed('trimmed pipeline, pipe per turn', lambda: [scorer.score(question, response) for question, response in turns], docs),
+        timed(f'trimmed pipeline, batched (batch_size={args.batch_size})',
+              lambda: scorer.score_many(turns, batch_size=args.batch_size), docs),
+        timed(f'trimmed pipeline, batched x {args.processes} processes',
+              lambda: scorer.score_many(turns, n_process=args.processes, batch_size=args.batch_size), docs)
+    ]
+
+    reference = results[0].pop('scores')
+    for result in results[1:]:
+        result['matches_full_pipeline'] = result.pop('scores') == reference
+    print(json.dumps({
+        'model': args.model,
+        'full_components': full.pipe_names,
+        'trimmed_components': scorer.nlp.pipe_names,
+        'turns': len(turns),
+        'docs': docs,
+        'results': results
+    }, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,427 @@
+"""Per-response cleanup time of the rule-table post-processor against the regex chain it replaced.
+
+    python benchmarks/response_cleaning.py [--responses 5000] [--repeat 5] [--corpus outputs.jsonl]
+
+The corpus is either a JSONL file of raw model outputs ({"text": ..., "question": ..., "emotional_state": ...})
+or a seeded synthetic set mixing the artifacts the cleaner exists for. Both implementations see the same
+random state per response, and any response where their output differs is reported.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import CallerState, EmotionalState
+from response_cleaner import clean_response
+
+class LegacyResponseCleaner:
+    """The post-processing chain as it was in HuggingFaceCallerGenerator, kept for comparison"""
+
+    def _strip_artifacts(self, response: str) -> str:
+        artifacts = ["<|eot_id|>", "<|end_of_text|>", "<|start_header_id|>", "<|end_header_id|>", "*", "**", "`", "\"\"\""]
+        for artifact in artifacts:
+            response = response.replace(artifact, "")
+        
+        prefixes = ["assistant", "911 caller:", "Response:", "Caller:", "A:", "User:", "AI:", "The caller says:", "I would say:"]
+        for prefix in prefixes:
+            if response.lower().startswith(prefix.lower()):
+                response = response[len(prefix):].strip()
+        
+        return response.replace("assistant", "").strip()
+    
+    def _clean_partial_response(self, response: str, emotional_state: EmotionalState = None) -> str:
+        """Sentence-level subset of _clean_response for streaming; steps that need the whole response are left to the final pass"""
+        response = self._strip_artifacts(response)
+        response = re.sub(r'^"+|"+$', '', response)
+        response = self._remove_stage_directions(response)
+        response = re.sub(r'\(.*?\)', '', response)
+        response = re.sub(r'\[.*?\]', '', response)
+        response = self._remove_emotional_indicators(response)
+        response = self._naturalize_language(response, emotional_state)
+        response = self._fix_poor_grammar(response)
+        response = self._fix_grammar_and_punctuation(response, emotional_state)
+        return response.strip()
+    
+    def _clean_response(self, response: str, question: str = "", emotional_state: EmotionalState = None, caller_state: CallerState = None) -> str:
+        response = self._strip_artifacts(response)
+        lines = [line.strip() for line in response.split('\n') if line.strip()]
+        if lines:
+            response = lines[0]
+        
+        response = re.sub(r'^"+|"+$', '', response)
+
+        response = self._remove_stage_directions(response)
+
+        response = self._fix_sentence_fragments(response)
+
+        response = self._fix_grammar_and_punctuation(response, emotional_state)
+
+        if len(response.split()) < 3 or not response.strip():
+            response = self._generate_fallback_response(question, caller_state)
+
+        response = re.sub(r'\(.*?\)', '', response)
+        response = re.sub(r'\[.*?\]', '', response)
+
+        response = self._remove_emotional_indicators(response)
+
+        response = self._naturalize_language(response, emotional_state)
+
+        response = self._fix_poor_grammar(response)
+
+        response = self._add_conversational_elements(response, emotional_state)
+
+        response = self._fix_hanging_phrases(response)
+
+        response = self._normalize_punctuation(response, emotional_state)
+
+        response = self._ensure_coherent_response(response, question)
+        
+        return response.strip()
+
+    def _remove_stage_directions(self, response: str) -> str:
+        stage_directions = [
+            r'\bpauses?\b', r'\bpause\b', r'\bgulps?\b', r'\bgulp\b',
+            r'\bsighs?\b', r'\bsigh\b', r'\btakes? a breath\b', r'\bbreathing heavily\b',
+            r'\bclears? throat\b', r'\bstutters?\b', r'\bhesitates?\b',
+            r'\bvoice shaking\b', r'\bvoice trembling\b', r'\bin a shaky voice\b',
+            r'\bpauses to collect myself\b', r'\bpauses to think\b',
+            r'\blooks around\b', r'\bgestures\b'
+        ]
+        
+        for direction in stage_directions:
+            response = re.sub(direction, '', response, flags=re.IGNORECASE)
+ 
+        response = re.sub(r'\([^)]*(?:pause|gulp|sigh|breath|throat|stutter|hesitate|voice|look|gesture)[^)]*\)', '', response, flags=re.IGNORECASE)
+
+        theatrical_phrases = [
+            r'\bpauses to collect myself\b',
+            r'\btakes a deep breath\b',
+            r'\bvoice breaking\b',
+            r'\bwith emotion\b'
+        ]
+        
+        for phrase in theatrical_phrases:
+            response = re.sub(phrase, '', response, flags=re.IGNORECASE)
+
+        response = re.sub(r'\s+', ' ', response)
+        response = re.sub(r'\.+', '.', response)
+        
+        return response.strip()
+
+    def _generate_fallback_response(self, question: str, caller_state: CallerState) -> str:
+        """Generate a fallback response when the original is too short or nonsensical"""
+        if not question:
+            return "I need help."
+        
+        question_lower = question.lower()
+        
+        if 'number' in question_lower or 'phone' in question_lower:
+            context = caller_state.caller_profile.get('selected_context', {}) if caller_state else {}
+            phone = context.get('phone', '587-555-0123')
+            return f"It's {phone}."
+        
+        elif 'location' in question_lower or 'where' in question_lower:
+            return "I'm not sure of the exact address."
+        
+        elif 'hurt' in question_lower or 'injured' in question_lower:
+            return "I'm not sure."
+        
+        elif 'happened' in question_lower or 'what' in question_lower:
+            return "There's been an accident."
+        
+        return "I'm not sure about that."
+
+    def _ensure_coherent_response(self, response: str, question: str) -> str:
+        """Final check to ensure the response makes sense and answers the question"""
+        if not response or len(response.split()) < 2:
+            return self._generate_fallback_response(question, None)
+
+        nonsense_patterns = [
+            r'\bthingamajig\b', r'\bwhatever\b', r'\banyway\b(?!\s+\w+)',
+            r'\bwherever I\'m anyway\b', r'\bthat\'s where I\'m\. wherever I\'m\b',
+            r'\bthis thingamajig has GPS on it\b'
+        ]
+        
+        for pattern in nonsense_patterns:
+            response = re.sub(pattern, '', response, flags=re.IGNORECASE)
+
+        response = re.sub(r'\s+', ' ', response).strip()
+
+        if len(response.split()) < 3:
+            return self._generate_fallback_response(question, None)
+        
+        return response
+
+    def _fix_sentence_fragments(self, response: str) -> str:
+        response = re.sub(r'^\s*([A-Z])\.\s*([A-Z])', r'\1\2', response)
+        response = re.sub(r'^\s*([A-Z][a-z]*)\.\s*([A-Z][a-z]*)', r'\1 \2', response)
+        response = re.sub(r'^\s*([A-Z][a-z]*)\.\s+([A-Z][a-z]*)', r'\1 \2', response)
+        response = re.sub(r'^([A-Z][a-z]*)\.\s*([A-Z][a-z]*)', r'\1 \2', response)
+        response = re.sub(r'^\s*([A-Z][a-z]{1,3})\.\s*([A-Z])', r'\1 \2', response)
+        
+        response = re.sub(r'\b([A-Z][a-z]{1,3})\.\s*([A-Z][a-z])', r'\1 \2', response)
+
+        response = re.sub(r'\bIt\.\s*It\'s\b', "It's", response)
+        response = re.sub(r'\bMy\.\s*Uh\.\s*', "My ", response)
+        response = re.sub(r'\bWe\.\s*We\'re\b', "We're", response)
+        
+        return response.strip()
+
+    def _fix_grammar_and_punctuation(self, response: str, emotional_state: EmotionalState = None) -> str:
+        sentences = re.split(r'([.!?]+)', response)
+        corrected_sentences = []
+        
+        for i, part in enumerate(sentences):
+            if i % 2 == 0:
+                part = part.strip()
+                if part:
+                    part = part[0].upper() + part[1:] if len(part) > 1 else part.upper()
+                corrected_sentences.append(part)
+            else:  
+                corrected_sentences.append(part)
+        
+        response = ''.join(corrected_sentences)
+        
+        response = re.sub(r'([.!?])([A-Za-z])', r'\1 \2', response)
+
+        response = re.sub(r'\bi\b', 'I', response)
+        
+        return response
+    
+    def _normalize_punctuation(self, response: str, emotional_state: EmotionalState = None) -> str:
+        response = re.sub(r'!+', '!', response)
+        response = re.sub(r'!\s*!', '!', response)
+        
+        response = re.sub(r'\.\.\.+', '.', response)
+        response = re.sub(r'\.\s*\.', '.', response)
+        response = re.sub(r'\.\s+$', '.', response)
+        
+        response = re.sub(r'[!?]\.', '.', response)
+        response = re.sub(r'\.!', '.', response)
+        
+        exclamation_pattern = r'!(?=\s+[A-Z]|\s*$)'
+        
+        if emotional_state in [EmotionalState.CALM, EmotionalState.WORRIED, EmotionalState.RELIEVED]:
+            response = re.sub(exclamation_pattern, '.', response)
+        elif emotional_state in [EmotionalState.PANICKED, EmotionalState.HYSTERICAL]:
+            exclamation_count = len(re.findall(r'!', response))
+            if exclamation_count > 2:
+                matches = list(re.finditer(r'!', response))
+                for i, match in enumerate(matches[2:], 2):
+                    response = response[:match.start()] + '.' + response[match.end():]
+        
+        if not response.endswith(('.', '!', '?')):
+            sentences = re.split(r'[.!?]', response)
+            if sentences and sentences[-1].strip():
+                response = response + '.'
+            else:
+                response = response.rstrip() + '.'
+        
+        response = re.sub(r',\s*\.\.\.', ',', response)
+        response = re.sub(r'\s+\.\.\.', '.', response)
+        
+        response = re.sub(r'([.!?])\1+', r'\1', response)
+        
+        return response
+    
+    def _fix_hanging_phrases(self, response: str) -> str:
+        hanging_patterns = [
+            (r'\bit seems!$', '.'),
+            (r'\bit seems\.$', '.'),
+            (r'\bit looks!$', '.'),
+            (r'\bit looks\.$', '.'),
+            (r'\byou know!$', '.'),
+            (r'\byou know\.$', '.'),
+            (r'\bi guess!$', '.'),
+            (r'\bi guess\.$', '.'),
+            (r'\bi think!$', '.'),
+            (r'\bi think\.$', '.'),
+            (r'\bI mean!$', '.'),
+            (r'\bI mean\.$', '.'),
+            (r'\blike!$', '.'),
+            (r'\blike\.$', '.'),
+            (r'\bso!$', '.'),
+            (r'\bso\.$', '.'),
+            (r'\band!$', '.'),
+            (r'\band\.$', '.'),
+            (r'\bbut!$', '.'),
+            (r'\bbut\.$', '.'),
+            (r'\bor!$', '.'),
+            (r'\bor\.$', '.'),
+        ]
+        
+        for pattern, replacement in hanging_patterns:
+            response = re.sub(pattern, replacement, response, flags=re.IGNORECASE)
+        
+        hanging_words = ['seems', 'looks', 'thinks', 'guess', 'mean', 'like', 'so', 'and', 'but', 'or']
+        words = response.split()
+        if len(words) > 1 and words[-1].rstrip('!.').lower() in hanging_words:
+            if words[-1].endswith(('!', '.')):
+                words[-1] = words[-1][:-1] + '.'
+            response = ' '.join(words)
+        
+        response = re.sub(r'\s+([.!?])', r'\1', response)
+        
+        return response
+    
+    def _remove_emotional_indicators(self, response: str) -> str:
+        words = response.split()
+        filtered_words = []
+
+        excessive_descriptors = [
+            "distraught", "agitated", "traumatized", "apprehensive"
+        ]
+        
+        for word in words:
+            if word.lower() in excessive_descriptors:
+                continue
+            filtered_words.append(word)
+        
+        return ' '.join(filtered_words)
+    
+    def _naturalize_language(self, response: str, emotional_state: EmotionalState = None) -> str:
+        basic_replacements = {
+            r'\bvehicle\b': 'car',
+            r'\bautomobile\b': 'car',
+            r'\bindividuals\b': 'people',
+            r'\bapproximately\b': 'about'
+        }
+        
+        for formal, natural in basic_replacements.items():
+            response = re.sub(formal, natural, response, flags=re.IGNORECASE)
+        
+        response = re.sub(r'\bI am\b', "I'm", response)
+        response = re.sub(r'\bdo not\b', "don't", response)
+        response = re.sub(r'\bcan not\b', "can't", response)
+        
+        return response
+    
+    def _fix_poor_grammar(self, response: str) -> str:
+        grammar_fixes = {
+            r'\bplz\b': 'please',
+            r'\bu\b': 'you',
+            r'\bur\b': 'your',
+            r'\bcuz\b': 'because',
+            r'\bya\b': 'you',
+            r'\bem\b(?!\w)': 'them',
+            r'\bn\b(?=\s)': 'and'
+        }
+        
+        for incorrect, correct in grammar_fixes.items():
+            response = re.sub(incorrect, correct, response, flags=re.IGNORECASE)
+        
+        response = re.sub(r'\bthey coulda\b', 'they could have', response, flags=re.IGNORECASE)
+        response = re.sub(r'\bwoulda\b', 'would have', response, flags=re.IGNORECASE)
+        response = re.sub(r'\bshoulda\b', 'should have', response, flags=re.IGNORECASE)
+        
+        return response
+    
+    def _add_conversational_elements(self, response: str, emotional_state: EmotionalState = None) -> str:
+        if len(response.split()) < 4:
+            return response
+
+        simple_starters = ["Well, "]
+        simple_fillers = [" um"]
+
+        starter_prob = 0.03
+        filler_prob = 0.05
+            
+        if random.random() < starter_prob:
+            if not response.lower().startswith(('well', 'so', 'um')):
+                response = random.choice(simple_starters) + response.lower()
+
+        if random.random() < filler_prob:
+            words = response.split()
+            if len(words) > 5:
+                insert_pos = random.randint(1, len(words)-2)
+                words.insert(insert_pos, random.choice(simple_fillers))
+                response = " ".join(words)
+        
+        return response
+
+LINES = [
+    "There's been a crash at the intersection of 17th Avenue and Macleod Trail.",
+    "I am not sure, I think the driver of the other vehicle is hurt.",
+    "He took my purse and ran toward the bus stop, he was wearing a black hoodie.",
+    "My address is 1420 Centre Street, it's the blue house on the corner.",
+    "i dont know how many individuals were in the automobile, maybe approximately three.",
+    "Yes, she is breathing but she is not talking to me.",
+    "The smoke is coming from the kitchen and we can not get back inside.",
+    "No, nobody is hurt, we're all outside now.",
+    "It's 403-555-0182.",
+    "Please hurry, he's still in the house!",
+]
+NOISE = [
+    "(pauses)", "*sighs*", "(voice shaking)", "takes a deep breath", "[crying]", "um", "uh...", "...",
+    "!!!", "plz", "u", "cuz", "you know.", "like.", "I mean!", "distraught", "whatever", "anyway",
+]
+PREFIXES = ["", "", "", "assistant\n\n", "Caller: ", "911 caller: ", "\"", "Response: "]
+SUFFIXES = ["", "", "<|eot_id|>", "\nCall taker: Okay, stay on the line.", "\"", " So.", "!!", "\n\n(sobbing)"]
+QUESTIONS = ["Where are you?", "Is anyone hurt?", "What happened?", "What's your phone number?", "Can you describe him?", ""]
+
+def synthetic_corpus(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(count):
+        words = []
+        for line in rng.sample(LINES, rng.randint(1, 3)):
+            words.extend(line.split())
+        for _ in range(rng.randint(0, 4)):
+            words.insert(rng.randint(0, len(words)), rng.choice(NOISE))
+        corpus.append({
+            'text': rng.choice(PREFIXES) + ' '.join(words) + rng.choice(SUFFIXES),
+            'question': rng.choice(QUESTIONS),
+            'emotional_state': rng.choice(list(EmotionalState)).value
+        })
+    return corpus
+
+def load_corpus(path: str) -> list:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def caller_state(emotional_state: EmotionalState) -> CallerState:
+    return CallerState(emotional_state, 7, None, [], [], {'selected_context': {'phone': '403-555-0182'}}, 0.0)
+
+def run(clean, corpus: list, seed: int) -> tuple:
+    outputs = []
+    start = time.perf_counter()
+    for index, item in enumerate(corpus):
+        random.seed(seed + index)
+        state = EmotionalState(item.get('emotional_state', 'worried'))
+        outputs.append(clean(item['text'], item.get('question', ''), state, caller_state(state)))
+    return time.perf_counter() - start, outputs
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--responses', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--corpus')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.responses, args.seed)
+    legacy = LegacyResponseCleaner()._clean_response
+
+    results = {}
+    for name, clean in (('legacy', legacy), ('rule_table', clean_response)):
+        best, outputs = min(run(clean, corpus, args.seed) for _ in range(args.repeat))
+        results[name] = (best, outputs)
+
+    mismatches = sum(a != b for a, b in zip(results['legacy'][1], results['rule_table'][1]))
+    legacy_us = results['legacy'][0] / len(corpus) * 1e6
+    table_us = results['rule_table'][0] / len(corpus) * 1e6
+    print(json.dumps({
+        'responses': len(corpus),
+        'legacy_us_per_response': round(legacy_us, 1),
+        'rule_table_us_per_response': round(table_us, 1),
+        'speedup': round(legacy_us / table_us, 2),
+        'mismatched_outputs': mismatches
+    }, indent=2))
+
+if __name__ == '__main__':
+    main()
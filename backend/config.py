@@ -0,0 +1,121 @@
+import os
+
+# Model location; LOCAL_TEST_MODEL=1 swaps in a tiny random model built under TINY_MODEL_DIR
+MODEL_PATH = os.getenv('MODEL_PATH', '/home/ubuntu/.llama/checkpoints/Llama3.1-8B-Instruct-hf')
+LOCAL_TEST_MODEL = os.getenv('LOCAL_TEST_MODEL', '0') == '1'
+TINY_MODEL_DIR = os.getenv('TINY_MODEL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.tiny-model'))
+
+# Inference backend: 'gpu' (bf16), 'cpu' (float32), 'cpu-int8' (dynamic int8 quantization) or 'auto' (gpu when available, else cpu)
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'auto')
+
+# Speculative decoding: a small draft model sharing the main model's tokenizer proposes up to DRAFT_TOKENS
+# tokens per step for the main model to verify; used for turns generated on their own (empty = disabled)
+DRAFT_MODEL_PATH = os.getenv('DRAFT_MODEL_PATH', '')
+DRAFT_TOKENS = int(os.getenv('DRAFT_TOKENS', 8))
+
+# Stub generator for load testing: sleeps STUB_PREFILL_MS per batch plus STUB_TOKEN_DELAY_MS per token instead of running a model
+STUB_GENERATOR = os.getenv('STUB_GENERATOR', '0') == '1'
+STUB_TOKEN_DELAY_MS = float(os.getenv('STUB_TOKEN_DELAY_MS', 20))
+STUB_PREFILL_MS = float(os.getenv('STUB_PREFILL_MS', 50))
+
+# Startup: the model loads in the background and runs WARMUP_MAX_NEW_TOKENS of a dummy generation (0 = skip)
+# before reporting ready. Until then messages get 503, or wait for the model with QUEUE_UNTIL_READY=1
+WARMUP_MAX_NEW_TOKENS = int(os.getenv('WARMUP_MAX_NEW_TOKENS', 8))
+QUEUE_UNTIL_READY = os.getenv('QUEUE_UNTIL_READY', '0') == '1'
+NOT_READY_RETRY_AFTER = float(os.getenv('NOT_READY_RETRY_AFTER', 10))
+
+# Scenario catalog: data/scenarios/<code>.json plus names.json and numbers.json, re-read when the files
+# change (checked at most every SCENARIO_RELOAD_INTERVAL seconds, 0 = never)
+SCENARIO_DATA_DIR = os.getenv('SCENARIO_DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+SCENARIO_RELOAD_INTERVAL = float(os.getenv('SCENARIO_RELOAD_INTERVAL', 5))
+
+# Keyword tables for question detail tracking and response checks, with per-scenario detail categories
+KEYWORDS_PATH = os.getenv('KEYWORDS_PATH', os.path.join(SCENARIO_DATA_DIR, 'keywords.json'))
+
+# Bulk session creation: most sessions per request, and the call taker line each caller's
+# opening response is pregenerated for when requested
+MAX_BULK_SESSIONS = int(os.getenv('MAX_BULK_SESSIONS', 200))
+OPENING_QUESTION = os.getenv('OPENING_QUESTION', "911, what is your emergency?")
+
+# Opening line pool: answers to the opening question pregenerated per scenario context while the model
+# is idle, served when a session's first message is one of OPENING_GREETINGS (size 0 = disabled)
+OPENING_POOL_SIZE = int(os.getenv('OPENING_POOL_SIZE', 2))
+OPENING_GREETINGS = [greeting for greeting in os.getenv(
+    'OPENING_GREETINGS', "911, what is your emergency?|911, what's your emergency?|911, what is the address of your emergency?"
+).split('|') if greeting]
+
+# Session storage: 'redis', 'memory', or 'auto' (Redis when reachable); idle sessions expire after the TTL (0 = never)
+SESSION_STORE = os.getenv('SESSION_STORE', 'auto')
+SESSION_TTL_SECONDS = int(os.getenv('SESSION_TTL_SECONDS', 4 * 3600))
+
+# Conversation transcript endpoint: most exchanges per page, and bodies at least this large are gzipped for clients that accept it
+CONVERSATION_PAGE_SIZE = int(os.getenv('CONVERSATION_PAGE_SIZE', 200))
+CONVERSATION_GZIP_MIN_BYTES = int(os.getenv('CONVERSATION_GZIP_MIN_BYTES', 1024))
+
+# Session history: completed sessions are recorded to SQLite at SESSION_HISTORY_DB (empty = disabled), written in
+# batches of up to SESSION_HISTORY_BATCH_SIZE, each waiting at most SESSION_HISTORY_FLUSH_INTERVAL seconds for more
+SESSION_HISTORY_DB = os.getenv('SESSION_HISTORY_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'session_history.db'))
+SESSION_HISTORY_BATCH_SIZE = int(os.getenv('SESSION_HISTORY_BATCH_SIZE', 100))
+SESSION_HISTORY_FLUSH_INTERVAL = float(os.getenv('SESSION_HISTORY_FLUSH_INTERVAL', 1.0))
+
+# Session reaper: drops sessions idle past the timeout and ended sessions past the retention,
+# archiving their transcripts under TRANSCRIPT_ARCHIVE_DIR (empty = don't archive)
+SESSION_IDLE_TIMEOUT = float(os.getenv('SESSION_IDLE_TIMEOUT', 1800))
+SESSION_ENDED_RETENTION = float(os.getenv('SESSION_ENDED_RETENTION', 300))
+REAPER_INTERVAL = float(os.getenv('REAPER_INTERVAL', 60))
+TRANSCRIPT_ARCHIVE_DIR = os.getenv('TRANSCRIPT_ARCHIVE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'transcripts'))
+
+# Response quality scoring (spaCy); processes/batch size apply to batched regrading
+SPACY_MODEL = os.getenv('SPACY_MODEL', 'en_core_web_sm')
+QUALITY_SCORER_PROCESSES = int(os.getenv('QUALITY_SCORER_PROCESSES', 1))
+QUALITY_SCORER_BATCH_SIZE = int(os.getenv('QUALITY_SCORER_BATCH_SIZE', 64))
+
+# Model worker processes (1 = generate in the server process)
+MODEL_WORKERS = int(os.getenv('MODEL_WORKERS', 1))
+WORKER_TORCH_THREADS = int(os.getenv('WORKER_TORCH_THREADS', 0))
+WORKER_STATS_INTERVAL = float(os.getenv('WORKER_STATS_INTERVAL', 2))
+
+# Restarting dead workers: the delay doubles from WORKER_RESTART_BACKOFF up to WORKER_RESTART_BACKOFF_MAX
+# for each crash before the worker gets ready, and after WORKER_MAX_RESTARTS such crashes (0 = no limit)
+# the worker is left down and reported as 'failed'
+WORKER_RESTART_BACKOFF = float(os.getenv('WORKER_RESTART_BACKOFF', 1))
+WORKER_RESTART_BACKOFF_MAX = float(os.getenv('WORKER_RESTART_BACKOFF_MAX', 60))
+WORKER_MAX_RESTARTS = int(os.getenv('WORKER_MAX_RESTARTS', 5))
+
+# Continuous batching scheduler
+BATCH_MAX_SIZE = int(os.getenv('BATCH_MAX_SIZE', 8))
+BATCH_MAX_WAIT_MS = float(os.getenv('BATCH_MAX_WAIT_MS', 15))
+
+# Admission control: turns queued or generating beyond this are rejected with 429
+MAX_PENDING_GENERATIONS = int(os.getenv('MAX_PENDING_GENERATIONS', 64))
+POSTPROCESS_WORKERS = int(os.getenv('POSTPROCESS_WORKERS', 4))
+
+# Per-session KV cache reuse across turns
+KV_CACHE_MAX_BYTES = int(os.getenv('KV_CACHE_MAX_BYTES', 4 * 1024 ** 3))
+KV_CACHE_MAX_SESSIONS = int(os.getenv('KV_CACHE_MAX_SESSIONS', 64))
+
+# System prompt prefix cache shared across sessions
+PREFIX_CACHE_MAX_BYTES = int(os.getenv('PREFIX_CACHE_MAX_BYTES', 1024 ** 3))
+PREFIX_CACHE_MAX_ENTRIES = int(os.getenv('PREFIX_CACHE_MAX_ENTRIES', 256))
+
+# Conversation history window: verbatim history is kept under HISTORY_MAX_TOKENS (0 = unlimited) by folding
+# the oldest exchanges, HISTORY_FOLD_CHUNK at a time, into a summary; the last HISTORY_KEEP_TURNS always stay verbatim
+HISTORY_MAX_TOKENS = int(os.getenv('HISTORY_MAX_TOKENS', 1024))
+HISTORY_KEEP_TURNS = int(os.getenv('HISTORY_KEEP_TURNS', 4))
+HISTORY_FOLD_CHUNK = int(os.getenv('HISTORY_FOLD_CHUNK', 4))
+HISTORY_TOKEN_CACHE_SIZE = int(os.getenv('HISTORY_TOKEN_CACHE_SIZE', 4096))
+
+# Streaming responses
+STREAM_TOKEN_TIMEOUT = float(os.getenv('STREAM_TOKEN_TIMEOUT', 120))
+
+# Early stopping: generation ends at the first line, STOP_MAX_SENTENCES sentences (0 disables)
+# or the emotional state's token budget, whichever comes first
+MAX_NEW_TOKENS = int(os.getenv('MAX_NEW_TOKENS', 256))
+STOP_MAX_SENTENCES = int(os.getenv('STOP_MAX_SENTENCES', 4))
+TOKEN_BUDGETS = {
+    'calm': int(os.getenv('TOKEN_BUDGET_CALM', 96)),
+    'worried': int(os.getenv('TOKEN_BUDGET_WORRIED', 96)),
+    'panicked': int(os.getenv('TOKEN_BUDGET_PANICKED', 64)),
+    'hysterical': int(os.getenv('TOKEN_BUDGET_HYSTERICAL', 40)),
+    'relieved': int(os.getenv('TOKEN_BUDGET_RELIEVED', 96))
+}
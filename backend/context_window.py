@@ -0,0 +1,126 @@
+import logging
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Dict, Iterable, Mapping, Optional, Sequence, Tuple
+
+from keyword_matcher import DETAIL_PHRASES
+from models import Exchange
+
+logger = logging.getLogger(__name__)
+
+# Chat template tokens around each message: <|start_header_id|>, role, <|end_header_id|>, "\n\n", <|eot_id|>
+MESSAGE_OVERHEAD_TOKENS = 5
+
+# Scenario context fields holding what the caller tells the operator about each detail category,
+# labelled as in the system prompt
+DETAIL_CONTEXT_FIELDS: Dict[str, Tuple[str, ...]] = {
+    'location': ('location',),
+    'situation': ('situation',),
+    'details': ('situation',),
+    'vehicle': ('situation',),
+    'people': ('current_status',),
+    'medical': ('current_status',),
+    'hazards': ('current_status',),
+    'weapons': ('situation', 'current_status'),
+    'suspect': ('situation', 'current_status'),
+    'hazmat': ('situation', 'current_status'),
+    'contact': ('caller_name', 'phone')
+}
+CONTEXT_FIELD_LABELS = {
+    'location': "Location",
+    'situation': "What happened",
+    'current_status': "Current status",
+    'caller_name': "Your name",
+    'phone': "Your phone"
+}
+
+def fold_summary(messages: int, details: Iterable[str], context: Optional[Mapping[str, str]] = None) -> str:
+    """System prompt note standing in for the oldest messages of a long call, with what the caller
+    already told the operator about each detail asked"""
+    details = list(details)
+    asked = [DETAIL_PHRASES.get(detail, detail) for detail in details]
+    if not asked:
+        topics = "several questions"
+    elif len(asked) == 1:
+        topics = asked[0]
+    else:
+        topics = f"{', '.join(asked[:-1])} and {asked[-1]}"
+
+    fields = list(dict.fromkeys(field for detail in details for field in DETAIL_CONTEXT_FIELDS.get(detail, ())))
+    told = [f"    {CONTEXT_FIELD_LABELS[field]}: {context[field]}" for field in fields if context and context.get(field)]
+    if not told:
+        return f"""    Earlier in this call ({messages} earlier messages not shown) the operator already asked about {topics}, and you answered.
+    Stay consistent with what you told them and don't repeat it unless they ask again."""
+    told = "\n".join(told)
+    return f"""    Earlier in this call ({messages} earlier messages not shown) the operator already asked about {topics}, and you told them:
+{told}
+    Stay consistent with what you told them and don't repeat it unless they ask again."""
+
+class ContextWindow:
+    """Keeps the conversation history in a prompt under a token budget. The last keep_turns exchanges always
+    stay verbatim; older ones are folded into a summary fold_chunk exchanges at a time, so the boundary (and the
+    prompt prefix the session KV cache can reuse) only moves every few turns. Token counts are cached per message text."""
+
+    def __init__(self, count_tokens: Callable[[str], int], max_tokens: int = 1024, keep_turns: int = 4, fold_chunk: int = 4, cache_size: int = 4096):
+        self.count_tokens = count_tokens
+        self.max_tokens = max_tokens
+        self.keep_turns = max(1, keep_turns)
+        self.fold_chunk = max(1, fold_chunk)
+        self.cache_size = cache_size
+        self.counts: Dict[str, int] = OrderedDict()
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.folds = 0
+        self.folded_turns = 0
+
+    def tokens(self, text: str) -> int:
+        with self.lock:
+            count = self.counts.get(text)
+            if count is not None:
+                self.counts.move_to_end(text)
+                self.hits += 1
+                return count
+            self.misses += 1
+
+        count = self.count_tokens(text) + MESSAGE_OVERHEAD_TOKENS
+        with self.lock:
+            self.counts[text] = count
+            while len(self.counts) > self.cache_size:
+                self.counts.popitem(last=False)
+        return count
+
+    def split(self, history: Sequence[Exchange]) -> Tuple[Sequence[Exchange], Sequence[Exchange]]:
+        """(folded, verbatim) history; folded is empty while everything fits the budget"""
+        if not self.max_tokens:
+            return [], history
+
+        # Exchanges are stored as call_taker/caller pairs
+        turns = [history[i:i + 2] for i in range(0, len(history), 2)]
+        costs = [sum(self.tokens(exchange.content) for exchange in turn) for turn in turns]
+        total = sum(costs)
+        foldable = max(0, len(turns) - self.keep_turns)
+        folded = 0
+        while total > self.max_tokens and folded < foldable:
+            step = min(self.fold_chunk, foldable - folded)
+            total -= sum(costs[folded:folded + step])
+            folded += step
+
+        if folded:
+            with self.lock:
+                self.folds += 1
+                self.folded_turns += folded
+        return history[:folded * 2], history[folded * 2:]
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'max_tokens': self.max_tokens,
+                'keep_turns': self.keep_turns,
+                'fold_chunk': self.fold_chunk,
+                'cached_counts': len(self.counts),
+                'count_hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'prompts_folded': self.folds,
+                'avg_turns_folded': round(self.folded_turns / self.folds, 1) if self.folds else 0.0
+            }
@@ -0,0 +1,76 @@
+import logging
+from typing import Dict
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer
+
+logger = logging.getLogger(__name__)
+
+LLAMA3_CHAT_TEMPLATE = "{% set loop_messages = messages %}{% for message in loop_messages %}{% set content = '<|start_header_id|>' + message['role'] + '<|end_header_id|>\n\n'+ message['content'] | trim + '<|eot_id|>' %}{% if loop.index0 == 0 %}{% set content = '<|begin_of_text|>' + content %}{% endif %}{{ content }}{% endfor %}{% if add_generation_prompt %}{{ '<|start_header_id|>assistant<|end_header_id|>\n\n' }}{% endif %}"
+
+def load_tokenizer(model_path: str):
+    """Left-padded tokenizer with a Llama 3 chat template when the checkpoint doesn't ship one"""
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    if tokenizer.chat_template is None:
+        tokenizer.chat_template = LLAMA3_CHAT_TEMPLATE
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    tokenizer.padding_side = "left"
+    return tokenizer
+
+class InferenceBackend:
+    """How the model's weights are placed and stored. Every backend returns a transformers causal LM,
+    so batching, KV cache reuse and early stopping work the same on all of them."""
+
+    name = ''
+
+    def available(self) -> bool:
+        return True
+
+    def load(self, model_path: str):
+        raise NotImplementedError
+
+class GPUBackend(InferenceBackend):
+    """bf16 weights spread over the available GPUs"""
+
+    name = 'gpu'
+
+    def available(self) -> bool:
+        return torch.cuda.is_available()
+
+    def load(self, model_path: str):
+        return AutoModelForCausalLM.from_pretrained(model_path, device_map="auto", torch_dtype=torch.bfloat16)
+
+class CPUBackend(InferenceBackend):
+    """float32 weights on the CPU; CPUs without native bf16 matmuls run float32 faster"""
+
+    name = 'cpu'
+
+    def load(self, model_path: str):
+        model = AutoModelForCausalLM.from_pretrained(model_path, torch_dtype=torch.float32, low_cpu_mem_usage=True)
+        return model.eval()
+
+class CPUInt8Backend(CPUBackend):
+    """float32 model with every Linear layer replaced by a dynamically quantized int8 one:
+    roughly a quarter of the weight memory and faster matmuls, at a small cost in output quality"""
+
+    name = 'cpu-int8'
+
+    def load(self, model_path: str):
+        model = super().load(model_path)
+        layers = sum(1 for module in model.modules() if isinstance(module, torch.nn.Linear))
+        logger.info(f"Quantizing {layers} Linear layers to int8")
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+BACKENDS: Dict[str, InferenceBackend] = {backend.name: backend for backend in (GPUBackend(), CPUBackend(), CPUInt8Backend())}
+
+def get_backend(name: str = 'auto') -> InferenceBackend:
+    """'auto' keeps the GPU path when CUDA is available and falls back to float32 on the CPU"""
+    if name == 'auto':
+        name = 'gpu' if BACKENDS['gpu'].available() else 'cpu'
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}' (expected auto, {', '.join(BACKENDS)})")
+    backend = BACKENDS[name]
+    if not backend.available():
+        raise RuntimeError(f"Inference backend '{name}' is not available on this machine")
+    return backend
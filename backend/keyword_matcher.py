@@ -0,0 +1,94 @@
+import json
+import logging
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional
+
+import config
+from models import ScenarioType
+
+logger = logging.getLogger(__name__)
+
+def trie_pattern(words: Iterable[str]) -> str:
+    """Regex for the longest of words at a position, with shared prefixes factored out so each position
+    costs one walk down a character trie rather than one attempt per keyword"""
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        # A keyword ends here: the greedy optional prefers a longer keyword and falls back to this one
+        return f"(?:{body})?" if '' in node else body
+
+    return build(trie)
+
+class KeywordMatcher:
+    """Every category whose keywords occur in a text, found in one regex pass. Matching is by substring, like
+    `keyword in text.lower()`: a lookahead tries the keyword trie at each position so overlapping keywords all
+    count, and since only the longest keyword starting at a position is reported, each keyword also carries
+    the categories of keywords that are prefixes of it."""
+
+    def __init__(self, tables: Mapping[str, Iterable[str]]):
+        self.order = list(tables)
+        keywords: Dict[str, set] = {}
+        for category, words in tables.items():
+            for word in words:
+                keywords.setdefault(word.lower(), set()).add(category)
+
+        self.categories: Dict[str, FrozenSet[str]] = {
+            word: frozenset(category for other, categories in keywords.items() if word.startswith(other) for category in categories)
+            for word in keywords
+        }
+        self.pattern = re.compile(f"(?=({trie_pattern(keywords)}))") if keywords else None
+
+    def hits(self, text: str) -> FrozenSet[str]:
+        if self.pattern is None:
+            return frozenset()
+        found = set()
+        for match in self.pattern.finditer(text.lower()):
+            found |= self.categories[match.group(1)]
+        return frozenset(found)
+
+    def match(self, text: str) -> List[str]:
+        """Matched categories in table order"""
+        found = self.hits(text)
+        return [category for category in self.order if category in found]
+
+def load_keyword_tables(path: str = config.KEYWORDS_PATH) -> dict:
+    with open(path, 'r') as f:
+        return json.load(f)
+
+TABLES = load_keyword_tables()
+DETAIL_PHRASES: Mapping[str, str] = TABLES.get('detail_phrases', {})
+MESSAGE_INTENTS = frozenset(TABLES.get('message_intents', {}))
+
+def scenario_detail_tables(scenario_type: Optional[ScenarioType]) -> Dict[str, List[str]]:
+    """The base question detail tables plus the categories configured for this scenario type"""
+    tables = dict(TABLES['question_details'])
+    code = scenario_type.value if scenario_type else None
+    for category, entry in TABLES.get('scenario_details', {}).items():
+        if code in entry.get('scenarios', ()):
+            tables[category] = entry['keywords']
+    return tables
+
+@lru_cache(maxsize=None)
+def message_matcher(scenario_type: Optional[ScenarioType] = None) -> KeywordMatcher:
+    """Detail categories and intents in a call-taker message, built once per scenario type"""
+    return KeywordMatcher({**scenario_detail_tables(scenario_type), **TABLES.get('message_intents', {})})
+
+response_matcher = KeywordMatcher(TABLES.get('response_intents', {}))
+answer_check_matcher = KeywordMatcher(TABLES.get('answer_checks', {}))
+answer_word_matcher = KeywordMatcher({**TABLES.get('answer_checks', {}), **TABLES.get('answer_words', {})})
+quality_question_matcher = KeywordMatcher(TABLES.get('quality', {}))
+quality_answer_matcher = KeywordMatcher(TABLES.get('quality_answers', {}))
+
+def question_details(message: str, scenario_type: Optional[ScenarioType] = None) -> List[str]:
+    """Key detail categories a call-taker question asks about"""
+    return [category for category in message_matcher(scenario_type).match(message) if category not in MESSAGE_INTENTS]
@@ -0,0 +1,194 @@
+import logging
+from collections import OrderedDict
+from threading import Lock
+from typing import List, Optional, Sequence, Tuple
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+KVLayers = List[Tuple[torch.Tensor, torch.Tensor]]
+
+def common_prefix_length(a: Sequence[int], b: Sequence[int]) -> int:
+    length = min(len(a), len(b))
+    for i in range(length):
+        if a[i] != b[i]:
+            return i
+    return length
+
+def layers_nbytes(layers: KVLayers) -> int:
+    return sum(k.numel() * k.element_size() + v.numel() * v.element_size() for k, v in layers)
+
+def stack_padded_layers(reused: List[Tuple[int, Optional[KVLayers]]]) -> Tuple[int, Optional[KVLayers]]:
+    """Left-pad each row's cached prefix to the longest one and stack them into a single batch"""
+    cached_length = max(n for n, _ in reused)
+    if cached_length == 0:
+        return 0, None
+
+    template = next(layers for n, layers in reused if n > 0)
+    stacked = []
+    for layer_index, (key_template, _) in enumerate(template):
+        batch_size, num_heads, _, head_dim = key_template.shape
+        keys, values = [], []
+        for n, layers in reused:
+            padding = key_template.new_zeros((batch_size, num_heads, cached_length - n, head_dim))
+            if n == 0:
+                keys.append(padding)
+                values.append(padding)
+                continue
+            key, value = layers[layer_index]
+            keys.append(torch.cat([padding, key], dim=2))
+            values.append(torch.cat([padding, value], dim=2))
+        stacked.append((torch.cat(keys, dim=0), torch.cat(values, dim=0)))
+
+    return cached_length, stacked
+
+def split_padded_layers(layers: KVLayers, attention_mask: torch.Tensor) -> List[KVLayers]:
+    """Undo the padding of a batched cache, returning each row's cache for its unpadded positions only"""
+    prompt_length = attention_mask.shape[1]
+    rows = []
+    for row, row_mask in enumerate(attention_mask):
+        positions = row_mask.nonzero(as_tuple=True)[0]
+        rows.append([
+            (key[row:row + 1, :, :prompt_length].index_select(2, positions),
+             value[row:row + 1, :, :prompt_length].index_select(2, positions))
+            for key, value in layers
+        ])
+    return rows
+
+class KVCacheStore:
+    """Byte-budgeted LRU of (token_ids, layers) entries"""
+
+    def __init__(self, max_bytes: int, max_entries: int):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.reused_tokens = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 and self.max_entries > 0
+
+    def _insert(self, key: str, token_ids: Sequence[int], layers: KVLayers) -> bool:
+        nbytes = layers_nbytes(layers)
+        if nbytes > self.max_bytes:
+            logger.debug(f"KV cache entry {key!r:.40} ({nbytes} bytes) exceeds budget, not cached")
+            return False
+
+        with self.lock:
+            self._pop(key)
+            while self.entries and (self.total_bytes + nbytes > self.max_bytes or len(self.entries) >= self.max_entries):
+                _, (_, _, evicted_bytes) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_bytes
+                self.evictions += 1
+
+            self.entries[key] = (tuple(token_ids), layers, nbytes)
+            self.total_bytes += nbytes
+        return True
+
+    def _pop(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry:
+            self.total_bytes -= entry[2]
+        return entry
+
+    def _record_lookup(self, reused_length: int):
+        with self.lock:
+            if reused_length > 0:
+                self.hits += 1
+                self.reused_tokens += reused_length
+            else:
+                self.misses += 1
+
+    def evict(self, key: str):
+        with self.lock:
+            self._pop(key)
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'cached_bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'reused_tokens': self.reused_tokens
+            }
+
+class SessionKVCache(KVCacheStore):
+    """Each session's prompt KV state so the next turn only prefills what was appended"""
+
+    def take(self, session_id: Optional[str], token_ids: Sequence[int]) -> Tuple[int, Optional[KVLayers]]:
+        """Remove and return the reusable prefix of a session's cache as (cached_length, layers)"""
+        if not session_id or not self.enabled:
+            return 0, None
+
+        with self.lock:
+            entry = self._pop(session_id)
+
+        cached_length = 0
+        if entry:
+            cached_ids, layers, _ = entry
+            # Always leave at least one token to prefill so generate has logits to sample from
+            cached_length = min(common_prefix_length(cached_ids, token_ids), len(token_ids) - 1)
+
+        self._record_lookup(cached_length)
+        if cached_length <= 0:
+            return 0, None
+
+        return cached_length, [(k[:, :, :cached_length], v[:, :, :cached_length]) for k, v in layers]
+
+    def put(self, session_id: Optional[str], token_ids: Sequence[int], layers: KVLayers):
+        if session_id and self.enabled:
+            self._insert(session_id, token_ids, layers)
+
+class PrefixKVCache(KVCacheStore):
+    """KV state of prompt prefixes shared between sessions, keyed by the rendered prefix text"""
+
+    def lookup(self, prefixes: Sequence[str], token_ids: Sequence[int]) -> Tuple[int, Optional[KVLayers]]:
+        """Return the longest cached prefix of token_ids as (cached_length, layers)"""
+        if not self.enabled:
+            return 0, None
+
+        entry = None
+        with self.lock:
+            for prefix in reversed(prefixes):
+                if prefix in self.entries:
+                    self.entries.move_to_end(prefix)
+                    entry = self.entries[prefix]
+                    break
+
+        cached_length = 0
+        if entry:
+            cached_ids, layers, _ = entry
+            cached_length = min(common_prefix_length(cached_ids, token_ids), len(token_ids) - 1)
+
+        self._record_lookup(cached_length)
+        if cached_length <= 0:
+            return 0, None
+
+        # Slices share storage with the cached tensors; generate concatenates rather than writing in place
+        return cached_length, [(k[:, :, :cached_length], v[:, :, :cached_length]) for k, v in layers]
+
+    def missing(self, prefixes: Sequence[str]) -> List[str]:
+        with self.lock:
+            return [prefix for prefix in prefixes if prefix not in self.entries]
+
+    def put(self, prefix: str, prefix_ids: Sequence[int], token_ids: Sequence[int], layers: KVLayers):
+        """Cache the part of a prompt's layers covering prefix_ids, trimmed to where tokenization agrees"""
+        if not self.enabled:
+            return
+
+        length = common_prefix_length(prefix_ids, token_ids)
+        if length == 0:
+            return
+
+        self._insert(prefix, token_ids[:length], [(k[:, :, :length].clone(), v[:, :, :length].clone()) for k, v in layers])
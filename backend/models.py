@@ -1,5 +1,9 @@
+import sys
+import time
 from datetime import datetime
-from typing import Dict, List, Any
+from itertools import islice
+from threading import Lock
+from typing import Dict, Iterable, Iterator, List, Any, NamedTuple, Optional, Tuple, Union
 from dataclasses import dataclass
 from enum import Enum
 
@@ -100,18 +104,91 @@ class ScenarioType(Enum):
     PRISON_RIOT_5000 = "5000"
     PRISON_BLUE_5000 = "5000-blue"
 
+CALL_TAKER = sys.intern('call_taker')
+CALLER = sys.intern('caller')
+
+class Exchange(NamedTuple):
+    role: str
+    content: str
+    timestamp: float
+
+    @classmethod
+    def create(cls, role: str, content: str, timestamp: Optional[float] = None) -> 'Exchange':
+        """Roles are interned so every exchange shares the same two strings"""
+        return cls(sys.intern(role), content, time.time() if timestamp is None else timestamp)
+
+    def to_dict(self) -> Dict[str, str]:
+        """The API and transcript form, with an ISO timestamp"""
+        return {'role': self.role, 'content': self.content, 'timestamp': datetime.fromtimestamp(self.timestamp).isoformat()}
+
+class History:
+    """Append-only conversation history. Every version of a session's history is a length over one shared
+    buffer: appending to the newest version extends the buffer in place and returns a longer view, so a turn
+    costs O(1) instead of a copy of the list. Appending to an older version (a retried or concurrent turn)
+    copies its prefix first, so versions never see each other's exchanges."""
+
+    __slots__ = ('_buffer', '_length')
+    _lock = Lock()
+
+    def __init__(self, exchanges: Iterable[Exchange] = ()):
+        self._buffer = list(exchanges)
+        self._length = len(self._buffer)
+
+    def append(self, *exchanges: Exchange) -> 'History':
+        with History._lock:
+            if len(self._buffer) == self._length:
+                buffer = self._buffer
+                buffer.extend(exchanges)
+            else:
+                buffer = self._buffer[:self._length] + list(exchanges)
+            version = History.__new__(History)
+            version._buffer = buffer
+            version._length = len(buffer)
+        return version
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[Exchange]:
+        return islice(self._buffer, self._length)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Exchange, List[Exchange]]:
+        if isinstance(index, slice):
+            return self._buffer[slice(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('history index out of range')
+        return self._buffer[index]
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, History) and self[:] == other[:]
+
+    def __reduce__(self):
+        # Only this version's exchanges cross to another process, not the whole shared buffer
+        return (History, (self[:],))
+
+    def __repr__(self) -> str:
+        return f"History({self[:]!r})"
+
 @dataclass
 class CallerState:
+    """Treated as immutable: a turn builds a new state sharing the history buffer, detail tuple and profile"""
+
+    __slots__ = ('emotional_state', 'intensity', 'scenario_type', 'key_details_revealed', 'conversation_history', 'caller_profile', 'scenario_progress')
+
     emotional_state: EmotionalState
     intensity: int
     scenario_type: ScenarioType
-    key_details_revealed: List[str]
-    conversation_history: List[Dict[str, str]]
+    key_details_revealed: Tuple[str, ...]
+    conversation_history: History
     caller_profile: Dict[str, Any]
     scenario_progress: float
 
 @dataclass
 class SessionData:
+    __slots__ = ('session_id', 'trainee_id', 'scenario_type', 'caller_state', 'created_at', 'last_activity', 'is_active')
+
     session_id: str
     trainee_id: str
     scenario_type: ScenarioType
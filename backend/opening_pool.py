@@ -0,0 +1,138 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import replace
+from typing import Dict, Iterable, Mapping, NamedTuple, Optional, Tuple
+
+import config
+from models import CALL_TAKER, CALLER, CallerState, Exchange, History, ScenarioType
+from scenario_catalog import CONTEXT_FIELDS
+
+logger = logging.getLogger(__name__)
+
+def normalize_greeting(message: str) -> str:
+    return re.sub(r'\s+', ' ', re.sub(r"[^\w\s]", '', message.lower())).strip()
+
+def context_fingerprint(scenario_type: ScenarioType, context: Mapping[str, str]) -> str:
+    """Identifies the scenario facts an opening line was conditioned on, ignoring the per-session caller name and phone"""
+    facts = [scenario_type.value] + [context.get(field, '') for field in CONTEXT_FIELDS]
+    return hashlib.sha1(json.dumps(facts).encode()).hexdigest()
+
+class OpeningLine(NamedTuple):
+    context: dict
+    response: str
+    state: CallerState
+
+class OpeningLinePool:
+    """Caller answers to the standard opening question, generated ahead of time for every catalog context
+    while the model is idle and served instantly for a session's first message"""
+
+    def __init__(self, generator, session_manager, catalog, size: int = 2, greetings: Iterable[str] = (), interval: float = 5):
+        self.generator = generator
+        self.session_manager = session_manager
+        self.catalog = catalog
+        self.size = size
+        self.greetings = frozenset(normalize_greeting(greeting) for greeting in greetings)
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.pool: Dict[str, deque] = {}
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.evicted = 0
+
+    def start(self):
+        threading.Thread(target=self._run, name="opening-pool", daemon=True).start()
+        logger.info(f"Opening line pool started ({self.size} per context)")
+        return self
+
+    def _run(self):
+        while True:
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            try:
+                self.refill()
+            except Exception as e:
+                logger.error(f"Opening line refill failed: {e}")
+
+    def _targets(self) -> Dict[str, Tuple[ScenarioType, Mapping[str, str]]]:
+        return {
+            context_fingerprint(scenario_type, context): (scenario_type, context)
+            for scenario_type, contexts in self.catalog.contexts.items()
+            for context in contexts
+        }
+
+    def refill(self):
+        """Evict lines for contexts no longer in the catalog, then top up each context while the generator has nothing else to do"""
+        targets = self._targets()
+        with self.lock:
+            for key in [key for key in self.pool if key not in targets]:
+                self.evicted += len(self.pool.pop(key))
+
+        for key, (scenario_type, context) in targets.items():
+            while len(self.pool.get(key, ())) < self.size:
+                if not self.generator.is_idle():
+                    return
+                line = self._generate(scenario_type, context)
+                if line is None:
+                    return
+                with self.lock:
+                    self.pool.setdefault(key, deque()).append(line)
+                    self.generated += 1
+
+    def _generate(self, scenario_type: ScenarioType, context: Mapping[str, str]) -> Optional[OpeningLine]:
+        caller_name, phone = self.catalog.random_name_and_phone()
+        conditioned = {**context, "caller_name": caller_name, "phone": phone}
+        session = self.session_manager.new_session('opening-pool', scenario_type.value, conditioned)
+        response, state = self.generator.submit_response(session.caller_state, config.OPENING_QUESTION).result()
+        if not state.conversation_history:
+            # Generation failed and returned the fallback line with the state unchanged
+            return None
+        return OpeningLine(conditioned, response, state)
+
+    def serve(self, caller_state: CallerState, message: str) -> Optional[Tuple[str, CallerState]]:
+        """A pooled (response, new_state) when this is the session's first message and a standard greeting.
+        The session adopts the caller name and phone the line was generated with."""
+        if caller_state.conversation_history or normalize_greeting(message) not in self.greetings:
+            return None
+
+        context = caller_state.caller_profile.get('selected_context') or {}
+        key = context_fingerprint(caller_state.scenario_type, context)
+        with self.lock:
+            lines = self.pool.get(key)
+            line = lines.popleft() if lines else None
+            if line is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        self.wake.set()
+        if line is None:
+            return None
+
+        now = time.time()
+        state = replace(
+            line.state,
+            caller_profile={**caller_state.caller_profile, 'selected_context': line.context},
+            conversation_history=History().append(
+                Exchange.create(CALL_TAKER, message, now),
+                Exchange.create(CALLER, line.response, now)
+            )
+        )
+        return line.response, state
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'size_per_context': self.size,
+                'contexts': len(self.pool),
+                'lines': sum(len(lines) for lines in self.pool.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'generated': self.generated,
+                'evicted': self.evicted
+            }
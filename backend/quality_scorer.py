@@ -0,0 +1,180 @@
+"""Scores how well a caller response addresses the call taker's question.
+
+Offline regrading of archived transcripts: python quality_scorer.py transcripts/ --processes 4
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import spacy
+
+import config
+from keyword_matcher import quality_answer_matcher, quality_question_matcher
+
+logger = logging.getLogger(__name__)
+
+# Scoring reads POS tags, lemmas, like_num and entities; the dependency parser and sentence splitter are never used
+UNUSED_COMPONENTS = ["parser", "senter"]
+
+YES_NO_STARTS = ('is ', 'are ', 'do ', 'does ', 'did ', 'was ', 'were ', 'has ', 'have ')
+
+def load_spacy_model(name: str = config.SPACY_MODEL):
+    try:
+        nlp = spacy.load(name, exclude=UNUSED_COMPONENTS)
+        logger.info(f"spaCy model '{name}' loaded successfully (components: {', '.join(nlp.pipe_names)})")
+        return nlp
+    except OSError:
+        try:
+            logger.warning(f"spaCy model '{name}' not found. Trying to download...")
+            subprocess.check_call([sys.executable, "-m", "spacy", "download", name])
+            nlp = spacy.load(name, exclude=UNUSED_COMPONENTS)
+            logger.info(f"spaCy model '{name}' downloaded and loaded successfully")
+            return nlp
+        except Exception as e:
+            logger.warning(f"Failed to load spaCy model: {e}. Using fallback text processing.")
+            return None
+
+def fallback_score(question: str, response: str) -> float:
+    question_lower = question.lower()
+    response_lower = response.lower()
+
+    question_words = set(question_lower.split())
+    response_words = set(response_lower.split())
+
+    overlap = len(question_words.intersection(response_words)) / len(question_words) if question_words else 0
+    asked = quality_question_matcher.hits(question_lower)
+    answered = quality_answer_matcher.hits(response_lower)
+
+    if 'number_question' in asked:
+        has_number = any(word.isdigit() for word in response_lower.split())
+        return 0.8 if has_number else 0.3
+
+    elif 'location_question' in asked:
+        return 0.9 if 'location' in answered else 0.4
+
+    elif 'color_question' in asked:
+        return 0.9 if 'color' in answered else 0.3
+
+    elif question_lower.startswith(YES_NO_STARTS):
+        return 0.8 if 'yes_no' in answered else 0.4
+
+    return min(1.0, overlap * 1.5)
+
+def score_docs(question: str, response: str, doc_question, doc_response) -> float:
+    question_lower = question.lower()
+    response_lower = response.lower()
+
+    question_nouns = {token.lemma_ for token in doc_question if token.pos_ in ['NOUN', 'PROPN']}
+    response_nouns = {token.lemma_ for token in doc_response if token.pos_ in ['NOUN', 'PROPN']}
+
+    question_verbs = {token.lemma_ for token in doc_question if token.pos_ == 'VERB'}
+    response_verbs = {token.lemma_ for token in doc_response if token.pos_ == 'VERB'}
+
+    noun_overlap = len(question_nouns.intersection(response_nouns)) / len(question_nouns) if question_nouns else 0
+    verb_overlap = len(question_verbs.intersection(response_verbs)) / len(question_verbs) if question_verbs else 0
+
+    overlap = (noun_overlap + verb_overlap) / 2
+    asked = quality_question_matcher.hits(question_lower)
+    answered = quality_answer_matcher.hits(response_lower)
+
+    if 'number_question' in asked:
+        has_number = any(token.like_num for token in doc_response)
+        return 0.8 if has_number else 0.3
+
+    elif 'location_question' in asked:
+        location_ents = any(ent.label_ in ['GPE', 'LOC', 'FAC'] for ent in doc_response.ents)
+        return 0.9 if (location_ents or 'location' in answered) else 0.4
+
+    elif 'color_question' in asked:
+        return 0.9 if 'color' in answered else 0.3
+
+    elif question_lower.startswith(YES_NO_STARTS):
+        return 0.8 if 'yes_no' in answered else 0.4
+
+    return min(1.0, overlap * 1.5)
+
+class QualityScorer:
+    """Response quality from spaCy POS, lemma and entity overlap, with a word-overlap fallback when no model is available"""
+
+    def __init__(self, nlp=None):
+        self.nlp = nlp if nlp is not None else load_spacy_model()
+
+    def score(self, question: str, response: str) -> float:
+        if not question.strip():
+            return 0.8
+
+        if self.nlp is None:
+            return fallback_score(question, response)
+
+        try:
+            doc_question, doc_response = self.nlp.pipe([question.lower(), response.lower()])
+            return score_docs(question, response, doc_question, doc_response)
+        except Exception as e:
+            logger.warning(f"spaCy processing failed: {e}. Using fallback assessment.")
+            return fallback_score(question, response)
+
+    def score_many(self, turns: Sequence[Tuple[str, str]], n_process: int = 1, batch_size: int = 64) -> List[float]:
+        """Score many (question, response) turns with one batched nlp.pipe call, optionally across worker processes"""
+        scores: List[Optional[float]] = [0.8 if not question.strip() else None for question, _ in turns]
+        pending = [index for index, value in enumerate(scores) if value is None]
+
+        if self.nlp is None:
+            for index in pending:
+                scores[index] = fallback_score(*turns[index])
+            return scores
+
+        texts = (text.lower() for index in pending for text in turns[index])
+        docs = self.nlp.pipe(texts, batch_size=batch_size, n_process=n_process)
+        for index in pending:
+            question, response = turns[index]
+            scores[index] = score_docs(question, response, next(docs), next(docs))
+        return scores
+
+def transcript_turns(history: Iterable[dict]) -> List[Tuple[str, str]]:
+    """(call taker message, caller response) pairs from a conversation history"""
+    turns = []
+    question = None
+    for exchange in history:
+        if exchange['role'] == 'call_taker':
+            question = exchange['content']
+        elif exchange['role'] == 'caller' and question is not None:
+            turns.append((question, exchange['content']))
+            question = None
+    return turns
+
+def main():
+    parser = argparse.ArgumentParser(description="Regrade archived session transcripts")
+    parser.add_argument('archive_dir', nargs='?', default=config.TRANSCRIPT_ARCHIVE_DIR)
+    parser.add_argument('--processes', type=int, default=config.QUALITY_SCORER_PROCESSES)
+    parser.add_argument('--batch-size', type=int, default=config.QUALITY_SCORER_BATCH_SIZE)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    sessions = []
+    for root, _, files in os.walk(args.archive_dir):
+        for name in sorted(files):
+            if name.endswith('.json'):
+                with open(os.path.join(root, name)) as f:
+                    transcript = json.load(f)
+                sessions.append((transcript['session_id'], transcript_turns(transcript['conversation_history'])))
+
+    scores = iter(QualityScorer().score_many(
+        [turn for _, turns in sessions for turn in turns],
+        n_process=args.processes,
+        batch_size=args.batch_size
+    ))
+    for session_id, turns in sessions:
+        session_scores = [next(scores) for _ in turns]
+        print(json.dumps({
+            'session_id': session_id,
+            'turns': len(turns),
+            'avg_quality': round(sum(session_scores) / len(session_scores), 3) if session_scores else None,
+            'scores': [round(score, 3) for score in session_scores]
+        }))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,340 @@
+import itertools
+import random
+import re
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple, Union
+
+from models import CallerState, EmotionalState
+
+Replacement = Union[str, Callable[[re.Match], str]]
+
+WORD = re.compile(r'\w+')
+TEMPLATE_GROUP = re.compile(r'\\(\d+)')
+LEADING_LETTER = re.compile(r'[A-Za-z](?![?*+{])')
+
+def compile_template(template: str, offset: int) -> Replacement:
+    """Turn a \\1-style template into a callable reading groups shifted by offset, parsed once"""
+    parts = TEMPLATE_GROUP.split(template)
+    literals, groups = parts[0::2], [offset + int(group) for group in parts[1::2]]
+    def expand(match: re.Match) -> str:
+        out = literals[0]
+        for group, literal in zip(groups, literals[1:]):
+            out += (match.group(group) or '') + literal
+        return out
+    return expand
+
+def has_top_level_alternation(pattern: str) -> bool:
+    depth, escaped, in_class = 0, False, False
+    for char in pattern:
+        if escaped:
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif in_class:
+            in_class = char != ']'
+        elif char == '[':
+            in_class = True
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == '|' and depth == 0:
+            return True
+    return False
+
+class RulePass:
+    """A table of (pattern, replacement) rules compiled into one alternation and applied in a single scan.
+    At each position the first rule in table order that matches wins. Replacements are literal strings,
+    templates whose \\1-style references are local to their own rule, or callables. With triggers, the
+    pass is skipped unless the text contains one of those words, which every match must include."""
+
+    def __init__(self, rules: Sequence[Tuple[str, Replacement]], flags: int = 0, triggers: Iterable[str] = ()):
+        patterns = [pattern for pattern, _ in rules]
+        prefix = ''
+        # A word boundary shared by every rule is hoisted out of the alternation, and when each rule then
+        # starts with a letter, a lookahead on those letters skips positions no rule can match
+        if all(pattern.startswith(r'\b') and not has_top_level_alternation(pattern) for pattern in patterns):
+            patterns = [pattern[2:] for pattern in patterns]
+            prefix = r'\b'
+            if all(LEADING_LETTER.match(pattern) for pattern in patterns):
+                prefix += '(?=[' + ''.join(sorted({pattern[0] for pattern in patterns})) + '])'
+
+        alternatives = []
+        self.replacements = []
+        group = 1
+        for index, (pattern, (_, replacement)) in enumerate(zip(patterns, rules)):
+            alternatives.append(f'(?P<r{index}>{pattern})')
+            if isinstance(replacement, str) and '\\' in replacement:
+                replacement = compile_template(replacement, group)
+            self.replacements.append(replacement)
+            group += 1 + re.compile(pattern).groups
+        self.pattern = re.compile(prefix + '(?:' + '|'.join(alternatives) + ')', flags)
+        self.triggers = frozenset(triggers)
+
+    def _replace(self, match: re.Match) -> str:
+        replacement = self.replacements[int(match.lastgroup[1:])]
+        return replacement(match) if callable(replacement) else replacement
+
+    def __call__(self, text: str) -> str:
+        if self.triggers and self.triggers.isdisjoint(WORD.findall(text.casefold())):
+            return text
+        return self.pattern.sub(self._replace, text)
+
+def word_rule(table: Dict[str, str]) -> Tuple[str, Replacement]:
+    """Whole-word replacements merged into one alternation with a dict lookup; matched case-insensitively"""
+    words = sorted(table, key=len, reverse=True)
+    pattern = r'\b(?i:(?:' + '|'.join(re.escape(word) for word in words) + r')\b)'
+    return pattern, lambda match: table[match.group(0).casefold()]
+
+ARTIFACTS = ("<|eot_id|>", "<|end_of_text|>", "<|start_header_id|>", "<|end_header_id|>", "*", "`", "\"\"\"")
+SPEAKER_PREFIXES = tuple(
+    (prefix.lower(), len(prefix))
+    for prefix in ("assistant", "911 caller:", "Response:", "Caller:", "A:", "User:", "AI:", "The caller says:", "I would say:")
+)
+
+SURROUNDING_QUOTES = re.compile(r'^"+|"+$')
+
+# Removals are bounded by word boundaries, so merging them cannot create new matches. "in a shaky
+# voice" overlaps the "voice ..." rules and keeps its own pass so they still take precedence.
+STAGE_DIRECTIONS = RulePass([(pattern, '') for pattern in (
+    r'\bpauses?\b', r'\bgulps?\b', r'\bsighs?\b', r'\btakes? a breath\b', r'\bbreathing heavily\b',
+    r'\bclears? throat\b', r'\bstutters?\b', r'\bhesitates?\b',
+    r'\bvoice shaking\b', r'\bvoice trembling\b', r'\blooks around\b', r'\bgestures\b'
+)], re.IGNORECASE, triggers=(
+    'pause', 'pauses', 'gulp', 'gulps', 'sigh', 'sighs', 'take', 'takes', 'breathing', 'clear', 'clears',
+    'stutter', 'stutters', 'hesitate', 'hesitates', 'voice', 'looks', 'gestures'
+))
+SHAKY_VOICE = re.compile(r'\bin a shaky voice\b', re.IGNORECASE)
+PARENTHETICAL_DIRECTIONS = re.compile(r'\([^)]*(?:pause|gulp|sigh|breath|throat|stutter|hesitate|voice|look|gesture)[^)]*\)', re.IGNORECASE)
+THEATRICAL_PHRASES = RulePass([(pattern, '') for pattern in (
+    r'\btakes a deep breath\b', r'\bvoice breaking\b', r'\bwith emotion\b'
+)], re.IGNORECASE, triggers=('takes', 'voice', 'with'))
+DOT_RUNS = re.compile(r'\.+')
+
+# The later leading rules only ever matched text the first two already rewrote
+LEADING_FRAGMENTS = RulePass([
+    (r'^\s*([A-Z])\.\s*([A-Z])', r'\1\2'),
+    (r'^\s*([A-Z][a-z]*)\.\s*([A-Z][a-z]*)', r'\1 \2')
+])
+SHORT_WORD_FRAGMENTS = re.compile(r'\b([A-Z][a-z]{1,3})\.\s*([A-Z][a-z])')
+REPEATED_STARTS = RulePass([
+    (r"\bIt\.\s*It's\b", "It's"),
+    (r'\bMy\.\s*Uh\.\s*', "My "),
+    (r"\bWe\.\s*We're\b", "We're")
+], triggers=('it', 'my', 'we'))
+
+SENTENCE_SPLIT = re.compile(r'([.!?]+)')
+# Sentence starts are already capitalised, so the spacing rule never consumes a lowercase "i"
+SENTENCE_SPACING = RulePass([(r'([.!?])([A-Za-z])', r'\1 \2'), (r'\bi\b', 'I')])
+
+ASIDES = (re.compile(r'\(.*?\)'), re.compile(r'\[.*?\]'))
+
+EXCESSIVE_DESCRIPTORS = frozenset(("distraught", "agitated", "traumatized", "apprehensive"))
+CONVERSATIONAL_STARTERS = ("Well, ",)
+CONVERSATIONAL_FILLERS = (" um",)
+
+NATURAL_LANGUAGE = RulePass([
+    word_rule({'vehicle': 'car', 'automobile': 'car', 'individuals': 'people', 'approximately': 'about'}),
+    (r"\bI am\b", "I'm"),
+    (r"\bdo not\b", "don't"),
+    (r"\bcan not\b", "can't")
+], triggers=('vehicle', 'automobile', 'individuals', 'approximately', 'am', 'not'))
+
+POOR_GRAMMAR = RulePass([
+    word_rule({'plz': 'please', 'u': 'you', 'ur': 'your', 'cuz': 'because', 'ya': 'you'}),
+    (r'\bem\b(?!\w)', 'them'),
+    (r'\bn\b(?=\s)', 'and'),
+    (r'\bthey coulda\b', 'they could have'),
+    (r'\bwoulda\b', 'would have'),
+    (r'\bshoulda\b', 'should have')
+], re.IGNORECASE, triggers=('plz', 'u', 'ur', 'cuz', 'ya', 'em', 'n', 'coulda', 'woulda', 'shoulda'))
+
+# Only one of these can end the response, so a single end-anchored alternation is exact
+HANGING_WORDS = frozenset(('seems', 'looks', 'thinks', 'guess', 'mean', 'like', 'so', 'and', 'but', 'or'))
+HANGING_PHRASE = RulePass([
+    (r'\b(?:it seems|it looks|you know|i guess|i think|I mean|like|so|and|but|or)[!.]$', '.')
+], re.IGNORECASE, triggers=HANGING_WORDS | {'know', 'think'})
+SPACE_BEFORE_PUNCTUATION = re.compile(r'\s+([.!?])')
+
+# Punctuation rules feed each other, so they stay separate passes in this order
+PUNCTUATION_PASSES = tuple((re.compile(pattern), replacement) for pattern, replacement in (
+    (r'!+', '!'),
+    (r'!\s*!', '!'),
+    (r'\.\.\.+', '.'),
+    (r'\.\s*\.', '.'),
+    (r'\.\s+$', '.'),
+    (r'[!?]\.', '.'),
+    (r'\.!', '.')
+))
+SENTENCE_EXCLAMATION = re.compile(r'!(?=\s+[A-Z]|\s*$)')
+EXCLAMATION = re.compile(r'!')
+TRAILING_PUNCTUATION_PASSES = tuple((re.compile(pattern), replacement) for pattern, replacement in (
+    (r',\s*\.\.\.', ','),
+    (r'\s+\.\.\.', '.'),
+    (r'([.!?])\1+', r'\1')
+))
+SENTENCE_END_SPLIT = re.compile(r'[.!?]')
+
+# "anyway" looks ahead at words the first pass may remove, so it runs after it
+NONSENSE_PASSES = (
+    RulePass([(r'\bthingamajig\b', ''), (r'\bwhatever\b', '')], re.IGNORECASE, triggers=('thingamajig', 'whatever')),
+    re.compile(r'\banyway\b(?!\s+\w+)', re.IGNORECASE),
+    re.compile(r'\bwherever I\'m anyway\b', re.IGNORECASE),
+    re.compile(r'\bthat\'s where I\'m\. wherever I\'m\b', re.IGNORECASE)
+)
+WHITESPACE = re.compile(r'\s+')
+
+def strip_artifacts(response: str) -> str:
+    for artifact in ARTIFACTS:
+        response = response.replace(artifact, "")
+
+    for prefix, length in SPEAKER_PREFIXES:
+        if response.lower().startswith(prefix):
+            response = response[length:].strip()
+
+    return response.replace("assistant", "").strip()
+
+def remove_stage_directions(response: str) -> str:
+    response = STAGE_DIRECTIONS(response)
+    response = SHAKY_VOICE.sub('', response)
+    response = PARENTHETICAL_DIRECTIONS.sub('', response)
+    response = THEATRICAL_PHRASES(response)
+    return DOT_RUNS.sub('.', ' '.join(response.split()))
+
+def fix_sentence_fragments(response: str) -> str:
+    response = LEADING_FRAGMENTS(response)
+    response = SHORT_WORD_FRAGMENTS.sub(r'\1 \2', response)
+    return REPEATED_STARTS(response).strip()
+
+def fix_grammar_and_punctuation(response: str) -> str:
+    parts = SENTENCE_SPLIT.split(response)
+    for i in range(0, len(parts), 2):
+        part = parts[i].strip()
+        parts[i] = part[0].upper() + part[1:] if part else part
+    return SENTENCE_SPACING(''.join(parts))
+
+def remove_emotional_indicators(response: str) -> str:
+    return ' '.join(word for word in response.split() if word.lower() not in EXCESSIVE_DESCRIPTORS)
+
+def add_conversational_elements(response: str) -> str:
+    if len(response.split()) < 4:
+        return response
+
+    if random.random() < 0.03:
+        if not response.lower().startswith(('well', 'so', 'um')):
+            response = random.choice(CONVERSATIONAL_STARTERS) + response.lower()
+
+    if random.random() < 0.05:
+        words = response.split()
+        if len(words) > 5:
+            words.insert(random.randint(1, len(words) - 2), random.choice(CONVERSATIONAL_FILLERS))
+            response = " ".join(words)
+
+    return response
+
+def fix_hanging_phrases(response: str) -> str:
+    response = HANGING_PHRASE(response)
+
+    words = response.split()
+    if len(words) > 1 and words[-1].rstrip('!.').lower() in HANGING_WORDS:
+        if words[-1].endswith(('!', '.')):
+            words[-1] = words[-1][:-1] + '.'
+        response = ' '.join(words)
+
+    return SPACE_BEFORE_PUNCTUATION.sub(r'\1', response)
+
+def normalize_punctuation(response: str, emotional_state: Optional[EmotionalState] = None) -> str:
+    for pattern, replacement in PUNCTUATION_PASSES:
+        response = pattern.sub(replacement, response)
+
+    if emotional_state in (EmotionalState.CALM, EmotionalState.WORRIED, EmotionalState.RELIEVED):
+        response = SENTENCE_EXCLAMATION.sub('.', response)
+    elif emotional_state in (EmotionalState.PANICKED, EmotionalState.HYSTERICAL):
+        if response.count('!') > 2:
+            seen = itertools.count()
+            response = EXCLAMATION.sub(lambda match: '!' if next(seen) < 2 else '.', response)
+
+    if not response.endswith(('.', '!', '?')):
+        if SENTENCE_END_SPLIT.split(response)[-1].strip():
+            response = response + '.'
+        else:
+            response = response.rstrip() + '.'
+
+    for pattern, replacement in TRAILING_PUNCTUATION_PASSES:
+        response = pattern.sub(replacement, response)
+    return response
+
+def fallback_response(question: str, caller_state: Optional[CallerState]) -> str:
+    """Generate a fallback response when the original is too short or nonsensical"""
+    if not question:
+        return "I need help."
+
+    question_lower = question.lower()
+
+    if 'number' in question_lower or 'phone' in question_lower:
+        context = caller_state.caller_profile.get('selected_context', {}) if caller_state else {}
+        phone = context.get('phone', '587-555-0123')
+        return f"It's {phone}."
+
+    elif 'location' in question_lower or 'where' in question_lower:
+        return "I'm not sure of the exact address."
+
+    elif 'hurt' in question_lower or 'injured' in question_lower:
+        return "I'm not sure."
+
+    elif 'happened' in question_lower or 'what' in question_lower:
+        return "There's been an accident."
+
+    return "I'm not sure about that."
+
+def ensure_coherent_response(response: str, question: str) -> str:
+    """Final check to ensure the response makes sense and answers the question"""
+    if not response or len(response.split()) < 2:
+        return fallback_response(question, None)
+
+    for rule in NONSENSE_PASSES:
+        response = rule(response) if isinstance(rule, RulePass) else rule.sub('', response)
+    response = WHITESPACE.sub(' ', response).strip()
+
+    if len(response.split()) < 3:
+        return fallback_response(question, None)
+
+    return response
+
+def clean_response(response: str, question: str = "", emotional_state: Optional[EmotionalState] = None, caller_state: Optional[CallerState] = None) -> str:
+    response = strip_artifacts(response)
+    lines = [line.strip() for line in response.split('\n') if line.strip()]
+    if lines:
+        response = lines[0]
+
+    response = SURROUNDING_QUOTES.sub('', response)
+    response = remove_stage_directions(response)
+    response = fix_sentence_fragments(response)
+    response = fix_grammar_and_punctuation(response)
+
+    if len(response.split()) < 3 or not response.strip():
+        response = fallback_response(question, caller_state)
+
+    for pattern in ASIDES:
+        response = pattern.sub('', response)
+    response = remove_emotional_indicators(response)
+    response = NATURAL_LANGUAGE(response)
+    response = POOR_GRAMMAR(response)
+    response = add_conversational_elements(response)
+    response = fix_hanging_phrases(response)
+    response = normalize_punctuation(response, emotional_state)
+    response = ensure_coherent_response(response, question)
+
+    return response.strip()
+
+def clean_partial_response(response: str, emotional_state: Optional[EmotionalState] = None) -> str:
+    """Sentence-level subset of clean_response for streaming; steps that need the whole response are left to the final pass"""
+    response = strip_artifacts(response)
+    response = SURROUNDING_QUOTES.sub('', response)
+    response = remove_stage_directions(response)
+    for pattern in ASIDES:
+        response = pattern.sub('', response)
+    response = remove_emotional_indicators(response)
+    response = NATURAL_LANGUAGE(response)
+    response = POOR_GRAMMAR(response)
+    response = fix_grammar_and_punctuation(response)
+    return response.strip()
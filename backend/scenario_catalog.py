@@ -0,0 +1,128 @@
+import glob
+import json
+import logging
+import os
+import random
+import time
+from threading import Lock
+from types import MappingProxyType
+from typing import Dict, Mapping, NamedTuple, Tuple
+
+import config
+from models import ScenarioType
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_FIELDS = ("location", "situation", "current_status", "caller_background")
+UNKNOWN_CALLER = ("Unknown Caller", "403-000-0000")
+FALLBACK_CONTEXT = MappingProxyType({
+    "location": "Unknown Location",
+    "situation": "Emergency situation",
+    "current_status": "Situation in progress",
+    "caller_background": "Caller reporting emergency"
+})
+
+class CatalogIndex(NamedTuple):
+    contexts: Mapping[ScenarioType, Tuple[Mapping[str, str], ...]]
+    names: Tuple[str, ...]
+    phones: Tuple[str, ...]
+
+def read_json(path: str):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def load_contexts(scenario_dir: str) -> Mapping[ScenarioType, Tuple[Mapping[str, str], ...]]:
+    """One JSON file per scenario code: {"scenario_type": "10-01", "contexts": [{location, situation, ...}, ...]}"""
+    contexts: Dict[ScenarioType, Tuple[Mapping[str, str], ...]] = {}
+    for path in sorted(glob.glob(os.path.join(scenario_dir, '*.json'))):
+        data = read_json(path)
+        try:
+            scenario_type = ScenarioType(data['scenario_type'])
+        except (KeyError, ValueError):
+            raise ValueError(f"{path}: missing or unknown scenario_type")
+        for context in data.get('contexts', []):
+            missing = [field for field in CONTEXT_FIELDS if field not in context]
+            if missing:
+                raise ValueError(f"{path}: context is missing {', '.join(missing)}")
+        contexts[scenario_type] = contexts.get(scenario_type, ()) + tuple(MappingProxyType(dict(context)) for context in data.get('contexts', []))
+    return MappingProxyType(contexts)
+
+def load_caller_pools(data_dir: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    try:
+        names = read_json(os.path.join(data_dir, 'names.json'))
+        numbers = read_json(os.path.join(data_dir, 'numbers.json'))
+    except FileNotFoundError:
+        return (), ()
+    return tuple(names.get('male_names', []) + names.get('female_names', [])), tuple(numbers.get('phone_numbers', []))
+
+class ScenarioCatalog:
+    """Scenario contexts and caller name/phone pools, read once from the data directory into read-only
+    structures and swapped for a fresh copy when any of the files change"""
+
+    def __init__(self, data_dir: str = config.SCENARIO_DATA_DIR, reload_interval: float = config.SCENARIO_RELOAD_INTERVAL):
+        self.data_dir = data_dir
+        self.scenario_dir = os.path.join(data_dir, 'scenarios')
+        self.reload_interval = reload_interval
+        self.lock = Lock()
+        self.reloads = 0
+        self.mtimes = self._mtimes()
+        self.checked_at = time.monotonic()
+        self.index = self._load()
+
+    def _mtimes(self) -> Dict[str, float]:
+        paths = glob.glob(os.path.join(self.scenario_dir, '*.json'))
+        paths += [os.path.join(self.data_dir, name) for name in ('names.json', 'numbers.json')]
+        mtimes = {}
+        for path in paths:
+            try:
+                mtimes[path] = os.stat(path).st_mtime
+            except FileNotFoundError:
+                continue
+        return mtimes
+
+    def _load(self) -> CatalogIndex:
+        names, phones = load_caller_pools(self.data_dir)
+        index = CatalogIndex(load_contexts(self.scenario_dir), names, phones)
+        logger.info(f"Loaded {sum(len(contexts) for contexts in index.contexts.values())} scenario contexts for {len(index.contexts)} scenario types")
+        return index
+
+    def _current(self) -> CatalogIndex:
+        if self.reload_interval and time.monotonic() - self.checked_at >= self.reload_interval:
+            self._reload_if_changed()
+        return self.index
+
+    def _reload_if_changed(self):
+        if not self.lock.acquire(blocking=False):
+            return
+        try:
+            self.checked_at = time.monotonic()
+            mtimes = self._mtimes()
+            if mtimes == self.mtimes:
+                return
+            try:
+                self.index = self._load()
+                self.reloads += 1
+            except (OSError, ValueError) as e:
+                # Keep serving the previous catalog until the files are fixed
+                logger.error(f"Failed to reload scenario catalog: {e}")
+            self.mtimes = mtimes
+        finally:
+            self.lock.release()
+
+    @property
+    def contexts(self) -> Mapping[ScenarioType, Tuple[Mapping[str, str], ...]]:
+        return self._current().contexts
+
+    def random_name_and_phone(self) -> Tuple[str, str]:
+        index = self._current()
+        if index.names and index.phones:
+            return random.choice(index.names), random.choice(index.phones)
+        return UNKNOWN_CALLER
+
+    def random_context(self, scenario_type: ScenarioType) -> dict:
+        """A new dict per call: one of the scenario's contexts plus a random caller name and phone"""
+        index = self._current()
+        contexts = index.contexts.get(scenario_type)
+        context = random.choice(contexts) if contexts else FALLBACK_CONTEXT
+        caller_name, phone = self.random_name_and_phone()
+        return {**context, "caller_name": caller_name, "phone": phone}
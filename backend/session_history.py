@@ -0,0 +1,216 @@
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from models import SessionData
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    trainee_id TEXT NOT NULL,
+    scenario_type TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    ended_at REAL NOT NULL,
+    turns INTEGER NOT NULL,
+    emotional_state TEXT NOT NULL,
+    intensity REAL NOT NULL,
+    scenario_progress REAL NOT NULL,
+    details_revealed INTEGER NOT NULL,
+    key_details_revealed TEXT NOT NULL
+);
+DROP INDEX IF EXISTS sessions_trainee;
+CREATE INDEX IF NOT EXISTS sessions_trainee_page ON sessions (trainee_id, created_at, session_id);
+CREATE INDEX IF NOT EXISTS sessions_scenario ON sessions (scenario_type, created_at);
+CREATE INDEX IF NOT EXISTS sessions_created ON sessions (created_at);
+"""
+
+COLUMNS = ('session_id', 'trainee_id', 'scenario_type', 'created_at', 'ended_at', 'turns',
+           'emotional_state', 'intensity', 'scenario_progress', 'details_revealed', 'key_details_revealed')
+
+def session_row(session: SessionData) -> tuple:
+    state = session.caller_state
+    return (
+        session.session_id,
+        session.trainee_id,
+        session.scenario_type.value,
+        session.created_at.timestamp(),
+        session.last_activity.timestamp(),
+        len(state.conversation_history) // 2,
+        state.emotional_state.value,
+        state.intensity,
+        state.scenario_progress,
+        len(state.key_details_revealed),
+        json.dumps(list(state.key_details_revealed))
+    )
+
+def session_summary(row: sqlite3.Row) -> dict:
+    return {
+        'session_id': row['session_id'],
+        'scenario_type': row['scenario_type'],
+        'created_at': datetime.fromtimestamp(row['created_at']).isoformat(),
+        'ended_at': datetime.fromtimestamp(row['ended_at']).isoformat(),
+        'duration_seconds': round(row['ended_at'] - row['created_at'], 1),
+        'turns': row['turns'],
+        'emotional_state': row['emotional_state'],
+        'intensity': row['intensity'],
+        'scenario_progress': row['scenario_progress'],
+        'key_details_revealed': json.loads(row['key_details_revealed'])
+    }
+
+class SessionHistoryStore:
+    """Completed sessions in SQLite for trainee history and per-scenario analytics. Sessions are queued when
+    they end and written by a background thread in batches of up to batch_size, one transaction per batch,
+    so ending a call never waits on the disk. Queries run on a connection per request thread."""
+
+    def __init__(self, path: str, batch_size: int = 100, flush_interval: float = 1.0):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.queue: queue.Queue = queue.Queue()
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        self.recorded = 0
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+
+    def start(self):
+        db = self._connect()
+        db.executescript(SCHEMA)
+        db.close()
+        self.thread = threading.Thread(target=self._run, name="session-history", daemon=True)
+        self.thread.start()
+        logger.info(f"Session history store at {self.path}")
+        return self
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, timeout=30)
+        db.row_factory = sqlite3.Row
+        # WAL lets queries read while the writer commits a batch
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        return db
+
+    def _reader(self) -> sqlite3.Connection:
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            db = self.local.db = self._connect()
+        return db
+
+    def record(self, session: SessionData):
+        """Queue a finished session; recording one again replaces its row"""
+        self.queue.put(session_row(session))
+        with self.lock:
+            self.recorded += 1
+
+    def _run(self):
+        db = self._connect()
+        while True:
+            rows = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(rows) < self.batch_size:
+                try:
+                    rows.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            stop = None in rows
+            rows = [row for row in rows if row is not None]
+            try:
+                if rows:
+                    with db:
+                        db.executemany(f"INSERT OR REPLACE INTO sessions ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+                    with self.lock:
+                        self.written += len(rows)
+                        self.batches += 1
+            except sqlite3.Error as e:
+                logger.error(f"Failed to write {len(rows)} sessions to history: {e}")
+                with self.lock:
+                    self.failed += len(rows)
+            if stop:
+                db.close()
+                return
+
+    def close(self):
+        """Write out queued sessions and stop the writer"""
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+    def trainee_sessions(self, trainee_id: str, scenario_type: Optional[str] = None, before: Optional[Tuple[float, str]] = None,
+                         limit: int = 50) -> Tuple[List[dict], Optional[Tuple[float, str]]]:
+        """A page of a trainee's sessions, newest first, and the (created_at, session_id) cursor for the next page
+        (None on the last). The session id breaks ties, so sessions started in the same instant are neither
+        skipped nor repeated across pages"""
+        query = "SELECT * FROM sessions WHERE trainee_id = ?"
+        params: list = [trainee_id]
+        if scenario_type:
+            query += " AND scenario_type = ?"
+            params.append(scenario_type)
+        if before is not None:
+            query += " AND (created_at, session_id) < (?, ?)"
+            params.extend(before)
+        query += " ORDER BY created_at DESC, session_id DESC LIMIT ?"
+        params.append(limit)
+        rows = self._reader().execute(query, params).fetchall()
+        next_before = (rows[-1]['created_at'], rows[-1]['session_id']) if len(rows) == limit else None
+        return [session_summary(row) for row in rows], next_before
+
+    def scenario_stats(self, trainee_id: Optional[str] = None, since: Optional[float] = None) -> List[dict]:
+        """Per-scenario aggregates, optionally for one trainee and sessions started after since"""
+        conditions, params = [], []
+        if trainee_id:
+            conditions.append("trainee_id = ?")
+            params.append(trainee_id)
+        if since is not None:
+            conditions.append("created_at >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._reader().execute(f"""
+            SELECT scenario_type,
+                   COUNT(*) AS sessions,
+                   COUNT(DISTINCT trainee_id) AS trainees,
+                   AVG(ended_at - created_at) AS avg_duration_seconds,
+                   AVG(turns) AS avg_turns,
+                   AVG(scenario_progress) AS avg_scenario_progress,
+                   AVG(intensity) AS avg_final_intensity,
+                   AVG(details_revealed) AS avg_details_revealed,
+                   AVG(scenario_progress >= 1.0) AS completion_rate,
+                   MAX(created_at) AS last_played
+            FROM sessions {where}
+            GROUP BY scenario_type
+            ORDER BY sessions DESC, scenario_type
+        """, params)
+        return [
+            {
+                'scenario_type': row['scenario_type'],
+                'sessions': row['sessions'],
+                'trainees': row['trainees'],
+                'avg_duration_seconds': round(row['avg_duration_seconds'], 1),
+                'avg_turns': round(row['avg_turns'], 2),
+                'avg_scenario_progress': round(row['avg_scenario_progress'], 3),
+                'avg_final_intensity': round(row['avg_final_intensity'], 2),
+                'avg_details_revealed': round(row['avg_details_revealed'], 2),
+                'completion_rate': round(row['completion_rate'], 3),
+                'last_played': datetime.fromtimestamp(row['last_played']).isoformat()
+            }
+            for row in rows
+        ]
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'path': self.path,
+                'recorded': self.recorded,
+                'written': self.written,
+                'batches': self.batches,
+                'failed': self.failed,
+                'queued': self.queue.qsize()
+            }
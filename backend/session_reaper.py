@@ -0,0 +1,106 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from models import SessionData
+
+logger = logging.getLogger(__name__)
+
+def transcript(session: SessionData) -> dict:
+    state = session.caller_state
+    return {
+        'session_id': session.session_id,
+        'trainee_id': session.trainee_id,
+        'scenario_type': session.scenario_type.value,
+        'created_at': session.created_at.isoformat(),
+        'last_activity': session.last_activity.isoformat(),
+        'completed': not session.is_active,
+        'emotional_state': state.emotional_state.value,
+        'intensity': state.intensity,
+        'scenario_progress': state.scenario_progress,
+        'key_details_revealed': list(state.key_details_revealed),
+        'caller_profile': state.caller_profile,
+        'conversation_history': [exchange.to_dict() for exchange in state.conversation_history]
+    }
+
+class SessionReaper:
+    """Periodically removes idle and ended sessions from the store, archiving their transcripts to disk"""
+
+    def __init__(self, session_manager, archive_dir: str = '', idle_timeout: float = 1800, ended_retention: float = 300,
+                 interval: float = 60, on_expire: Optional[Callable[[str], None]] = None):
+        self.store = session_manager.store
+        self.archive_dir = archive_dir
+        self.idle_timeout = timedelta(seconds=idle_timeout)
+        self.ended_retention = timedelta(seconds=ended_retention)
+        self.interval = interval
+        self.on_expire = on_expire
+        self.lock = threading.Lock()
+        self.sweeps = 0
+        self.expired_idle = 0
+        self.expired_ended = 0
+        self.archived = 0
+        self.memory = {}
+
+    def start(self):
+        threading.Thread(target=self._run, name="session-reaper", daemon=True).start()
+        logger.info(f"Session reaper started (idle timeout {self.idle_timeout}, ended retention {self.ended_retention})")
+        return self
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Session reaper sweep failed: {e}")
+
+    def sweep(self):
+        now = datetime.now()
+        expired = self.store.expire(now - self.idle_timeout, now - self.ended_retention)
+        for session in expired:
+            if self.archive_dir:
+                self._archive(session)
+            if self.on_expire:
+                self.on_expire(session.session_id)
+
+        # Sizes are measured here rather than in /health so the health check stays O(1)
+        memory = {session_id: self.store.memory_usage(session_id) for session_id in self.store.session_ids()}
+        with self.lock:
+            self.sweeps += 1
+            self.expired_idle += sum(1 for session in expired if session.is_active)
+            self.expired_ended += sum(1 for session in expired if not session.is_active)
+            self.memory = memory
+        if expired:
+            logger.info(f"Expired {len(expired)} sessions")
+
+    def _archive(self, session: SessionData):
+        directory = os.path.join(self.archive_dir, session.created_at.strftime('%Y-%m-%d'))
+        path = os.path.join(directory, f"{session.session_id}.json")
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(path + '.tmp', 'w') as f:
+                json.dump(transcript(session), f)
+            os.replace(path + '.tmp', path)
+            with self.lock:
+                self.archived += 1
+        except OSError as e:
+            logger.error(f"Failed to archive transcript for {session.session_id}: {e}")
+
+    def stats(self) -> dict:
+        with self.lock:
+            sizes = sorted(self.memory.items(), key=lambda item: item[1], reverse=True)
+            total = sum(size for _, size in sizes)
+            return {
+                'stored': len(sizes),
+                'total_bytes': total,
+                'avg_bytes': total // len(sizes) if sizes else 0,
+                'largest': [{'session_id': session_id, 'bytes': size} for session_id, size in sizes[:5]],
+                'sweeps': self.sweeps,
+                'expired_idle': self.expired_idle,
+                'expired_ended': self.expired_ended,
+                'archived': self.archived
+            }
@@ -0,0 +1,300 @@
+import logging
+import sys
+import time
+from datetime import datetime
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+import msgpack
+from redis.exceptions import ResponseError, WatchError
+
+import config
+from models import SessionData, CallerState, Exchange, History, ScenarioType, EmotionalState
+
+logger = logging.getLogger(__name__)
+
+def pack_caller_state(caller_state: CallerState) -> bytes:
+    """Everything but the conversation history, which is stored as its own list"""
+    return msgpack.packb([
+        caller_state.emotional_state.value,
+        caller_state.intensity,
+        caller_state.scenario_type.value,
+        caller_state.key_details_revealed,
+        caller_state.caller_profile,
+        caller_state.scenario_progress
+    ], use_bin_type=True)
+
+def unpack_caller_state(packed: bytes, history: History) -> CallerState:
+    emotional_state, intensity, scenario_type, key_details, caller_profile, progress = msgpack.unpackb(packed, raw=False)
+    return CallerState(
+        emotional_state=EmotionalState(emotional_state),
+        intensity=intensity,
+        scenario_type=ScenarioType(scenario_type),
+        key_details_revealed=tuple(key_details),
+        conversation_history=history,
+        caller_profile=caller_profile,
+        scenario_progress=progress
+    )
+
+def pack_exchange(exchange: Exchange) -> bytes:
+    return msgpack.packb(list(exchange), use_bin_type=True)
+
+def unpack_exchange(packed: bytes) -> Exchange:
+    role, content, timestamp = msgpack.unpackb(packed, raw=False)
+    if isinstance(timestamp, str):
+        # Exchanges stored before timestamps were packed as floats
+        timestamp = datetime.fromisoformat(timestamp).timestamp()
+    return Exchange.create(role, content, timestamp)
+
+def object_nbytes(obj, seen=None) -> int:
+    """Approximate deep size of plain containers, strings, dataclasses and slotted classes"""
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(object_nbytes(k, seen) + object_nbytes(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(object_nbytes(item, seen) for item in obj)
+    elif hasattr(obj, '__dict__'):
+        size += object_nbytes(vars(obj), seen)
+    elif hasattr(obj, '__slots__'):
+        size += sum(object_nbytes(getattr(obj, name), seen) for name in obj.__slots__ if hasattr(obj, name))
+    return size
+
+class InMemorySessionStore:
+    """Sessions held in this process; lost on restart and not shared between servers"""
+
+    def __init__(self):
+        self.sessions: Dict[str, SessionData] = {}
+        self.lock = Lock()
+        self.active = 0
+
+    def create(self, session: SessionData):
+        with self.lock:
+            previous = self.sessions.get(session.session_id)
+            self.sessions[session.session_id] = session
+            self.active += int(session.is_active) - int(previous.is_active if previous else 0)
+
+    def create_many(self, sessions: List[SessionData]):
+        for session in sessions:
+            self.create(session)
+
+    def get(self, session_id: str) -> Optional[SessionData]:
+        return self.sessions.get(session_id)
+
+    def update(self, session_id: str, caller_state: CallerState):
+        if session_id in self.sessions:
+            self.sessions[session_id].caller_state = caller_state
+            self.sessions[session_id].last_activity = datetime.now()
+
+    def terminate(self, session_id: str):
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session and session.is_active:
+                session.is_active = False
+                session.last_activity = datetime.now()
+                self.active -= 1
+
+    def conversation(self, session_id: str, since: int, limit: int) -> Optional[Tuple[int, List[Exchange], bool]]:
+        """(history length, up to limit exchanges from index since, is_active), or None for an unknown session"""
+        session = self.sessions.get(session_id)
+        if not session:
+            return None
+        history = session.caller_state.conversation_history
+        return len(history), history[since:since + limit], session.is_active
+
+    def active_count(self) -> int:
+        return self.active
+
+    def expire(self, idle_before: datetime, ended_before: datetime) -> List[SessionData]:
+        """Remove and return active sessions idle since idle_before and ended sessions older than ended_before"""
+        with self.lock:
+            expired = [
+                session for session in self.sessions.values()
+                if session.last_activity < (idle_before if session.is_active else ended_before)
+            ]
+            for session in expired:
+                del self.sessions[session.session_id]
+                self.active -= int(session.is_active)
+        return expired
+
+    def session_ids(self) -> List[str]:
+        return list(self.sessions)
+
+    def memory_usage(self, session_id: str) -> int:
+        session = self.sessions.get(session_id)
+        return object_nbytes(session) if session else 0
+
+class RedisSessionStore:
+    """Sessions in Redis: a hash of msgpack fields per session plus an append-only history list,
+    both expiring after ttl seconds without activity"""
+
+    ACTIVE_KEY = 'sessions:active'
+    ENDED_KEY = 'sessions:ended'
+
+    def __init__(self, redis_client, ttl: int = 0):
+        self.redis = redis_client
+        self.ttl = ttl
+
+    def _keys(self, session_id: str):
+        return f'session:{session_id}', f'session:{session_id}:history'
+
+    def _expire(self, pipe, session_id: str):
+        if self.ttl:
+            for key in self._keys(session_id):
+                pipe.expire(key, self.ttl)
+
+    def create(self, session: SessionData):
+        self.create_many([session])
+
+    def create_many(self, sessions: List[SessionData]):
+        pipe = self.redis.pipeline()
+        for session in sessions:
+            self._create(pipe, session)
+        pipe.execute()
+
+    def _create(self, pipe, session: SessionData):
+        key, history_key = self._keys(session.session_id)
+        pipe.delete(history_key)
+        pipe.hset(key, mapping={
+            'trainee_id': session.trainee_id,
+            'scenario_type': session.scenario_type.value,
+            'created_at': session.created_at.timestamp(),
+            'last_activity': session.last_activity.timestamp(),
+            'is_active': int(session.is_active),
+            'state': pack_caller_state(session.caller_state)
+        })
+        history = session.caller_state.conversation_history
+        if history:
+            pipe.rpush(history_key, *[pack_exchange(exchange) for exchange in history])
+        if session.is_active:
+            pipe.zadd(self.ACTIVE_KEY, {session.session_id: session.last_activity.timestamp()})
+        self._expire(pipe, session.session_id)
+
+    def get(self, session_id: str) -> Optional[SessionData]:
+        key, history_key = self._keys(session_id)
+        pipe = self.redis.pipeline()
+        pipe.hgetall(key)
+        pipe.lrange(history_key, 0, -1)
+        fields, history = pipe.execute()
+        if not fields:
+            return None
+
+        return SessionData(
+            session_id=session_id,
+            trainee_id=fields[b'trainee_id'].decode(),
+            scenario_type=ScenarioType(fields[b'scenario_type'].decode()),
+            caller_state=unpack_caller_state(fields[b'state'], History(unpack_exchange(exchange) for exchange in history)),
+            created_at=datetime.fromtimestamp(float(fields[b'created_at'])),
+            last_activity=datetime.fromtimestamp(float(fields[b'last_activity'])),
+            is_active=fields[b'is_active'] == b'1'
+        )
+
+    def update(self, session_id: str, caller_state: CallerState):
+        key, history_key = self._keys(session_id)
+        now = time.time()
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    # Only exchanges past what is already stored are appended; WATCH retries if
+                    # another server appended to this session in between
+                    pipe.watch(key, history_key)
+                    if not pipe.exists(key):
+                        return
+                    stored = pipe.llen(history_key)
+                    is_active = pipe.hget(key, 'is_active') == b'1'
+
+                    pipe.multi()
+                    pipe.hset(key, mapping={'state': pack_caller_state(caller_state), 'last_activity': now})
+                    appended = caller_state.conversation_history[stored:]
+                    if appended:
+                        pipe.rpush(history_key, *[pack_exchange(exchange) for exchange in appended])
+                    if is_active:
+                        pipe.zadd(self.ACTIVE_KEY, {session_id: now})
+                    self._expire(pipe, session_id)
+                    pipe.execute()
+                    return
+                except WatchError:
+                    continue
+
+    def terminate(self, session_id: str):
+        key, _ = self._keys(session_id)
+        now = time.time()
+        pipe = self.redis.pipeline()
+        pipe.zrem(self.ACTIVE_KEY, session_id)
+        pipe.exists(key)
+        _, exists = pipe.execute()
+        if exists:
+            pipe = self.redis.pipeline()
+            pipe.hset(key, mapping={'is_active': 0, 'last_activity': now})
+            pipe.zadd(self.ENDED_KEY, {session_id: now})
+            self._expire(pipe, session_id)
+            pipe.execute()
+
+    def conversation(self, session_id: str, since: int, limit: int) -> Optional[Tuple[int, List[Exchange], bool]]:
+        # Only the requested page of the history list is read
+        key, history_key = self._keys(session_id)
+        pipe = self.redis.pipeline()
+        pipe.hget(key, 'is_active')
+        pipe.llen(history_key)
+        pipe.lrange(history_key, since, since + limit - 1)
+        is_active, length, page = pipe.execute()
+        if is_active is None:
+            return None
+        return length, [unpack_exchange(exchange) for exchange in page], is_active == b'1'
+
+    def active_count(self) -> int:
+        # Sessions whose keys have expired drop out of the count by their last activity score
+        if not self.ttl:
+            return self.redis.zcard(self.ACTIVE_KEY)
+        cutoff = time.time() - self.ttl
+        pipe = self.redis.pipeline()
+        pipe.zremrangebyscore(self.ACTIVE_KEY, '-inf', cutoff)
+        pipe.zcard(self.ACTIVE_KEY)
+        return pipe.execute()[1]
+
+    def expire(self, idle_before: datetime, ended_before: datetime) -> List[SessionData]:
+        candidates = [(self.ACTIVE_KEY, session_id) for session_id in self.redis.zrangebyscore(self.ACTIVE_KEY, '-inf', idle_before.timestamp())]
+        candidates += [(self.ENDED_KEY, session_id) for session_id in self.redis.zrangebyscore(self.ENDED_KEY, '-inf', ended_before.timestamp())]
+
+        expired = []
+        for index_key, session_id in candidates:
+            # Whichever server removes the index entry owns the expiry
+            if not self.redis.zrem(index_key, session_id):
+                continue
+            session_id = session_id.decode()
+            session = self.get(session_id)
+            self.redis.delete(*self._keys(session_id))
+            if session:
+                expired.append(session)
+        return expired
+
+    def session_ids(self) -> List[str]:
+        pipe = self.redis.pipeline()
+        pipe.zrange(self.ACTIVE_KEY, 0, -1)
+        pipe.zrange(self.ENDED_KEY, 0, -1)
+        active, ended = pipe.execute()
+        return [session_id.decode() for session_id in active + ended]
+
+    def memory_usage(self, session_id: str) -> int:
+        key, history_key = self._keys(session_id)
+        try:
+            return sum(self.redis.memory_usage(k) or 0 for k in (key, history_key))
+        except ResponseError:
+            # Servers without MEMORY USAGE: fall back to the serialized size
+            pipe = self.redis.pipeline()
+            pipe.hvals(key)
+            pipe.lrange(history_key, 0, -1)
+            values, history = pipe.execute()
+            return sum(len(value) for value in values + history)
+
+def create_session_store(redis_client=None):
+    if config.SESSION_STORE == 'memory' or (config.SESSION_STORE == 'auto' and redis_client is None):
+        logger.info("Using in-memory session storage")
+        return InMemorySessionStore()
+    if redis_client is None:
+        raise RuntimeError("SESSION_STORE=redis but Redis is not available")
+    logger.info(f"Using Redis session storage (idle TTL {config.SESSION_TTL_SECONDS}s)")
+    return RedisSessionStore(redis_client, ttl=config.SESSION_TTL_SECONDS)
@@ -0,0 +1,55 @@
+from collections import defaultdict
+from threading import Lock
+
+class ForwardCounter:
+    """Counts forward calls of a model; under assisted generation each target call verifies one round of draft tokens
+    and each draft call proposes one token"""
+
+    def __init__(self, model):
+        self.calls = 0
+        self.handle = model.register_forward_hook(self._hook)
+
+    def _hook(self, module, inputs, outputs):
+        self.calls += 1
+
+class SpeculativeStats:
+    """Draft acceptance per scenario type for turns generated with assisted decoding"""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.scenarios = defaultdict(lambda: {'turns': 0, 'generated_tokens': 0, 'draft_tokens': 0, 'accepted_tokens': 0, 'verify_steps': 0, 'decode_ms': 0.0})
+        self.batched_turns = 0
+
+    def record(self, scenario_type: str, generated: int, draft_tokens: int, verify_steps: int, decode_ms: float) -> float:
+        """Record one assisted turn and return its acceptance rate"""
+        # Every verify step keeps the accepted draft tokens plus one token from the target model
+        accepted = max(0, generated - verify_steps)
+        with self.lock:
+            totals = self.scenarios[scenario_type or 'unknown']
+            totals['turns'] += 1
+            totals['generated_tokens'] += generated
+            totals['draft_tokens'] += draft_tokens
+            totals['accepted_tokens'] += accepted
+            totals['verify_steps'] += verify_steps
+            totals['decode_ms'] += decode_ms
+        return accepted / draft_tokens if draft_tokens else 0.0
+
+    def record_batched(self, turns: int):
+        """Turns generated without the draft model because assisted generation only runs one sequence at a time"""
+        with self.lock:
+            self.batched_turns += turns
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'batched_turns': self.batched_turns,
+                'scenarios': {
+                    scenario_type: {
+                        'turns': totals['turns'],
+                        'acceptance_rate': round(totals['accepted_tokens'] / totals['draft_tokens'], 3) if totals['draft_tokens'] else 0.0,
+                        'tokens_per_verify_step': round(totals['generated_tokens'] / totals['verify_steps'], 2) if totals['verify_steps'] else 0.0,
+                        'avg_ms_per_token': round(totals['decode_ms'] / totals['generated_tokens'], 2) if totals['generated_tokens'] else 0.0
+                    }
+                    for scenario_type, totals in self.scenarios.items()
+                }
+            }
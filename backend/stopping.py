@@ -0,0 +1,89 @@
+import logging
+import re
+import time
+from collections import Counter
+from threading import Lock
+from typing import List, Optional, Sequence
+
+import torch
+from transformers import StoppingCriteria
+
+logger = logging.getLogger(__name__)
+
+STOP_STRINGS = ["<|eot_id|>", "<|end_of_text|>", "<|start_header_id|>", "<|end_header_id|>"]
+SENTENCE_END = re.compile(r'[.!?]+(?=\s)')
+
+class CallerTurnStoppingCriteria(StoppingCriteria):
+    """Stops each sequence once it has produced everything clean_response will keep: the first line,
+    up to max_sentences sentences, or the row's token budget"""
+
+    def __init__(self, tokenizer, prompt_length: int, token_budgets: Sequence[int], max_sentences: int = 0, stop_strings: Sequence[str] = STOP_STRINGS):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.token_budgets = list(token_budgets)
+        self.max_sentences = max_sentences
+        self.stop_strings = stop_strings
+        self.texts = [""] * len(self.token_budgets)
+        self.consumed = 0
+        self.first_step_at = None
+        self.reasons: List[Optional[str]] = [None] * len(self.token_budgets)
+        self.stopped_at: List[Optional[int]] = [None] * len(self.token_budgets)
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        if self.first_step_at is None:
+            # The first call follows the prefill forward pass
+            self.first_step_at = time.perf_counter()
+        # Assisted generation can accept several tokens per step, so decode everything since the last call
+        generated = input_ids.shape[1] - self.prompt_length
+        new_tokens = input_ids[:, self.prompt_length + self.consumed:].tolist()
+        self.consumed = generated
+        done = []
+        for row, token_ids in enumerate(new_tokens):
+            if self.reasons[row] is None:
+                self.texts[row] += self.tokenizer.decode(token_ids)
+                self.reasons[row] = self._stop_reason(self.texts[row], generated, self.token_budgets[row])
+                if self.reasons[row] is not None:
+                    self.stopped_at[row] = generated
+            done.append(self.reasons[row] is not None)
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+    def _stop_reason(self, text: str, generated: int, budget: int) -> Optional[str]:
+        if any(stop in text for stop in self.stop_strings):
+            return 'end_of_turn'
+        stripped = text.lstrip()
+        if '\n' in stripped:
+            return 'newline'
+        if self.max_sentences and len(SENTENCE_END.findall(stripped)) >= self.max_sentences:
+            return 'sentences'
+        if generated >= budget:
+            return 'budget'
+        return None
+
+class TokenUsageStats:
+    """Tokens generated vs. tokens that survive into the caller response"""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.turns = 0
+        self.generated_tokens = 0
+        self.kept_tokens = 0
+        self.stop_reasons = Counter()
+
+    def record(self, generated: int, kept: int, reason: Optional[str]):
+        with self.lock:
+            self.turns += 1
+            self.generated_tokens += generated
+            self.kept_tokens += kept
+            self.stop_reasons[reason or 'max_new_tokens'] += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'turns': self.turns,
+                'generated_tokens': self.generated_tokens,
+                'kept_tokens': self.kept_tokens,
+                'avg_generated_per_turn': round(self.generated_tokens / self.turns, 1) if self.turns else 0.0,
+                'avg_kept_per_turn': round(self.kept_tokens / self.turns, 1) if self.turns else 0.0,
+                'kept_ratio': round(self.kept_tokens / self.generated_tokens, 3) if self.generated_tokens else 0.0,
+                'stop_reasons': dict(self.stop_reasons)
+            }
@@ -0,0 +1,83 @@
+import hashlib
+import logging
+import time
+from typing import List, Optional
+
+import config
+from ai_generator import HuggingFaceCallerGenerator
+from batch_scheduler import GenerationRequest
+from inference_backends import load_tokenizer
+from tiny_model import ensure_tiny_model
+
+logger = logging.getLogger(__name__)
+
+STUB_RESPONSES = [
+    "I need help, there's been an accident.",
+    "I'm on Macleod Trail near 12 Avenue, by the gas station.",
+    "I think the driver is hurt, he isn't moving much.",
+    "It's a grey sedan, an older one. I didn't see the plate.",
+    "No, I don't think anyone else is in the car.",
+    "Okay. Should I stay here until they arrive?",
+    "He ran toward the LRT station, he had a green hoodie on.",
+    "Yes, I'm safe. I'm inside the store now."
+]
+
+class StubCallerGenerator(HuggingFaceCallerGenerator):
+    """Caller generator that sleeps instead of running a model, for load testing without a GPU.
+    Responses are picked deterministically from the prompt; each batch costs prefill_ms plus
+    token_delay_ms per decoded token, and everything around generation runs unchanged."""
+
+    def __init__(self, token_delay_ms: float = 20.0, prefill_ms: float = 50.0, **kwargs):
+        self.token_delay = token_delay_ms / 1000.0
+        self.prefill = prefill_ms / 1000.0
+        super().__init__(model_path=config.TINY_MODEL_DIR, **kwargs)
+
+    def load_model(self):
+        # Only the tokenizer is real, so prompts are rendered and counted exactly as in production
+        self.model_path = ensure_tiny_model(self.model_path)
+        self.tokenizer = load_tokenizer(self.model_path)
+        logger.info(f"Stub generator ready ({self.token_delay * 1000:.0f}ms/token, {self.prefill * 1000:.0f}ms prefill)")
+
+    @property
+    def model_loaded(self) -> bool:
+        return self.tokenizer is not None
+
+    def prime_session(self, caller_state, session_id: Optional[str] = None):
+        pass
+
+    def _generate_batch(self, requests: List[GenerationRequest]) -> List[str]:
+        responses = [
+            STUB_RESPONSES[int(hashlib.sha1(request.prompt.encode()).hexdigest(), 16) % len(STUB_RESPONSES)]
+            for request in requests
+        ]
+        # The tiny tokenizer is byte-level, so approximate a real tokenizer with one token per word
+        tokens = [min(request.max_new_tokens, len(response.split())) for request, response in zip(requests, responses)]
+
+        started_at = time.perf_counter()
+        time.sleep(self.prefill)
+        first_step_at = time.perf_counter()
+        streamer = requests[0].streamer if len(requests) == 1 else None
+        if streamer is None:
+            time.sleep(max(tokens) * self.token_delay)
+        else:
+            for word in responses[0].split()[:tokens[0]]:
+                time.sleep(self.token_delay)
+                streamer.on_finalized_text(word + ' ')
+            streamer.on_finalized_text('', stream_end=True)
+
+        generated_at = time.perf_counter()
+        for request, count in zip(requests, tokens):
+            self.token_usage.record(count, count, 'end_of_turn')
+            if request.trace is not None:
+                request.trace.add('prefill', first_step_at - started_at)
+                request.trace.add('decode', generated_at - first_step_at)
+                request.trace.prompt_tokens += len(request.prompt.split())
+                request.trace.output_tokens += count
+                request.trace.batch_size = len(requests)
+        return responses
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            'stub': {'token_delay_ms': self.token_delay * 1000, 'prefill_ms': self.prefill * 1000}
+        }
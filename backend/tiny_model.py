@@ -0,0 +1,52 @@
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+SPECIAL_TOKENS = ["<|begin_of_text|>", "<|eot_id|>", "<|start_header_id|>", "<|end_header_id|>", "<|end_of_text|>"]
+
+def ensure_tiny_model(path: str) -> str:
+    """Build a tiny randomly initialised Llama with a byte-level tokenizer at path, for exercising
+    the serving stack without a GPU or model download. Output is gibberish; latency is not."""
+    if os.path.exists(os.path.join(path, "config.json")):
+        return path
+
+    import torch
+    from tokenizers import Tokenizer, models, pre_tokenizers, decoders
+    from transformers import PreTrainedTokenizerFast, LlamaConfig, LlamaForCausalLM
+
+    logger.info(f"Building tiny test model at {path}")
+
+    vocab = {token: i for i, token in enumerate(SPECIAL_TOKENS)}
+    for symbol in sorted(pre_tokenizers.ByteLevel.alphabet()):
+        vocab[symbol] = len(vocab)
+
+    backend = Tokenizer(models.WordLevel(vocab, unk_token=SPECIAL_TOKENS[0]))
+    backend.pre_tokenizer = pre_tokenizers.Sequence([
+        pre_tokenizers.ByteLevel(add_prefix_space=False, use_regex=False),
+        pre_tokenizers.Split("", "isolated")
+    ])
+    backend.decoder = decoders.ByteLevel()
+
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=backend,
+        bos_token=SPECIAL_TOKENS[0],
+        eos_token=SPECIAL_TOKENS[1],
+        additional_special_tokens=SPECIAL_TOKENS[2:]
+    )
+    tokenizer.save_pretrained(path)
+
+    torch.manual_seed(0)
+    model_config = LlamaConfig(
+        vocab_size=len(tokenizer),
+        hidden_size=64,
+        intermediate_size=128,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        max_position_embeddings=8192,
+        bos_token_id=0,
+        eos_token_id=1
+    )
+    LlamaForCausalLM(model_config).save_pretrained(path)
+    return path
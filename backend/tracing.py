@@ -0,0 +1,138 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from threading import Lock
+from typing import Dict, Optional
+
+# Message hot path in the order the stages run; the scheduler and model stages are shared by every turn in a batch
+STAGES = (
+    'session_load', 'build_messages', 'queue_wait', 'tokenize', 'lock_wait', 'prefill', 'decode',
+    'kv_cache_store', 'detokenize', 'postprocess_wait', 'clean_response', 'update_state', 'quality_scoring', 'session_save'
+)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Trace:
+    """Per-request stage durations and token counts. Stages run one after another across the request,
+    scheduler and post-processing threads; a nested stage is subtracted from the one enclosing it so
+    the durations add up to the time spent. Plain attributes so a trace can cross to a model worker and back."""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.started_at = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.output_tokens = 0
+        self.batch_size = 0
+        self.open = []
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + max(0.0, seconds)
+
+    @contextmanager
+    def stage(self, name: str):
+        entry = [time.perf_counter(), 0.0]
+        self.open.append(entry)
+        try:
+            yield
+        finally:
+            self.open = [other for other in self.open if other is not entry]
+            elapsed = time.perf_counter() - entry[0]
+            self.add(name, elapsed - entry[1])
+            if self.open:
+                self.open[-1][1] += elapsed
+
+    def merge(self, other: 'Trace'):
+        """Fold in the stages a model worker recorded on its copy of this trace"""
+        for name, seconds in other.stages.items():
+            self.add(name, seconds)
+        self.prompt_tokens += other.prompt_tokens
+        self.cached_tokens += other.cached_tokens
+        self.output_tokens += other.output_tokens
+        self.batch_size = max(self.batch_size, other.batch_size)
+
+    def total(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def server_timing(self) -> str:
+        """Server-Timing header value, durations in milliseconds"""
+        entries = [f"{name};dur={self.stages[name] * 1000:.1f}" for name in STAGES if name in self.stages]
+        entries.append(f"total;dur={self.total() * 1000:.1f}")
+        return ", ".join(entries)
+
+def stage(trace: Optional[Trace], name: str):
+    return trace.stage(name) if trace is not None else nullcontext()
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+
+def labels(**values) -> str:
+    return "{" + ",".join(f'{key}="{value}"' for key, value in values.items()) + "}"
+
+class TraceMetrics:
+    """Aggregates finished traces into Prometheus histograms and counters"""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.requests = defaultdict(int)
+        self.durations = defaultdict(Histogram)
+        self.stages = defaultdict(Histogram)
+        self.tokens = defaultdict(int)
+
+    def observe(self, trace: Trace, status: int):
+        total = trace.total()
+        with self.lock:
+            self.requests[(trace.endpoint, status)] += 1
+            self.durations[trace.endpoint].observe(total)
+            for name, seconds in trace.stages.items():
+                self.stages[(trace.endpoint, name)].observe(seconds)
+            if trace.prompt_tokens:
+                self.tokens[(trace.endpoint, 'prompt')] += trace.prompt_tokens
+                self.tokens[(trace.endpoint, 'cached')] += trace.cached_tokens
+                self.tokens[(trace.endpoint, 'output')] += trace.output_tokens
+
+    def render(self, gauges: Optional[Dict[str, float]] = None) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        with self.lock:
+            lines += ["# HELP sim_requests_total Requests handled, by endpoint and HTTP status", "# TYPE sim_requests_total counter"]
+            for (endpoint, status), count in sorted(self.requests.items()):
+                lines.append(f"sim_requests_total{labels(endpoint=endpoint, status=status)} {count}")
+
+            lines += ["# HELP sim_request_duration_seconds End-to-end request time", "# TYPE sim_request_duration_seconds histogram"]
+            for endpoint, histogram in sorted(self.durations.items()):
+                lines += self._histogram('sim_request_duration_seconds', histogram, endpoint=endpoint)
+
+            lines += ["# HELP sim_stage_duration_seconds Time per request spent in each stage of the hot path", "# TYPE sim_stage_duration_seconds histogram"]
+            for (endpoint, name), histogram in sorted(self.stages.items()):
+                lines += self._histogram('sim_stage_duration_seconds', histogram, endpoint=endpoint, stage=name)
+
+            lines += ["# HELP sim_tokens_total Prompt tokens (cached = served from the KV caches) and generated output tokens", "# TYPE sim_tokens_total counter"]
+            for (endpoint, kind), count in sorted(self.tokens.items()):
+                lines.append(f"sim_tokens_total{labels(endpoint=endpoint, kind=kind)} {count}")
+
+        for name, value in (gauges or {}).items():
+            lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def _histogram(self, name: str, histogram: Histogram, **values) -> list:
+        lines = [
+            f"{name}_bucket{labels(**values, le=bound)} {count}"
+            for bound, count in zip(BUCKETS, histogram.counts)
+        ]
+        lines.append(f"{name}_bucket{labels(**values, le='+Inf')} {histogram.count}")
+        lines.append(f"{name}_sum{labels(**values)} {histogram.sum:.6f}")
+        lines.append(f"{name}_count{labels(**values)} {histogram.count}")
+        return lines
+
+metrics = TraceMetrics()
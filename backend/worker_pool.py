@@ -0,0 +1,373 @@
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterator, Optional, Tuple
+
+import config
+from batch_scheduler import ModelNotReadyError, QueueFullError
+from models import CallerState
+from tracing import Trace
+
+logger = logging.getLogger(__name__)
+
+def _worker_main(index: int, requests, results, torch_threads: int):
+    """Entry point of a model worker process: owns one generator and serves commands from the pool"""
+    logging.basicConfig(level=logging.INFO)
+    import torch
+    if torch_threads:
+        torch.set_num_threads(torch_threads)
+
+    on_status = lambda status: results.put(('status', index, None, status))
+    if config.STUB_GENERATOR:
+        from stub_generator import StubCallerGenerator
+        generator = StubCallerGenerator(config.STUB_TOKEN_DELAY_MS, config.STUB_PREFILL_MS, on_status=on_status)
+    else:
+        from ai_generator import HuggingFaceCallerGenerator
+        generator = HuggingFaceCallerGenerator(on_status=on_status)
+    streams = ThreadPoolExecutor(max_workers=max(1, config.MAX_PENDING_GENERATIONS), thread_name_prefix="stream")
+    results.put(('ready', index, None, os.getpid()))
+
+    # Every request the pool tracks must get a result, busy or failed message, or its turn never
+    # resolves and stays counted against the worker's pending turns
+    def reply(request_id: int, done: Future, trace: Optional[Trace]):
+        try:
+            results.put(('result', index, request_id, (done.result(), trace)))
+        except QueueFullError as e:
+            results.put(('busy', index, request_id, e.retry_after))
+        except Exception as e:
+            logger.error(f"Worker {index} failed on respond: {e}")
+            results.put(('failed', index, request_id, str(e)))
+
+    def stream(request_id: int, args: tuple):
+        try:
+            for event in generator.stream_response(*args):
+                results.put(('event', index, request_id, event))
+        except QueueFullError as e:
+            results.put(('busy', index, request_id, e.retry_after))
+            return
+        except Exception as e:
+            logger.error(f"Worker {index} failed on stream: {e}")
+            results.put(('failed', index, request_id, str(e)))
+            return
+        results.put(('result', index, request_id, args[3]))
+
+    def worker_trace(trace: Optional[Trace]) -> Optional[Trace]:
+        # Record this worker's stages on a fresh trace; the pool merges them into the request's own
+        return Trace(trace.endpoint) if trace is not None else None
+
+    last_stats = 0.0
+    while True:
+        try:
+            command = requests.get(timeout=config.WORKER_STATS_INTERVAL)
+        except queue.Empty:
+            command = None
+
+        if time.monotonic() - last_stats >= config.WORKER_STATS_INTERVAL:
+            results.put(('stats', index, None, generator.stats()))
+            last_stats = time.monotonic()
+
+        if command is None:
+            continue
+
+        kind, request_id, args = command
+        if kind == 'stop':
+            break
+        try:
+            if kind == 'respond':
+                trace = worker_trace(args[3])
+                future = generator.submit_response(*args[:3], trace)
+                future.add_done_callback(lambda done, request_id=request_id, trace=trace: reply(request_id, done, trace))
+            elif kind == 'stream':
+                streams.submit(stream, request_id, (*args[:3], worker_trace(args[3])))
+            elif kind == 'prime':
+                generator.prime_session(*args)
+            elif kind == 'release':
+                generator.release_session(*args)
+        except QueueFullError as e:
+            results.put(('busy', index, request_id, e.retry_after))
+        except Exception as e:
+            logger.error(f"Worker {index} failed on {kind}: {e}")
+            results.put(('failed', index, request_id, str(e)))
+
+class WorkerHandle:
+    def __init__(self, index: int, process, requests, crashes: int = 0):
+        self.index = index
+        self.process = process
+        self.requests = requests
+        self.pid = None
+        self.ready = False
+        self.status = 'loading'
+        self.pending = 0
+        self.stats = {}
+        self.started_at = time.time()
+        # Crashes since this slot's worker was last ready, and when the next replacement is due
+        self.crashes = crashes
+        self.restart_at: Optional[float] = None
+        self.failed = False
+
+    @property
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+class ModelWorkerPool:
+    """Runs one generator per worker process and pins each session to a worker so its caches stay warm"""
+
+    def __init__(self, num_workers: int, max_pending: int = 0):
+        self.context = multiprocessing.get_context('spawn')
+        self.results = self.context.Queue()
+        self.max_pending = max_pending
+        self.torch_threads = config.WORKER_TORCH_THREADS or max(1, (os.cpu_count() or 1) // num_workers)
+        self.lock = threading.Lock()
+        self.request_ids = itertools.count()
+        self.assignments: Dict[str, int] = {}
+        self.inflight: Dict[int, tuple] = {}
+        self.restarts = 0
+        self.workers = [self._spawn(index) for index in range(num_workers)]
+        self.model_path = config.TINY_MODEL_DIR if config.LOCAL_TEST_MODEL else config.MODEL_PATH
+        threading.Thread(target=self._read_results, name="worker-results", daemon=True).start()
+        threading.Thread(target=self._monitor, name="worker-monitor", daemon=True).start()
+        logger.info(f"Started {num_workers} model worker processes ({self.torch_threads} torch threads each)")
+
+    def _spawn(self, index: int, crashes: int = 0) -> WorkerHandle:
+        requests = self.context.Queue()
+        process = self.context.Process(
+            target=_worker_main,
+            args=(index, requests, self.results, self.torch_threads),
+            name=f"model-worker-{index}",
+            daemon=True
+        )
+        process.start()
+        return WorkerHandle(index, process, requests, crashes)
+
+    @property
+    def model_loaded(self) -> bool:
+        return any(worker.ready and worker.alive for worker in self.workers)
+
+    @property
+    def status(self) -> str:
+        """'ready' once any worker can serve turns, 'failed' once every worker hit its restart limit,
+        else the furthest startup stage reached"""
+        if all(worker.failed for worker in self.workers):
+            return 'failed'
+        statuses = {worker.status for worker in self.workers if worker.alive}
+        return next((status for status in ('ready', 'warming') if status in statuses), 'loading')
+
+    def check_ready(self):
+        # Worker request queues hold turns until the worker's model has loaded
+        status = self.status
+        if status != 'ready' and (status == 'failed' or not config.QUEUE_UNTIL_READY):
+            raise ModelNotReadyError(status, config.NOT_READY_RETRY_AFTER)
+
+    def _route(self, session_id: Optional[str]) -> WorkerHandle:
+        # Caller holds self.lock
+        index = self.assignments.get(session_id) if session_id else None
+        if index is not None and self.workers[index].alive:
+            return self.workers[index]
+
+        # With every worker down, turns wait on a slot due to be restarted
+        live = [worker for worker in self.workers if worker.alive] or [worker for worker in self.workers if not worker.failed]
+        if not live:
+            raise ModelNotReadyError('failed', config.NOT_READY_RETRY_AFTER)
+        worker = min(live, key=lambda w: (not w.ready, w.pending, sum(1 for i in self.assignments.values() if i == w.index)))
+        if session_id:
+            self.assignments[session_id] = worker.index
+        return worker
+
+    def _dispatch(self, kind: str, session_id: Optional[str], args: tuple, target) -> int:
+        with self.lock:
+            if target is not None and self.at_capacity():
+                raise QueueFullError(self._retry_after())
+            worker = self._route(session_id)
+            request_id = next(self.request_ids)
+            if target is not None:
+                worker.pending += 1
+                self.inflight[request_id] = (worker.index, kind, session_id, args, target)
+        worker.requests.put((kind, request_id, args))
+        return request_id
+
+    def is_idle(self) -> bool:
+        return self.status == 'ready' and not any(worker.pending for worker in self.workers)
+
+    def at_capacity(self) -> bool:
+        return bool(self.max_pending) and sum(worker.pending for worker in self.workers) >= self.max_pending
+
+    def _retry_after(self) -> float:
+        waits = [
+            worker.stats.get('batching', {}).get('avg_batch_generation_ms', 1000.0) / 1000.0
+            for worker in self.workers if worker.alive
+        ]
+        pending = sum(worker.pending for worker in self.workers)
+        return max(1.0, pending / max(1, len(waits)) * (sum(waits) / len(waits) if waits else 1.0))
+
+    def retry_after(self) -> float:
+        with self.lock:
+            return self._retry_after()
+
+    def submit_response(self, caller_state: CallerState, call_taker_message: str, session_id: Optional[str] = None, trace: Optional[Trace] = None) -> Future:
+        self.check_ready()
+        future = Future()
+        self._dispatch('respond', session_id, (caller_state, call_taker_message, session_id, trace), future)
+        return future
+
+    def generate_response(self, caller_state: CallerState, call_taker_message: str, session_id: Optional[str] = None, trace: Optional[Trace] = None) -> Tuple[str, CallerState]:
+        try:
+            return self.submit_response(caller_state, call_taker_message, session_id, trace).result()
+        except (QueueFullError, ModelNotReadyError):
+            raise
+        except Exception as e:
+            logger.error(f"Error generating response: {e}")
+            return "I need help!", caller_state
+
+    def stream_response(self, caller_state: CallerState, call_taker_message: str, session_id: Optional[str] = None, trace: Optional[Trace] = None) -> Iterator[Tuple[str, object]]:
+        self.check_ready()
+        events = queue.Queue()
+        self._dispatch('stream', session_id, (caller_state, call_taker_message, session_id, trace), events)
+        while True:
+            event = events.get(timeout=config.STREAM_TOKEN_TIMEOUT)
+            if event is None:
+                return
+            if isinstance(event, QueueFullError):
+                raise event
+            yield event
+
+    def prime_session(self, caller_state: CallerState, session_id: Optional[str] = None):
+        self._dispatch('prime', session_id, (caller_state,), None)
+
+    def release_session(self, session_id: str):
+        with self.lock:
+            index = self.assignments.pop(session_id, None)
+        if index is not None:
+            self.workers[index].requests.put(('release', None, (session_id,)))
+
+    def _complete(self, request_id: int, outcome: str, value):
+        with self.lock:
+            entry = self.inflight.pop(request_id, None)
+            if entry:
+                self.workers[entry[0]].pending -= 1
+        if not entry:
+            return
+
+        _, kind, _, args, target = entry
+        if kind == 'stream':
+            if outcome == 'busy':
+                target.put(QueueFullError(value))
+            elif outcome == 'failed':
+                target.put(('done', ("I need help!", args[0])))
+            elif value is not None and args[3] is not None:
+                args[3].merge(value)
+            target.put(None)
+        elif outcome == 'result':
+            value, trace = value
+            if trace is not None and args[3] is not None:
+                args[3].merge(trace)
+            target.set_result(value)
+        elif outcome == 'busy':
+            target.set_exception(QueueFullError(value))
+        else:
+            target.set_exception(RuntimeError(value))
+
+    def _read_results(self):
+        while True:
+            kind, index, request_id, value = self.results.get()
+            worker = self.workers[index]
+            if kind == 'status':
+                worker.status = value
+                if value == 'ready':
+                    worker.crashes = 0
+            elif kind == 'ready':
+                worker.ready = True
+                worker.pid = value
+                logger.info(f"Model worker {index} ready (pid {value})")
+            elif kind == 'stats':
+                worker.stats = value
+            elif kind == 'event':
+                entry = self.inflight.get(request_id)
+                if entry:
+                    entry[4].put(value)
+            else:
+                self._complete(request_id, kind, value)
+
+    def _monitor(self):
+        while True:
+            time.sleep(1.0)
+            for index, worker in enumerate(self.workers):
+                if worker.alive or worker.failed:
+                    continue
+                if worker.restart_at is None:
+                    self._retire(index)
+                elif time.monotonic() >= worker.restart_at:
+                    self._replace(index)
+
+    def _retire(self, index: int):
+        """Handle a worker's death: hand its sessions and turns to the others and schedule its replacement,
+        backing off while it keeps dying before it gets ready (e.g. a model that fails to load)"""
+        worker = self.workers[index]
+        worker.crashes += 1
+        if config.WORKER_MAX_RESTARTS and worker.crashes > config.WORKER_MAX_RESTARTS:
+            worker.failed = True
+            worker.status = 'failed'
+            logger.error(f"Model worker {index} (pid {worker.process.pid}) died {worker.crashes} times without getting ready, giving up")
+        else:
+            delay = min(config.WORKER_RESTART_BACKOFF * 2 ** (worker.crashes - 1), config.WORKER_RESTART_BACKOFF_MAX)
+            worker.restart_at = time.monotonic() + delay
+            logger.error(f"Model worker {index} (pid {worker.process.pid}) died, restarting in {delay:.0f}s")
+        with self.lock:
+            # Sessions pinned to the dead worker are rebalanced on their next turn
+            for session_id in [s for s, i in self.assignments.items() if i == index]:
+                del self.assignments[session_id]
+            orphaned = self._orphans(index)
+        self._resubmit(orphaned)
+
+    def _replace(self, index: int):
+        with self.lock:
+            self.restarts += 1
+            # Turns routed to the slot while it was down were queued to the dead worker
+            orphaned = self._orphans(index)
+            self.workers[index] = self._spawn(index, self.workers[index].crashes)
+        self._resubmit(orphaned)
+
+    def _orphans(self, index: int) -> list:
+        # Caller holds self.lock
+        orphaned = [(request_id, entry) for request_id, entry in self.inflight.items() if entry[0] == index]
+        for request_id, _ in orphaned:
+            del self.inflight[request_id]
+            self.workers[index].pending -= 1
+        return orphaned
+
+    def _resubmit(self, orphaned: list):
+        for _, (_, kind, session_id, args, target) in orphaned:
+            if kind == 'stream':
+                target.put(('done', ("I need help!", args[0])))
+                target.put(None)
+                continue
+            try:
+                # Resubmit to whichever worker the session is rebalanced to
+                self._dispatch(kind, session_id, args, target)
+            except (QueueFullError, ModelNotReadyError) as e:
+                target.set_exception(e)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'restarts': self.restarts,
+                'pinned_sessions': len(self.assignments),
+                'workers': [
+                    {
+                        'index': worker.index,
+                        'pid': worker.pid,
+                        'alive': worker.alive,
+                        'ready': worker.ready,
+                        'status': worker.status,
+                        'crashes': worker.crashes,
+                        'pending': worker.pending,
+                        'sessions': sum(1 for i in self.assignments.values() if i == worker.index),
+                        **worker.stats
+                    }
+                    for worker in self.workers
+                ]
+            }
@@ -50,7 +50,15 @@ export const sessionApi = {
     return httpClient.post(`/sessions/${sessionId}/end`);
   },
 
-  getConversation: async (sessionId) => {
-    return httpClient.get(`/sessions/${sessionId}/conversation`);
+  getConversation: async (sessionId, since = 0) => {
+    return httpClient.get(`/sessions/${sessionId}/conversation?since=${since}`);
+  },
+
+  getTraineeSessions: async (traineeId, params = {}) => {
+    return httpClient.get(`/trainees/${traineeId}/sessions?${new URLSearchParams(params)}`);
+  },
+
+  getScenarioAnalytics: async (params = {}) => {
+    return httpClient.get(`/analytics/scenarios?${new URLSearchParams(params)}`);
   }
 };